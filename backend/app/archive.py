@@ -0,0 +1,221 @@
+"""
+订单归档 - 把早于保留期的已结束订单、订单项和库存日志移入按月划分的归档库，热表只保留近期数据
+
+- 归档库连接串由 ARCHIVE_URL_TEMPLATE 生成（{month} 替换为 YYYY_MM），默认是主库旁 archive/ 目录下的 SQLite 文件
+- 归档库中的表结构与热表相同（不含外键），订单项额外保存下单时的 categoryId，供分类销售分析使用
+- 已归档的月份记录在主库 archive_partitions 表中，每批数据的登记与热表删除在同一事务提交；
+  查询按时间窗口选出重叠的归档库一并读取，目录变化（其他进程归档）在下一次查找时即可看到
+- 销售预聚合（sales_rollups）不随订单移动，仍在主库中覆盖全部历史；rebuild-rollups 不会重算已归档的时间段
+- 移动时先写归档库再删热表，中途失败可直接重跑（归档库中同 id 的行会先删除再写入）
+"""
+
+import os
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from typing import Iterator, List, Optional
+
+from sqlalchemy import Column, MetaData, Index, String, Table, create_engine, delete, func, insert, select
+from sqlalchemy.engine import make_url
+from sqlalchemy.orm import Session
+
+from backend.app.database import SQLALCHEMY_DATABASE_URL, configure_engine, engine_options
+from backend.app import models
+
+
+def _default_url_template() -> str:
+    url = make_url(SQLALCHEMY_DATABASE_URL)
+    if url.get_backend_name() == "sqlite" and url.database not in (None, "", ":memory:"):
+        directory = os.path.join(os.path.dirname(url.database), "archive")
+    else:
+        directory = "archive"
+    return f"sqlite:///{directory}/orders_{{month}}.db"
+
+
+ARCHIVE_AFTER_DAYS = int(os.environ.get("ARCHIVE_AFTER_DAYS", "180"))
+ARCHIVE_URL_TEMPLATE = os.environ.get("ARCHIVE_URL_TEMPLATE") or _default_url_template()
+ARCHIVE_BATCH_SIZE = int(os.environ.get("ARCHIVE_BATCH_SIZE", "500"))
+
+# 只归档这些状态的订单；未结束的订单无论多久都留在热表
+CLOSED_ORDER_STATUSES = ("COMPLETED", "CANCELLED", "REFUNDED")
+
+DAY = 86400
+
+
+# ==================== 归档库结构 ====================
+
+def _copy_table(source: Table, metadata: MetaData, *extra: Column) -> Table:
+    """复制列和索引，不复制外键（归档库中没有桌台、商品等表）"""
+    columns = [Column(c.name, c.type, primary_key=c.primary_key, nullable=c.nullable) for c in source.columns]
+    table = Table(source.name, metadata, *columns, *extra)
+    for index in source.indexes:
+        Index(index.name, *[table.c[c.name] for c in index.columns], unique=index.unique)
+    return table
+
+
+archive_metadata = MetaData()
+ARCHIVE_ORDERS = _copy_table(models.Order.__table__, archive_metadata)
+ARCHIVE_ORDER_ITEMS = _copy_table(
+    models.OrderItem.__table__, archive_metadata, Column("categoryId", String, nullable=True)
+)
+ARCHIVE_STOCK_LOGS = _copy_table(models.StockLog.__table__, archive_metadata)
+Index("idx_archive_order_item_category", ARCHIVE_ORDER_ITEMS.c.categoryId)
+
+
+_engines: dict = {}
+
+
+def get_engine(url: str):
+    """每个归档库一个引擎，首次使用时建表"""
+    engine = _engines.get(url)
+    if engine is None:
+        parsed = make_url(url)
+        if parsed.get_backend_name() == "sqlite" and parsed.database:
+            os.makedirs(os.path.dirname(os.path.abspath(parsed.database)), exist_ok=True)
+        engine = create_engine(url, **engine_options(url))
+        configure_engine(engine)
+        archive_metadata.create_all(bind=engine)
+        engine = _engines.setdefault(url, engine)
+    return engine
+
+
+def month_of(ts: int) -> tuple:
+    """ts 所在 UTC 自然月：(YYYY-MM, 月初, 下月初)"""
+    start = datetime.fromtimestamp(ts, timezone.utc).replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+    end = start.replace(year=start.year + 1, month=1) if start.month == 12 else start.replace(month=start.month + 1)
+    return start.strftime("%Y-%m"), int(start.timestamp()), int(end.timestamp())
+
+
+def archive_url(month: str) -> str:
+    return ARCHIVE_URL_TEMPLATE.format(month=month.replace("-", "_"))
+
+
+# ==================== 查询路由 ====================
+
+# 进程内的目录副本；归档任务在其他进程中写入，每次查找先比对 (行数, max(updatedAt)) 再决定是否重新加载
+_catalog: dict = {"version": None, "partitions": []}
+
+
+def partitions(db: Session) -> List[dict]:
+    """已归档的月份，按时间倒序"""
+    part = models.ArchivePartition
+    version = tuple(db.execute(select(func.count(), func.max(part.updatedAt))).one())
+    if version != _catalog["version"]:
+        rows = db.execute(
+            select(part.month, part.url, part.startTs, part.endTs).order_by(part.startTs.desc())
+        ).mappings().all()
+        _catalog.update(version=version, partitions=[dict(r) for r in rows])
+    return _catalog["partitions"]
+
+
+def archived_until(db: Session) -> Optional[int]:
+    """此时间之前的已结束订单可能已在归档库中"""
+    parts = partitions(db)
+    return max(p["endTs"] for p in parts) if parts else None
+
+
+def overlapping(db: Session, start_ts: Optional[int], end_ts: Optional[int]) -> List[dict]:
+    return [
+        p for p in partitions(db)
+        if (start_ts is None or p["endTs"] > start_ts) and (end_ts is None or p["startTs"] <= end_ts)
+    ]
+
+
+@contextmanager
+def archive_sessions(parts: List[dict]) -> Iterator[List[Session]]:
+    """打开各归档库的会话，退出时关闭"""
+    sessions = [Session(bind=get_engine(p["url"])) for p in parts]
+    try:
+        yield sessions
+    finally:
+        for s in sessions:
+            s.close()
+
+
+# ==================== 移动数据 ====================
+
+def _replace(conn, table: Table, rows: list) -> None:
+    ids = [r["id"] for r in rows]
+    conn.execute(delete(table).where(table.c.id.in_(ids)))
+    conn.execute(insert(table), rows)
+
+
+def _record_batch(db: Session, month: str, url: str, start: int, end: int, **moved: int) -> None:
+    """登记本批移动的行，与热表删除在同一事务中提交，查询不会漏掉已移出的数据"""
+    part = db.get(models.ArchivePartition, month)
+    if part is None:
+        part = models.ArchivePartition(month=month, url=url, startTs=start, endTs=end,
+                                       orders=0, orderItems=0, stockLogs=0)
+        db.add(part)
+    part.endTs = max(part.endTs, end)
+    for column, count in moved.items():
+        setattr(part, column, getattr(part, column) + count)
+    part.updatedAt = datetime.utcnow().isoformat()
+
+
+def _move_orders(db: Session, engine, month: str, url: str, start: int, end: int, batch_size: int) -> tuple:
+    order, item, product = models.Order.__table__, models.OrderItem.__table__, models.Product.__table__
+    orders = items = 0
+    while True:
+        rows = db.execute(select(order).where(
+            order.c.timestamp >= start, order.c.timestamp < end, order.c.status.in_(CLOSED_ORDER_STATUSES),
+        ).order_by(order.c.timestamp, order.c.id).limit(batch_size)).mappings().all()
+        if not rows:
+            return orders, items
+        ids = [r["id"] for r in rows]
+        item_rows = db.execute(
+            select(item, product.c.categoryId).outerjoin(product, product.c.id == item.c.productId)
+            .where(item.c.orderId.in_(ids))
+        ).mappings().all()
+        with engine.begin() as conn:
+            conn.execute(delete(ARCHIVE_ORDER_ITEMS).where(ARCHIVE_ORDER_ITEMS.c.orderId.in_(ids)))
+            _replace(conn, ARCHIVE_ORDERS, [dict(r) for r in rows])
+            if item_rows:
+                conn.execute(insert(ARCHIVE_ORDER_ITEMS), [dict(r) for r in item_rows])
+        db.execute(delete(item).where(item.c.orderId.in_(ids)))
+        db.execute(delete(order).where(order.c.id.in_(ids)))
+        _record_batch(db, month, url, start, end, orders=len(rows), orderItems=len(item_rows))
+        db.commit()
+        orders += len(rows)
+        items += len(item_rows)
+
+
+def _move_stock_logs(db: Session, engine, month: str, url: str, start: int, end: int, batch_size: int) -> int:
+    log = models.StockLog.__table__
+    moved = 0
+    while True:
+        rows = db.execute(select(log).where(log.c.timestamp >= start, log.c.timestamp < end)
+                          .order_by(log.c.timestamp, log.c.id).limit(batch_size)).mappings().all()
+        if not rows:
+            return moved
+        with engine.begin() as conn:
+            _replace(conn, ARCHIVE_STOCK_LOGS, [dict(r) for r in rows])
+        db.execute(delete(log).where(log.c.id.in_([r["id"] for r in rows])))
+        _record_batch(db, month, url, start, end, stockLogs=len(rows))
+        db.commit()
+        moved += len(rows)
+
+
+def archive_before(db: Session, before_ts: int, batch_size: int = ARCHIVE_BATCH_SIZE) -> List[dict]:
+    """把 before_ts 之前的已结束订单（含订单项）和库存日志按月移入归档库，返回各月移动的行数"""
+    order, log = models.Order.__table__, models.StockLog.__table__
+    first = [ts for ts in (
+        db.execute(select(order.c.timestamp).where(order.c.status.in_(CLOSED_ORDER_STATUSES))
+                   .order_by(order.c.timestamp).limit(1)).scalar(),
+        db.execute(select(log.c.timestamp).order_by(log.c.timestamp).limit(1)).scalar(),
+    ) if ts is not None]
+    if not first or min(first) >= before_ts:
+        return []
+
+    results = []
+    ts = min(first)
+    while ts < before_ts:
+        month, month_start, month_end = month_of(ts)
+        end = min(month_end, before_ts)
+        url = archive_url(month)
+        engine = get_engine(url)
+        orders, items = _move_orders(db, engine, month, url, month_start, end, batch_size)
+        logs = _move_stock_logs(db, engine, month, url, month_start, end, batch_size)
+        if orders or logs:
+            results.append({"month": month, "orders": orders, "orderItems": items, "stockLogs": logs})
+        ts = month_end
+    return results
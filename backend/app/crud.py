@@ -1,7 +1,43 @@
-from typing import List, Optional
-from sqlalchemy.orm import Session
-from sqlalchemy import select, func
-from backend.app import models
+import base64
+import heapq
+import json
+import os
+import uuid
+from datetime import datetime
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+from sqlalchemy.orm import Session, selectinload
+from sqlalchemy import select, insert, update, delete, func, and_, or_, desc, case, text
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.exc import IntegrityError
+from backend.app import archive, member_search, menu_cache, models, realtime
+
+# 库存不足时是否拒绝下单（默认允许超卖，库存记为负数）
+REJECT_OVERSELL = os.environ.get("REJECT_OVERSELL", "false").lower() in ("1", "true", "yes")
+# 这些状态的订单不扣减库存
+NON_STOCK_ORDER_STATUSES = ("CANCELLED", "REFUNDED")
+# 商品排行、分类销售和毛利分析不计入这些状态的订单（没有实际成交）
+NON_REVENUE_ORDER_STATUSES = ("CANCELLED", "REFUNDED")
+# 该状态的堂食订单创建时记为桌台的当前订单
+OPEN_ORDER_STATUS = "PENDING"
+SALE_STOCK_OPERATOR = "POS"
+
+# 预聚合粒度（秒）与维度
+ROLLUP_GRANULARITIES = {"hour": 3600, "day": 86400}
+ROLLUP_DIMENSIONS = ("all", "type", "payment", "area")
+# 预聚合从该时间戳（UTC秒）起完整；启动时的补算完成前没有该键，汇总全部回查原始订单
+ROLLUP_WATERMARK_KEY = "sales_rollups.watermark"
+
+# 门店时区（SystemConfig 中的 store.timezone 优先）
+STORE_TIMEZONE_KEY = "store.timezone"
+DEFAULT_STORE_TIMEZONE = os.environ.get("STORE_TIMEZONE", "UTC")
+
+class InsufficientStockError(Exception):
+    """下单商品库存不足"""
+    def __init__(self, product_id: str, name: str):
+        super().__init__(f"库存不足: {name}")
+        self.product_id = product_id
+        self.name = name
 
 def list_categories(db: Session) -> List[models.Category]:
     return db.execute(select(models.Category)).scalars().all()
@@ -9,6 +45,7 @@ def list_categories(db: Session) -> List[models.Category]:
 def create_category(db: Session, name: str, icon: Optional[str] = None) -> models.Category:
     obj = models.Category(name=name, icon=icon)
     db.add(obj)
+    touch_config_version(db, menu_cache.MENU_VERSION_KEY)
     db.commit()
     db.refresh(obj)
     return obj
@@ -26,6 +63,10 @@ def create_supplier(db: Session, name: str, contactName: str, phone: str, email:
 def list_products(db: Session) -> List[models.Product]:
     return db.execute(select(models.Product)).scalars().all()
 
+def list_product_stock(db: Session) -> List[Tuple[str, int]]:
+    """商品实时库存；库存随每笔销售变化，不放进按 menu.version 缓存的商品快照"""
+    return db.execute(select(models.Product.id, models.Product.stock)).all()
+
 def get_product(db: Session, pid: str) -> Optional[models.Product]:
     return db.get(models.Product, pid)
 
@@ -37,6 +78,7 @@ def create_product(db: Session, data: dict) -> models.Product:
         isOnShelf=1 if data.get("isOnShelf", True) else 0, costPrice=data.get("costPrice"), supplierId=data.get("supplierId")
     )
     db.add(obj)
+    touch_config_version(db, menu_cache.MENU_VERSION_KEY)
     db.commit()
     db.refresh(obj)
     return obj
@@ -52,26 +94,108 @@ def update_product(db: Session, pid: str, data: dict) -> Optional[models.Product
             setattr(obj, k, 1 if v else 0)
         else:
             setattr(obj, k, v)
+    touch_config_version(db, menu_cache.MENU_VERSION_KEY)
     db.commit()
     db.refresh(obj)
     return obj
 
-def delete_product(db: Session, pid: str) -> bool:
-    obj = db.get(models.Product, pid)
+def _soft_delete(db: Session, model, oid: str, version_key: Optional[str] = None) -> bool:
+    """标记删除；历史订单、库存日志仍可按 id 关联到该行"""
+    obj = db.get(model, oid)
     if not obj:
         return False
-    db.delete(obj)
+    obj.isDeleted = True
+    obj.deletedAt = datetime.utcnow().isoformat()
+    if version_key:
+        touch_config_version(db, version_key)
     db.commit()
+    # Session.get 命中标识映射时不经过软删除条件，移出会话后同一会话再次查找才会返回 None
+    db.expunge(obj)
     return True
 
+def delete_product(db: Session, pid: str) -> bool:
+    return _soft_delete(db, models.Product, pid, menu_cache.MENU_VERSION_KEY)
+
+def delete_supplier(db: Session, sid: str) -> bool:
+    return _soft_delete(db, models.Supplier, sid)
+
+def delete_user(db: Session, uid: str) -> bool:
+    return _soft_delete(db, models.User, uid)
+
+# 被这些列引用的已删除行不清除（历史数据仍需关联）
+SOFT_DELETE_REFERENCES = {
+    models.Product: (models.OrderItem.productId, models.StockLog.productId),
+    models.Supplier: (models.Product.supplierId,),
+    models.User: (models.Order.userId,),
+}
+
+def purge_soft_deleted(db: Session, before: str, archive=None, chunk_size: int = 500) -> Dict[str, int]:
+    """物理删除 deletedAt 早于 before 且不再被引用的行；archive 为可写文本流时先逐行写入 NDJSON
+
+    每批先写入并刷新归档文件，再删除并提交，中途失败时已提交的行都已归档（重跑可能重复写入未提交的那一批）。
+    """
+    counts = {}
+    for model, references in SOFT_DELETE_REFERENCES.items():
+        stmt = select(model.__table__).where(model.isDeleted.is_(True), model.deletedAt < before)
+        for column in references:
+            stmt = stmt.where(~select(column).where(column == model.id).exists())
+        stmt = stmt.order_by(model.id).limit(chunk_size).execution_options(include_deleted=True)
+        counts[model.__tablename__] = 0
+        while True:
+            chunk = db.execute(stmt).mappings().all()
+            if not chunk:
+                break
+            if archive is not None:
+                for row in chunk:
+                    archive.write(json.dumps({"table": model.__tablename__, **row}, ensure_ascii=False) + "\n")
+                archive.flush()
+            db.execute(delete(model.__table__).where(model.id.in_([r["id"] for r in chunk])))
+            db.commit()
+            counts[model.__tablename__] += len(chunk)
+    return counts
+
+# 菜单只返回点单所需的字段（不含成本、库存、供应商和描述）
+MENU_PRODUCT_COLUMNS = (
+    models.Product.id, models.Product.categoryId, models.Product.name, models.Product.price,
+    models.Product.image, models.Product.unit, models.Product.salesMode,
+)
+
+def menu(db: Session) -> List[dict]:
+    """在架商品按分类分组；分类按 sortOrder 排序，停用分类下的商品不返回（已删除商品由全局条件排除）"""
+    categories = db.execute(
+        select(models.Category.id, models.Category.name, models.Category.icon)
+        .where(models.Category.isActive.isnot(False))
+        .order_by(models.Category.sortOrder, models.Category.name)
+    ).all()
+    groups = {c.id: {"id": c.id, "name": c.name, "icon": c.icon, "products": []} for c in categories}
+    rows = db.execute(
+        select(*MENU_PRODUCT_COLUMNS)
+        .where(models.Product.isOnShelf.is_(True))
+        .order_by(models.Product.name)
+    ).all()
+    for row in rows:
+        group = groups.get(row.categoryId)
+        if group is not None:
+            group["products"].append(row._asdict())
+    return [g for g in groups.values() if g["products"]]
+
+def find_table(db: Session, ref: str) -> Optional[models.Table]:
+    """按桌台 id 或二维码内容查找"""
+    return db.get(models.Table, ref) or db.execute(
+        select(models.Table).where(models.Table.qrCode == ref).limit(1)
+    ).scalar_one_or_none()
+
 def list_tables(db: Session) -> List[models.Table]:
     return db.execute(select(models.Table)).scalars().all()
 
 def create_table(db: Session, data: dict) -> models.Table:
     obj = models.Table(name=data["name"], status=data["status"], capacity=data["capacity"], area=data.get("area"))
     db.add(obj)
+    db.flush()
+    realtime.record_change(db, obj.id, "table.created")
     db.commit()
     db.refresh(obj)
+    realtime.notify()
     return obj
 
 def update_table(db: Session, tid: str, data: dict) -> Optional[models.Table]:
@@ -80,8 +204,10 @@ def update_table(db: Session, tid: str, data: dict) -> Optional[models.Table]:
         return None
     for k, v in data.items():
         setattr(obj, k, v)
+    realtime.record_change(db, obj.id)
     db.commit()
     db.refresh(obj)
+    realtime.notify()
     return obj
 
 def list_users(db: Session) -> List[models.User]:
@@ -94,29 +220,319 @@ def create_user(db: Session, data: dict) -> models.User:
     db.refresh(obj)
     return obj
 
-def list_orders(db: Session, status: Optional[str] = None) -> List[models.Order]:
-    stmt = select(models.Order)
+def _encode_search_cursor(values: list) -> str:
+    return base64.urlsafe_b64encode(json.dumps(values, ensure_ascii=False).encode()).decode().rstrip("=")
+
+def _decode_search_cursor(cursor: str) -> list:
+    padded = cursor + "=" * (-len(cursor) % 4)
+    values = json.loads(base64.urlsafe_b64decode(padded.encode()).decode())
+    if not isinstance(values, list) or not values:
+        raise ValueError("invalid cursor")
+    return values
+
+def search_users(db: Session, q: str, limit: int = 20,
+                 cursor: Optional[str] = None) -> Tuple[List[models.User], Optional[str]]:
+    """会员搜索：纯数字（可含空格、短横线）按手机号前缀，按手机号排序；其余按姓名片段，按 (姓名, id) 排序。
+    两种方式都是游标分页，每页一条查询"""
+    user = models.User
+    q = q.strip()
+    digits = q.replace(" ", "").replace("-", "")
+    after = _decode_search_cursor(cursor) if cursor else None
+    if digits.isdigit():
+        # 前缀转为范围条件，走 phone 唯一索引
+        upper = digits[:-1] + chr(ord(digits[-1]) + 1)
+        stmt = select(user).where(user.phone >= digits, user.phone < upper).order_by(user.phone)
+        if after:
+            stmt = stmt.where(user.phone > after[0])
+        key = lambda u: [u.phone]
+    else:
+        bind = db.get_bind()
+        if len(q) >= member_search.MIN_FTS_LENGTH and member_search.fts_enabled(bind):
+            match = text(f"users.id IN ({member_search.SQLITE_MATCH_USER_IDS})").bindparams(
+                match=member_search.fts_query(q))
+            # 一元 + 使 SQLite 不按 idx_user_live_name 顺序扫描全表，而是从 FTS 命中行出发再排序
+            order = (text("+users.name"), user.id)
+        else:
+            pattern = member_search.like_pattern(q)
+            match = (user.name.ilike(pattern, escape="\\") if bind.dialect.name == "postgresql"
+                     else user.name.like(pattern, escape="\\"))
+            order = (user.name, user.id)
+        stmt = select(user).where(match).order_by(*order)
+        if after:
+            stmt = stmt.where(or_(user.name > after[0], and_(user.name == after[0], user.id > after[1])))
+        key = lambda u: [u.name, u.id]
+    rows = db.execute(stmt.limit(limit + 1)).scalars().all()
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = _encode_search_cursor(key(rows[-1]))
+    return rows, next_cursor
+
+def encode_order_cursor(timestamp: int, oid: str) -> str:
+    raw = f"{timestamp}:{oid}".encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+def decode_order_cursor(cursor: str) -> Tuple[int, str]:
+    padded = cursor + "=" * (-len(cursor) % 4)
+    ts, _, oid = base64.urlsafe_b64decode(padded.encode()).decode().partition(":")
+    if not oid:
+        raise ValueError("invalid cursor")
+    return int(ts), oid
+
+def _filter_orders(stmt, status: Optional[str] = None, type: Optional[str] = None, table_id: Optional[str] = None,
+                   start_ts: Optional[int] = None, end_ts: Optional[int] = None):
     if status:
         stmt = stmt.where(models.Order.status == status)
-    return db.execute(stmt).scalars().all()
+    if type:
+        stmt = stmt.where(models.Order.type == type)
+    if table_id:
+        stmt = stmt.where(models.Order.tableId == table_id)
+    if start_ts is not None:
+        stmt = stmt.where(models.Order.timestamp >= start_ts)
+    if end_ts is not None:
+        stmt = stmt.where(models.Order.timestamp <= end_ts)
+    return stmt
+
+def _archived_sessions(db: Session, start_ts: Optional[int], end_ts: Optional[int]):
+    """与 [start_ts, end_ts] 重叠的归档库会话（上下文管理器，None 表示不限）"""
+    return archive.archive_sessions(archive.overlapping(db, start_ts, end_ts))
+
+def _order_sort_key(o: models.Order) -> tuple:
+    return o.timestamp, o.id
+
+def list_orders(db: Session, status: Optional[str] = None, type: Optional[str] = None, table_id: Optional[str] = None,
+                start_ts: Optional[int] = None, end_ts: Optional[int] = None) -> List[models.Order]:
+    """未指定 start_ts 时只查热表；指定的起始时间早于已归档时间时合并归档库中的订单"""
+    stmt = _filter_orders(select(models.Order), status, type, table_id, start_ts, end_ts)
+    stmt = stmt.options(selectinload(models.Order.items)).order_by(models.Order.timestamp.desc(), models.Order.id.desc())
+    if start_ts is None:
+        return db.execute(stmt).scalars().all()
+    with _archived_sessions(db, start_ts, end_ts) as archived:
+        if not archived:
+            return db.execute(stmt).scalars().all()
+        sources = [src.execute(stmt).scalars().all() for src in [db, *archived]]
+    return list(heapq.merge(*sources, key=_order_sort_key, reverse=True))
+
+def list_orders_page(db: Session, limit: int = 50, cursor: Optional[str] = None, status: Optional[str] = None,
+                     type: Optional[str] = None, table_id: Optional[str] = None, start_ts: Optional[int] = None,
+                     end_ts: Optional[int] = None) -> Tuple[List[models.Order], Optional[str]]:
+    """按 (timestamp, id) 倒序的游标分页；每页固定两条查询（订单 + 批量加载订单项），
+    start_ts 早于已归档时间时每个重叠的归档库再各查一页后合并"""
+    stmt = _filter_orders(select(models.Order), status, type, table_id, start_ts, end_ts)
+    if cursor:
+        ts, oid = decode_order_cursor(cursor)
+        stmt = stmt.where(or_(
+            models.Order.timestamp < ts,
+            and_(models.Order.timestamp == ts, models.Order.id < oid),
+        ))
+    stmt = stmt.options(selectinload(models.Order.items)).order_by(
+        models.Order.timestamp.desc(), models.Order.id.desc()
+    ).limit(limit + 1)
+    rows = db.execute(stmt).scalars().all()
+    if start_ts is not None:
+        if cursor:
+            end_ts = ts if end_ts is None else min(end_ts, ts)
+        with _archived_sessions(db, start_ts, end_ts) as archived:
+            if archived:
+                sources = [rows, *(src.execute(stmt).scalars().all() for src in archived)]
+                rows = list(heapq.merge(*sources, key=_order_sort_key, reverse=True))[:limit + 1]
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_order_cursor(rows[-1].timestamp, rows[-1].id)
+    return rows, next_cursor
+
+def get_order(db: Session, oid: str) -> Optional[models.Order]:
+    """热表中没有时依次查找归档库（从新到旧）"""
+    stmt = select(models.Order).where(models.Order.id == oid).options(selectinload(models.Order.items))
+    obj = db.execute(stmt.execution_options(populate_existing=True)).scalars().first()
+    if obj is not None:
+        return obj
+    for part in archive.partitions(db):
+        with archive.archive_sessions([part]) as (src,):
+            obj = src.execute(stmt).scalars().first()
+        if obj is not None:
+            return obj
+    return None
 
-def create_order(db: Session, data: dict) -> models.Order:
+def _apply_sale_stock(db: Session, order_no: str, timestamp: int, items: List[dict],
+                      reject_oversell: bool) -> List[dict]:
+    """按商品逐条 UPDATE stock = stock - q 扣减库存，返回待写入的 OUT_SALE 库存日志行"""
+    quantities: Dict[str, list] = {}
+    for item in items:
+        entry = quantities.setdefault(item["productId"], [0, item["name"]])
+        entry[0] += item["quantity"]
+
+    logs = []
+    applied = []
+    # 固定加锁顺序，避免并发下单互相等待
+    for pid in sorted(quantities):
+        qty, name = quantities[pid]
+        stmt = update(models.Product).where(models.Product.id == pid)
+        if reject_oversell:
+            stmt = stmt.where(models.Product.stock >= qty)
+        stmt = stmt.values(stock=models.Product.stock - qty).returning(models.Product.stock, models.Product.costPrice)
+        row = db.execute(stmt, execution_options={"synchronize_session": False}).first()
+        if row is None:
+            if not reject_oversell:
+                continue  # 商品不存在，不记库存
+            for done_pid, done_qty in applied:
+                db.execute(
+                    update(models.Product).where(models.Product.id == done_pid)
+                    .values(stock=models.Product.stock + done_qty),
+                    execution_options={"synchronize_session": False},
+                )
+            raise InsufficientStockError(pid, name)
+        applied.append((pid, qty))
+        current_stock, cost_price = row
+        logs.append({
+            "id": str(uuid.uuid4()), "productId": pid, "productName": name, "type": "OUT_SALE",
+            "delta": -qty, "beforeStock": current_stock + qty, "currentStock": current_stock,
+            "costPrice": cost_price, "operator": SALE_STOCK_OPERATOR, "timestamp": timestamp,
+            "note": f"订单销售: {order_no}", "referenceNo": order_no,
+        })
+    return logs
+
+def create_order(db: Session, data: dict, reject_oversell: Optional[bool] = None) -> models.Order:
     order = models.Order(orderNo=data["orderNo"], tableId=data["tableId"], total=0.0, totalCost=None, status=data["status"], paymentMethod=data.get("paymentMethod"), timestamp=data["timestamp"], type=data["type"]) 
     db.add(order)
     db.flush()
-    total = 0.0
-    total_cost = 0.0
     for item in data["items"]:
         oi = models.OrderItem(orderId=order.id, productId=item["productId"], name=item["name"], price=item["price"], costPrice=item.get("costPrice"), image=item.get("image"), unit=item["unit"], quantity=item["quantity"]) 
+        db.add(oi)
+    order.total, order.totalCost = _order_totals(data["items"])
+    if data["status"] not in NON_STOCK_ORDER_STATUSES:
+        try:
+            logs = _apply_sale_stock(db, data["orderNo"], data["timestamp"], data["items"],
+                                     REJECT_OVERSELL if reject_oversell is None else reject_oversell)
+        except InsufficientStockError:
+            db.rollback()
+            raise
+        if logs:
+            db.execute(insert(models.StockLog), logs)
+    record_sales_rollups(db, [{
+        "timestamp": order.timestamp, "type": order.type, "paymentMethod": order.paymentMethod,
+        "tableId": order.tableId, "total": order.total, "totalCost": order.totalCost, "discount": order.discount,
+    }])
+    table = db.get(models.Table, order.tableId) if order.tableId and order.status == OPEN_ORDER_STATUS else None
+    if table is not None:
+        table.currentOrderId = order.id
+        realtime.record_change(db, table.id)
+    db.commit()
+    if table is not None:
+        realtime.notify()
+    return get_order(db, order.id)
+
+def _order_totals(items: List[dict]) -> Tuple[float, Optional[float]]:
+    total = 0.0
+    total_cost = 0.0
+    for item in items:
         total += item["price"] * item["quantity"]
         if item.get("costPrice") is not None:
             total_cost += item["costPrice"] * item["quantity"]
-        db.add(oi)
-    order.total = total
-    order.totalCost = total_cost if total_cost > 0 else None
-    db.commit()
-    db.refresh(order)
-    return order
+    return total, (total_cost if total_cost > 0 else None)
+
+def _existing_order_nos(db: Session, order_nos: List[str], chunk_size: int = 500) -> dict:
+    found = {}
+    for i in range(0, len(order_nos), chunk_size):
+        chunk = order_nos[i:i + chunk_size]
+        rows = db.execute(select(models.Order.orderNo, models.Order.id).where(models.Order.orderNo.in_(chunk))).all()
+        found.update({no: oid for no, oid in rows})
+    return found
+
+def create_orders_bulk(db: Session, orders: List[dict], reject_oversell: Optional[bool] = None) -> List[dict]:
+    """批量写入订单（离线终端补传）：按 orderNo 幂等，单事务 executemany 插入订单、订单项和库存日志"""
+    if reject_oversell is None:
+        reject_oversell = REJECT_OVERSELL
+    known_tables, known_products = _known_references(db, orders)
+    for attempt in range(2):
+        existing = _existing_order_nos(db, list({o["orderNo"] for o in orders}))
+        results = []
+        order_rows = []
+        item_rows = []
+        log_rows = []
+        for data in orders:
+            no = data["orderNo"]
+            if no in existing:
+                results.append({"orderNo": no, "id": existing[no], "status": "duplicate"})
+                continue
+            missing = _missing_reference(data, known_tables, known_products)
+            if missing:
+                results.append({"orderNo": no, "id": None, "status": "rejected", "detail": missing})
+                continue
+            if data["status"] not in NON_STOCK_ORDER_STATUSES:
+                try:
+                    log_rows.extend(_apply_sale_stock(db, no, data["timestamp"], data["items"], reject_oversell))
+                except InsufficientStockError as e:
+                    results.append({"orderNo": no, "id": None, "status": "rejected", "detail": str(e)})
+                    continue
+            oid = str(uuid.uuid4())
+            existing[no] = oid
+            total, total_cost = _order_totals(data["items"])
+            order_rows.append({
+                "id": oid, "orderNo": no, "tableId": data["tableId"], "total": total, "totalCost": total_cost,
+                "status": data["status"], "paymentMethod": data.get("paymentMethod"),
+                "timestamp": data["timestamp"], "type": data["type"],
+            })
+            for item in data["items"]:
+                item_rows.append({
+                    "id": str(uuid.uuid4()), "orderId": oid, "productId": item["productId"], "name": item["name"],
+                    "price": item["price"], "costPrice": item.get("costPrice"), "image": item.get("image"),
+                    "unit": item["unit"], "quantity": item["quantity"],
+                })
+            results.append({"orderNo": no, "id": oid, "status": "created"})
+        try:
+            if order_rows:
+                db.execute(insert(models.Order), order_rows)
+            if item_rows:
+                db.execute(insert(models.OrderItem), item_rows)
+            if log_rows:
+                db.execute(insert(models.StockLog), log_rows)
+            record_sales_rollups(db, order_rows)
+            opened = _link_open_orders(db, order_rows)
+            db.commit()
+            if opened:
+                realtime.notify()
+            return results
+        except IntegrityError:
+            # 外键已预先校验，冲突只可能来自并发补传了相同的 orderNo：回滚后重新判重一次
+            db.rollback()
+            if attempt:
+                raise
+    return results
+
+def _known_references(db: Session, orders: List[dict]) -> Tuple[set, set]:
+    """批量查出订单引用的桌台和商品中实际存在的 id（已软删除的商品仍可引用）；
+    外键错误在 PostgreSQL 上会让整批失败，因此写入前逐单校验"""
+    table_ids = {o["tableId"] for o in orders}
+    product_ids = {i["productId"] for o in orders for i in o["items"]}
+    tables = set(db.execute(select(models.Table.id).where(models.Table.id.in_(table_ids))).scalars())
+    products = set(db.execute(
+        select(models.Product.id).where(models.Product.id.in_(product_ids)),
+        execution_options={"include_deleted": True},
+    ).scalars()) if product_ids else set()
+    return tables, products
+
+def _missing_reference(data: dict, known_tables: set, known_products: set) -> Optional[str]:
+    if data["tableId"] not in known_tables:
+        return f"桌台不存在: {data['tableId']}"
+    for item in data["items"]:
+        if item["productId"] not in known_products:
+            return f"商品不存在: {item['productId']}"
+    return None
+
+def _link_open_orders(db: Session, order_rows: List[dict]) -> int:
+    """补传的未结账订单与实时下单一样关联到桌台（每桌取时间最晚的一单），返回更新的桌台数"""
+    latest: Dict[str, dict] = {}
+    for row in order_rows:
+        if row["status"] == OPEN_ORDER_STATUS and row["tableId"]:
+            current = latest.get(row["tableId"])
+            if current is None or row["timestamp"] >= current["timestamp"]:
+                latest[row["tableId"]] = row
+    for table_id, row in latest.items():
+        db.execute(update(models.Table).where(models.Table.id == table_id).values(currentOrderId=row["id"]))
+        realtime.record_change(db, table_id)
+    return len(latest)
 
 def add_reservation(db: Session, data: dict) -> models.Reservation:
     obj = models.Reservation(tableId=data["tableId"], customerName=data["customerName"], customerPhone=data["customerPhone"], reservationTime=data["reservationTime"], guests=data["guests"], status=data["status"], notes=data.get("notes"))
@@ -138,7 +554,514 @@ def create_stock_log(db: Session, data: dict) -> models.StockLog:
 def list_stock_logs(db: Session) -> List[models.StockLog]:
     return db.execute(select(models.StockLog)).scalars().all()
 
-def sales_summary_daily(db: Session, start_ts: int, end_ts: int):
-    rows = db.execute(select(func.strftime('%Y-%m-%d', (models.Order.timestamp), 'unixepoch'), func.count(models.Order.id), func.sum(models.Order.total)).where(models.Order.timestamp >= start_ts).where(models.Order.timestamp <= end_ts).group_by(func.strftime('%Y-%m-%d', (models.Order.timestamp), 'unixepoch'))).all()
-    return [{"date": r[0], "orders": int(r[1] or 0), "gross": float(r[2] or 0.0)} for r in rows]
+def _stream_rows(db: Session, stmt, chunk_size: int) -> Iterator[dict]:
+    result = db.execute(stmt.execution_options(yield_per=chunk_size))
+    for row in result.mappings():
+        yield dict(row)
+
+def _stream_with_archives(db: Session, stmt, chunk_size: int, start_ts: Optional[int], end_ts: Optional[int],
+                          key) -> Iterator[dict]:
+    """窗口与归档月份重叠时，把热库和各归档库的有序结果按 key 归并成一个流"""
+    parts = archive.overlapping(db, start_ts, end_ts)
+    if not parts:
+        yield from _stream_rows(db, stmt, chunk_size)
+        return
+    with archive.archive_sessions(parts) as archived:
+        yield from heapq.merge(*(_stream_rows(src, stmt, chunk_size) for src in [db, *archived]), key=key)
+
+def iter_orders_export(db: Session, start_ts: Optional[int] = None, end_ts: Optional[int] = None,
+                       status: Optional[str] = None, chunk_size: int = 1000) -> Iterator[dict]:
+    """服务端游标逐批读取订单行（不构建ORM对象），包含已归档的订单"""
+    stmt = _filter_orders(select(*models.Order.__table__.columns), status=status, start_ts=start_ts, end_ts=end_ts)
+    return _stream_with_archives(db, stmt.order_by(models.Order.timestamp, models.Order.id), chunk_size,
+                                 start_ts, end_ts, key=lambda r: (r["timestamp"], r["id"]))
+
+def iter_order_items_export(db: Session, start_ts: Optional[int] = None, end_ts: Optional[int] = None,
+                            status: Optional[str] = None, chunk_size: int = 1000) -> Iterator[dict]:
+    stmt = select(
+        *models.OrderItem.__table__.columns, models.Order.orderNo, models.Order.timestamp
+    ).join(models.Order, models.Order.id == models.OrderItem.orderId)
+    stmt = _filter_orders(stmt, status=status, start_ts=start_ts, end_ts=end_ts)
+    return _stream_with_archives(db, stmt.order_by(models.Order.timestamp, models.OrderItem.orderId), chunk_size,
+                                 start_ts, end_ts, key=lambda r: (r["timestamp"], r["orderId"]))
+
+def iter_stock_logs_export(db: Session, start_ts: Optional[int] = None, end_ts: Optional[int] = None,
+                           product_id: Optional[str] = None, chunk_size: int = 1000) -> Iterator[dict]:
+    stmt = select(*models.StockLog.__table__.columns)
+    if product_id:
+        stmt = stmt.where(models.StockLog.productId == product_id)
+    if start_ts is not None:
+        stmt = stmt.where(models.StockLog.timestamp >= start_ts)
+    if end_ts is not None:
+        stmt = stmt.where(models.StockLog.timestamp <= end_ts)
+    return _stream_with_archives(db, stmt.order_by(models.StockLog.timestamp, models.StockLog.id), chunk_size,
+                                 start_ts, end_ts, key=lambda r: (r["timestamp"], r["id"]))
+
+def _dialect_insert(db: Session):
+    if db.get_bind().dialect.name == "postgresql":
+        return postgresql.insert
+    return sqlite.insert
+
+def _accumulate_rollups(sources: Iterable[tuple]) -> List[dict]:
+    """sources: (timestamp, type, paymentMethod, area, orders, gross, cost, discount)"""
+    acc: Dict[tuple, list] = {}
+    for ts, otype, payment, area, count, gross, cost, discount in sources:
+        values = {"all": "", "type": otype or "", "payment": payment or "", "area": area or ""}
+        for granularity, size in ROLLUP_GRANULARITIES.items():
+            bucket = ts - ts % size
+            for dimension in ROLLUP_DIMENSIONS:
+                row = acc.setdefault((granularity, dimension, bucket, values[dimension]), [0, 0.0, 0.0, 0.0])
+                row[0] += count
+                row[1] += gross or 0.0
+                row[2] += cost or 0.0
+                row[3] += discount or 0.0
+    return [
+        {"granularity": g, "dimension": d, "bucketStart": b, "dimensionValue": v,
+         "orders": r[0], "gross": r[1], "cost": r[2], "discount": r[3]}
+        for (g, d, b, v), r in acc.items()
+    ]
+
+def _upsert_rollups(db: Session, rows: List[dict]) -> None:
+    if not rows:
+        return
+    rollup = models.SalesRollup
+    stmt = _dialect_insert(db)(rollup)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=["granularity", "dimension", "bucketStart", "dimensionValue"],
+        set_={
+            "orders": rollup.orders + stmt.excluded.orders,
+            "gross": rollup.gross + stmt.excluded.gross,
+            "cost": rollup.cost + stmt.excluded.cost,
+            "discount": rollup.discount + stmt.excluded.discount,
+        },
+    )
+    db.execute(stmt, rows)
+
+def record_sales_rollups(db: Session, orders: List[dict]) -> None:
+    """把新写入的订单累加到预聚合表，不提交，随订单事务一起生效"""
+    if not orders:
+        return
+    table_ids = list({o["tableId"] for o in orders})
+    areas = dict(db.execute(select(models.Table.id, models.Table.area).where(models.Table.id.in_(table_ids))).all())
+    _upsert_rollups(db, _accumulate_rollups(
+        (o["timestamp"], o["type"], o.get("paymentMethod"), areas.get(o["tableId"]), 1,
+         o["total"], o.get("totalCost"), o.get("discount"))
+        for o in orders
+    ))
+
+def rebuild_sales_rollups(db: Session, start_ts: Optional[int] = None, end_ts: Optional[int] = None) -> int:
+    """按原始订单重算覆盖 [start_ts, end_ts] 的整天预聚合（补数/校正任务），返回写入行数"""
+    if start_ts is None or end_ts is None:
+        lo_ts, hi_ts = db.execute(select(func.min(models.Order.timestamp), func.max(models.Order.timestamp))).one()
+        if lo_ts is None:
+            return 0
+        start_ts = lo_ts if start_ts is None else start_ts
+        end_ts = hi_ts if end_ts is None else end_ts
+    day = ROLLUP_GRANULARITIES["day"]
+    lo = start_ts - start_ts % day
+    hi = end_ts - end_ts % day + day
+    # 已归档时段的订单不在热表中，保留其预聚合不重算
+    until = archive.archived_until(db)
+    if until is not None:
+        lo = max(lo, -(-until // day) * day)
+    if lo >= hi:
+        return 0
+
+    hour = models.Order.timestamp - models.Order.timestamp % ROLLUP_GRANULARITIES["hour"]
+    stmt = select(
+        hour, models.Order.type, models.Order.paymentMethod, models.Table.area,
+        func.count(models.Order.id), func.sum(models.Order.total),
+        func.sum(models.Order.totalCost), func.sum(models.Order.discount),
+    ).outerjoin(models.Table, models.Table.id == models.Order.tableId).where(
+        models.Order.timestamp >= lo, models.Order.timestamp < hi
+    ).group_by(hour, models.Order.type, models.Order.paymentMethod, models.Table.area)
+
+    rows = _accumulate_rollups(db.execute(stmt).all())
+    db.execute(delete(models.SalesRollup).where(
+        models.SalesRollup.bucketStart >= lo, models.SalesRollup.bucketStart < hi
+    ))
+    _upsert_rollups(db, rows)
+    db.commit()
+    return len(rows)
+
+def sales_rollup_watermark(db: Session) -> Optional[int]:
+    """预聚合完整覆盖的起始时间戳；None 表示尚未补算，不能读预聚合表"""
+    value = get_config_value(db, ROLLUP_WATERMARK_KEY)
+    return None if value is None else int(value)
+
+def catch_up_sales_rollups(db: Session) -> Optional[int]:
+    """启动时补算：还没有水位时按原始订单重算全部预聚合（包括预聚合上线前写入的订单），再写入水位。
+    已归档的时段不重算，水位取归档边界之后的第一个整天。已有水位时跳过，返回重算的行数"""
+    if sales_rollup_watermark(db) is not None:
+        return None
+    count = rebuild_sales_rollups(db)
+    until = archive.archived_until(db)
+    day = ROLLUP_GRANULARITIES["day"]
+    watermark = 0 if until is None else -(-until // day) * day
+    set_config_value(db, ROLLUP_WATERMARK_KEY, str(watermark), group="analytics")
+    db.commit()
+    return count
+
+def get_config_value(db: Session, key: str, default: Optional[str] = None) -> Optional[str]:
+    value = db.execute(select(models.SystemConfig.value).where(models.SystemConfig.key == key)).scalar()
+    return default if value is None else value
+
+def set_config_value(db: Session, key: str, value: str, group: Optional[str] = None) -> None:
+    """写入 system_configs（存在则覆盖），不提交"""
+    now = datetime.utcnow().isoformat()
+    stmt = _dialect_insert(db)(models.SystemConfig).values(
+        key=key, value=value, type="string", group=group, createdAt=now,
+    )
+    db.execute(stmt.on_conflict_do_update(
+        index_elements=["key"], set_={"value": stmt.excluded.value, "updatedAt": now},
+    ))
+
+def touch_config_version(db: Session, key: str) -> None:
+    """把 system_configs 中的版本键更新为新的随机值，不提交，随调用方的事务一起生效；
+    各进程的缓存比对该值判断是否过期"""
+    set_config_value(db, key, uuid.uuid4().hex, group="cache")
+
+def get_store_timezone(db: Session, tz: Optional[str] = None) -> ZoneInfo:
+    """门店时区：优先使用参数，其次 SystemConfig 中的 store.timezone，默认 STORE_TIMEZONE 环境变量"""
+    name = tz or get_config_value(db, STORE_TIMEZONE_KEY, DEFAULT_STORE_TIMEZONE)
+    try:
+        return ZoneInfo(name)
+    except (ZoneInfoNotFoundError, ValueError):
+        raise ValueError(f"未知时区: {name}")
+
+def _utc_offset(tz: ZoneInfo, ts: int) -> int:
+    return int(datetime.fromtimestamp(ts, tz).utcoffset().total_seconds())
+
+def _offset_segments(tz: ZoneInfo, start_ts: int, end_ts: int) -> List[Tuple[int, int, int]]:
+    """把 [start_ts, end_ts] 按夏令时切换拆成若干 UTC 偏移不变的区间
+
+    先按天探测偏移变化，再以 15 分钟为步长定位切换时刻（现行时区的切换都落在 15 分钟边界上，
+    如 Australia/Lord_Howe 在 UTC 半点切换）；一天内切换两次的时区不受支持。
+    """
+    segments = []
+    seg_start = start_ts
+    offset = _utc_offset(tz, start_ts)
+    step = ROLLUP_GRANULARITIES["day"]
+    probe = start_ts
+    while probe < end_ts:
+        nxt = min(probe + step, end_ts)
+        if _utc_offset(tz, nxt) != offset:
+            quarter = 900
+            t = probe - probe % quarter + quarter
+            while _utc_offset(tz, t) == offset:
+                t += quarter
+            segments.append((seg_start, t - 1, offset))
+            seg_start, offset = t, _utc_offset(tz, t)
+            nxt = t
+        probe = nxt
+    segments.append((seg_start, end_ts, offset))
+    return segments
+
+def _bucket_label(db: Session, local_ts, granularity: str):
+    """在 SQL 中把本地时间戳（秒）转换为分桶标签"""
+    if db.get_bind().dialect.name == "postgresql":
+        ts = func.timezone("UTC", func.to_timestamp(local_ts))
+        if granularity == "week":
+            return func.to_char(func.date_trunc("week", ts), "YYYY-MM-DD")
+        fmt = {"hour": "YYYY-MM-DD HH24:00", "day": "YYYY-MM-DD", "month": "YYYY-MM"}[granularity]
+        return func.to_char(ts, fmt)
+    if granularity == "week":
+        return func.date(local_ts, "unixepoch", "weekday 0", "-6 days")
+    fmt = {"hour": "%Y-%m-%d %H:00", "day": "%Y-%m-%d", "month": "%Y-%m"}[granularity]
+    return func.strftime(fmt, local_ts, "unixepoch")
+
+def _raw_sales_buckets(db: Session, start_ts: int, end_ts: int, granularity: str, offset: int) -> List[tuple]:
+    rows = []
+    with _archived_sessions(db, start_ts, end_ts) as archived:
+        for src in [db, *archived]:
+            label = _bucket_label(src, models.Order.timestamp + offset, granularity)
+            rows += src.execute(select(
+                label, func.count(models.Order.id), func.sum(models.Order.total),
+                func.sum(models.Order.totalCost), func.sum(models.Order.discount),
+            ).where(models.Order.timestamp >= start_ts).where(models.Order.timestamp <= end_ts).group_by(label)).all()
+    return rows
+
+def _rollup_sales_buckets(db: Session, source: str, start_ts: int, end_ts: int, granularity: str, offset: int) -> List[tuple]:
+    rollup = models.SalesRollup
+    label = _bucket_label(db, rollup.bucketStart + offset, granularity)
+    return db.execute(select(
+        label, func.sum(rollup.orders), func.sum(rollup.gross), func.sum(rollup.cost), func.sum(rollup.discount),
+    ).where(
+        rollup.granularity == source, rollup.dimension == "all", rollup.dimensionValue == "",
+        rollup.bucketStart >= start_ts, rollup.bucketStart < end_ts,
+    ).group_by(label)).all()
+
+def sales_summary(db: Session, start_ts: int, end_ts: int, granularity: str = "day", tz: Optional[str] = None) -> List[dict]:
+    """按门店时区分桶（hour/day/week/month）的销售汇总
+
+    整桶部分读预聚合表（UTC 整天对齐时用日表，否则用小时表），首尾不足一桶的部分回查原始订单；
+    时区偏移不是整小时的门店、以及预聚合水位之前（启动补算完成前为全部）的时段回查原始订单。
+    日表按 UTC 日分桶，非 UTC 门店的本地日与其不对齐，按天汇总时改读小时表：每天 24 行，
+    一年约 8760 行，走 idx_sales_rollup_bucket 范围扫描，代价与 UTC 门店读日表相比仍可忽略，因此不另建本地日桶。
+    夏令时切换不在整点的时段（切换时刻到下一整点）回查原始订单。
+    """
+    zone = get_store_timezone(db, tz)
+    watermark = sales_rollup_watermark(db)
+    buckets: Dict[str, list] = {}
+    def add(rows):
+        for label, orders, gross, cost, discount in rows:
+            row = buckets.setdefault(label, [0, 0.0, 0.0, 0.0])
+            row[0] += int(orders or 0)
+            row[1] += float(gross or 0.0)
+            row[2] += float(cost or 0.0)
+            row[3] += float(discount or 0.0)
+
+    for seg_start, seg_end, offset in _offset_segments(zone, start_ts, end_ts):
+        if offset % ROLLUP_GRANULARITIES["hour"] or watermark is None or watermark > seg_end:
+            add(_raw_sales_buckets(db, seg_start, seg_end, granularity, offset))
+            continue
+        if seg_start < watermark:
+            add(_raw_sales_buckets(db, seg_start, watermark - 1, granularity, offset))
+            seg_start = watermark
+        source = "day" if offset % ROLLUP_GRANULARITIES["day"] == 0 and granularity != "hour" else "hour"
+        size = ROLLUP_GRANULARITIES[source]
+        first_full = -(-seg_start // size) * size
+        last_full = (seg_end + 1) // size * size
+        if first_full >= last_full:
+            add(_raw_sales_buckets(db, seg_start, seg_end, granularity, offset))
+            continue
+        if seg_start < first_full:
+            add(_raw_sales_buckets(db, seg_start, first_full - 1, granularity, offset))
+        add(_rollup_sales_buckets(db, source, first_full, last_full, granularity, offset))
+        if last_full <= seg_end:
+            add(_raw_sales_buckets(db, last_full, seg_end, granularity, offset))
+
+    return [
+        {"date": label, "orders": r[0], "gross": r[1], "cost": r[2], "discount": r[3]}
+        for label, r in sorted(buckets.items())
+    ]
+
+def _raw_hourly_buckets(db: Session, start_ts: int, end_ts: int, offset: int) -> List[tuple]:
+    hour_of_day = (models.Order.timestamp + offset) % ROLLUP_GRANULARITIES["day"] // ROLLUP_GRANULARITIES["hour"]
+    stmt = select(
+        hour_of_day, func.count(models.Order.id), func.sum(models.Order.total),
+    ).where(models.Order.timestamp >= start_ts).where(models.Order.timestamp <= end_ts).group_by(hour_of_day)
+    with _archived_sessions(db, start_ts, end_ts) as archived:
+        return [row for src in [db, *archived] for row in src.execute(stmt).all()]
+
+def _rollup_hourly_buckets(db: Session, start_ts: int, end_ts: int, offset: int) -> List[tuple]:
+    rollup = models.SalesRollup
+    hour_of_day = (rollup.bucketStart + offset) % ROLLUP_GRANULARITIES["day"] // ROLLUP_GRANULARITIES["hour"]
+    return db.execute(select(
+        hour_of_day, func.sum(rollup.orders), func.sum(rollup.gross),
+    ).where(
+        rollup.granularity == "hour", rollup.dimension == "all", rollup.dimensionValue == "",
+        rollup.bucketStart >= start_ts, rollup.bucketStart < end_ts,
+    ).group_by(hour_of_day)).all()
+
+def hourly_sales_curve(db: Session, start_ts: int, end_ts: int, tz: Optional[str] = None) -> List[dict]:
+    """按门店本地小时（0-23）汇总的时段销售曲线，水位之后的整小时部分读预聚合表"""
+    zone = get_store_timezone(db, tz)
+    watermark = sales_rollup_watermark(db)
+    curve = [[0, 0.0] for _ in range(24)]
+    def add(rows):
+        for hour, orders, gross in rows:
+            curve[int(hour)][0] += int(orders or 0)
+            curve[int(hour)][1] += float(gross or 0.0)
+
+    size = ROLLUP_GRANULARITIES["hour"]
+    for seg_start, seg_end, offset in _offset_segments(zone, start_ts, end_ts):
+        if watermark is None or watermark > seg_end:
+            add(_raw_hourly_buckets(db, seg_start, seg_end, offset))
+            continue
+        if seg_start < watermark:
+            add(_raw_hourly_buckets(db, seg_start, watermark - 1, offset))
+            seg_start = watermark
+        first_full = -(-seg_start // size) * size
+        last_full = (seg_end + 1) // size * size
+        if offset % size or first_full >= last_full:
+            add(_raw_hourly_buckets(db, seg_start, seg_end, offset))
+            continue
+        if seg_start < first_full:
+            add(_raw_hourly_buckets(db, seg_start, first_full - 1, offset))
+        add(_rollup_hourly_buckets(db, first_full, last_full, offset))
+        if last_full <= seg_end:
+            add(_raw_hourly_buckets(db, last_full, seg_end, offset))
+
+    return [{"hour": h, "orders": r[0], "gross": r[1]} for h, r in enumerate(curve)]
+
+def sales_breakdown(db: Session, dimension: str, start_ts: int, end_ts: int) -> List[dict]:
+    """按订单类型/支付方式/桌台区域汇总（小时对齐）；只读预聚合表，启动补算完成前不含预聚合上线前的订单"""
+    rollup = models.SalesRollup
+    rows = db.execute(select(
+        rollup.dimensionValue, func.sum(rollup.orders), func.sum(rollup.gross),
+        func.sum(rollup.cost), func.sum(rollup.discount),
+    ).where(
+        rollup.granularity == "hour", rollup.dimension == dimension,
+        rollup.bucketStart >= start_ts - start_ts % ROLLUP_GRANULARITIES["hour"], rollup.bucketStart <= end_ts,
+    ).group_by(rollup.dimensionValue).order_by(func.sum(rollup.gross).desc())).all()
+    return [
+        {"key": r[0] or None, "orders": int(r[1] or 0), "gross": float(r[2] or 0.0),
+         "cost": float(r[3] or 0.0), "discount": float(r[4] or 0.0)}
+        for r in rows
+    ]
+
+def _window(stmt, column, start_ts: Optional[int], end_ts: Optional[int]):
+    if start_ts is not None:
+        stmt = stmt.where(column >= start_ts)
+    if end_ts is not None:
+        stmt = stmt.where(column <= end_ts)
+    return stmt
+
+def top_products(db: Session, start_ts: Optional[int] = None, end_ts: Optional[int] = None, limit: int = 10,
+                 sort_by: str = "revenue") -> List[dict]:
+    """商品销量/销售额/毛利排行（不含已取消、已退款订单）；与 gross_margin 一致，
+    未记录成本的订单项只计入 revenue 和 revenueWithoutCost，毛利按有成本的销售额计算"""
+    item = models.OrderItem
+    revenue = func.sum(item.price * item.quantity).label("revenue")
+    uncosted = func.sum(case((item.costPrice.is_(None), item.price * item.quantity), else_=0)).label("uncosted")
+    cost = func.sum(func.coalesce(item.costPrice, 0) * item.quantity).label("cost")
+    quantity = func.sum(item.quantity).label("quantity")
+    profit = (revenue - uncosted - cost).label("profit")
+    stmt = select(item.productId, func.max(item.name), quantity, revenue, cost, uncosted).join(
+        models.Order, models.Order.id == item.orderId
+    ).where(models.Order.status.not_in(NON_REVENUE_ORDER_STATUSES))
+    stmt = _window(stmt, models.Order.timestamp, start_ts, end_ts)
+    order_col = {"revenue": revenue, "quantity": quantity, "profit": profit}[sort_by]
+    stmt = stmt.group_by(item.productId).order_by(desc(order_col))
+    with _archived_sessions(db, start_ts, end_ts) as archived:
+        if not archived:
+            rows = db.execute(stmt.limit(limit)).all()
+        else:
+            # 各库分别聚合后按商品合并再排序
+            merged: Dict[str, list] = {}
+            for src in [db, *archived]:
+                for pid, name, qty, rev, cst, unc in src.execute(stmt).all():
+                    row = merged.setdefault(pid, [pid, name, 0, 0.0, 0.0, 0.0])
+                    row[2] += qty or 0
+                    row[3] += rev or 0.0
+                    row[4] += cst or 0.0
+                    row[5] += unc or 0.0
+            sort_key = {
+                "revenue": lambda r: r[3], "quantity": lambda r: r[2], "profit": lambda r: r[3] - r[5] - r[4],
+            }[sort_by]
+            rows = sorted(merged.values(), key=sort_key, reverse=True)[:limit]
+    return [
+        {"productId": r[0], "name": r[1], "quantity": int(r[2] or 0), "revenue": float(r[3] or 0.0),
+         "cost": float(r[4] or 0.0), "profit": float((r[3] or 0.0) - (r[5] or 0.0) - (r[4] or 0.0)),
+         "revenueWithoutCost": float(r[5] or 0.0)}
+        for r in rows
+    ]
+
+def category_sales(db: Session, start_ts: Optional[int] = None, end_ts: Optional[int] = None) -> List[dict]:
+    """分类销售构成（不含已取消、已退款订单）"""
+    item = models.OrderItem
+    revenue = func.sum(item.price * item.quantity)
+    stmt = select(
+        models.Category.id, models.Category.name, revenue, func.count(func.distinct(item.orderId)),
+        func.sum(item.quantity), func.sum(func.coalesce(item.costPrice, 0) * item.quantity),
+    ).select_from(item).join(models.Order, models.Order.id == item.orderId).join(
+        models.Product, models.Product.id == item.productId
+    ).join(models.Category, models.Category.id == models.Product.categoryId).where(
+        models.Order.status.not_in(NON_REVENUE_ORDER_STATUSES))
+    stmt = _window(stmt, models.Order.timestamp, start_ts, end_ts)
+    # 已删除商品的历史销量仍计入其分类
+    stmt = stmt.group_by(models.Category.id, models.Category.name).order_by(desc(revenue)).execution_options(
+        include_deleted=True)
+    rows = [list(r) for r in db.execute(stmt).all()]
+    with _archived_sessions(db, start_ts, end_ts) as archived:
+        if archived:
+            rows = _merge_archived_category_sales(db, rows, archived, start_ts, end_ts)
+    return [
+        {"categoryId": r[0], "name": r[1], "revenue": float(r[2] or 0.0), "orders": int(r[3] or 0),
+         "quantity": int(r[4] or 0), "cost": float(r[5] or 0.0)}
+        for r in rows
+    ]
+
+def _merge_archived_category_sales(db: Session, rows: List[list], archived: List[Session],
+                                   start_ts: Optional[int], end_ts: Optional[int]) -> List[list]:
+    """归档库的订单项带有归档时的 categoryId，分类名称取自主库"""
+    item, order = archive.ARCHIVE_ORDER_ITEMS, archive.ARCHIVE_ORDERS
+    revenue = func.sum(item.c.price * item.c.quantity)
+    stmt = select(
+        item.c.categoryId, revenue, func.count(func.distinct(item.c.orderId)),
+        func.sum(item.c.quantity), func.sum(func.coalesce(item.c.costPrice, 0) * item.c.quantity),
+    ).join(order, order.c.id == item.c.orderId).where(
+        item.c.categoryId.is_not(None), order.c.status.not_in(NON_REVENUE_ORDER_STATUSES))
+    stmt = _window(stmt, order.c.timestamp, start_ts, end_ts).group_by(item.c.categoryId)
+    merged = {r[0]: r for r in rows}
+    for src in archived:
+        for cid, rev, orders, qty, cost in src.execute(stmt).all():
+            row = merged.setdefault(cid, [cid, None, 0.0, 0, 0, 0.0])
+            row[2] = (row[2] or 0.0) + (rev or 0.0)
+            row[3] = (row[3] or 0) + (orders or 0)
+            row[4] = (row[4] or 0) + (qty or 0)
+            row[5] = (row[5] or 0.0) + (cost or 0.0)
+    missing = [cid for cid, r in merged.items() if r[1] is None]
+    if missing:
+        names = dict(db.execute(select(models.Category.id, models.Category.name).where(
+            models.Category.id.in_(missing))).all())
+        for cid in missing:
+            merged[cid][1] = names.get(cid)
+    return sorted((r for r in merged.values() if r[1] is not None), key=lambda r: r[2] or 0.0, reverse=True)
+
+def gross_margin(db: Session, start_ts: Optional[int] = None, end_ts: Optional[int] = None) -> dict:
+    """毛利汇总：成本取订单 totalCost；未记录成本的订单只计入 revenue 和 revenueWithoutCost，
+    毛利和毛利率按有成本的营业额计算。已取消、已退款的订单不计入"""
+    order = models.Order
+    stmt = select(
+        func.count(order.id), func.sum(order.total), func.sum(order.totalCost),
+        func.sum(case((order.totalCost.is_(None), order.total), else_=0)),
+    ).where(order.status.not_in(NON_REVENUE_ORDER_STATUSES))
+    stmt = _window(stmt, order.timestamp, start_ts, end_ts)
+    orders = revenue = cost = uncosted = 0
+    with _archived_sessions(db, start_ts, end_ts) as archived:
+        for src in [db, *archived]:
+            o, r, c, u = src.execute(stmt).one()
+            orders += o or 0
+            revenue += r or 0.0
+            cost += c or 0.0
+            uncosted += u or 0.0
+    revenue = float(revenue)
+    cost = float(cost)
+    costed = revenue - float(uncosted)
+    profit = costed - cost
+    return {
+        "orders": int(orders or 0),
+        "revenue": revenue,
+        "cost": cost,
+        "grossProfit": profit,
+        "marginRate": profit / costed if costed else 0.0,
+        "revenueWithoutCost": float(uncosted),
+    }
 
+def insight_digest(db: Session, start_ts: int, end_ts: int, tz: Optional[str] = None, top: int = 5) -> dict:
+    """AI 经营洞察的输入摘要：窗口汇总、每日趋势、热销商品、时段曲线和订单类型构成"""
+    zone = get_store_timezone(db, tz)
+    totals = gross_margin(db, start_ts, end_ts)
+    daily = sales_summary(db, start_ts, end_ts, "day", zone.key)
+    return {
+        "window": {
+            "start": datetime.fromtimestamp(start_ts, zone).strftime("%Y-%m-%d %H:%M"),
+            "end": datetime.fromtimestamp(end_ts, zone).strftime("%Y-%m-%d %H:%M"),
+            "timezone": zone.key,
+        },
+        "totals": {
+            "orders": totals["orders"],
+            "revenue": round(totals["revenue"], 2),
+            "grossProfit": round(totals["grossProfit"], 2),
+            "marginRate": round(totals["marginRate"], 4),
+            "averageOrderValue": round(totals["revenue"] / totals["orders"], 2) if totals["orders"] else 0.0,
+        },
+        "daily": [
+            {"date": d["date"], "orders": d["orders"], "revenue": round(d["gross"], 2)} for d in daily
+        ],
+        "topProducts": [
+            {"name": p["name"], "quantity": p["quantity"], "revenue": round(p["revenue"], 2),
+             "profit": round(p["profit"], 2)}
+            for p in top_products(db, start_ts, end_ts, top, "revenue")
+        ],
+        "hourly": [
+            {"hour": h["hour"], "orders": h["orders"], "revenue": round(h["gross"], 2)}
+            for h in hourly_sales_curve(db, start_ts, end_ts, zone.key) if h["orders"]
+        ],
+        "byType": [
+            {"type": b["key"], "orders": b["orders"], "revenue": round(b["gross"], 2)}
+            for b in sales_breakdown(db, "type", start_ts, end_ts)
+        ],
+    }
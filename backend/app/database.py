@@ -1,11 +1,174 @@
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker, declarative_base
+"""
+数据库配置 - 根据 DATABASE_URL 选择 SQLite / PostgreSQL 引擎参数
+"""
 
-SQLALCHEMY_DATABASE_URL = "sqlite:///backend/saas.db"
+import os
+
+from sqlalchemy import create_engine, event, text
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+from sqlalchemy.orm import Session, sessionmaker, declarative_base
+from sqlalchemy.pool import StaticPool
+
+SQLALCHEMY_DATABASE_URL = os.environ.get("DATABASE_URL", "sqlite:///backend/saas.db")
+
+# 异步驱动：sqlite -> aiosqlite，postgresql -> asyncpg
+ASYNC_DRIVERS = {"sqlite": "aiosqlite", "postgresql": "asyncpg"}
+
+# 连接池
+DB_POOL_SIZE = int(os.environ.get("DB_POOL_SIZE", "10"))
+DB_MAX_OVERFLOW = int(os.environ.get("DB_MAX_OVERFLOW", "20"))
+DB_POOL_TIMEOUT = int(os.environ.get("DB_POOL_TIMEOUT", "30"))
+DB_POOL_RECYCLE = int(os.environ.get("DB_POOL_RECYCLE", "1800"))
+
+# SQLite 连接级 PRAGMA
+SQLITE_JOURNAL_MODE = os.environ.get("SQLITE_JOURNAL_MODE", "WAL")
+SQLITE_SYNCHRONOUS = os.environ.get("SQLITE_SYNCHRONOUS", "NORMAL")
+SQLITE_BUSY_TIMEOUT_MS = int(os.environ.get("SQLITE_BUSY_TIMEOUT_MS", "5000"))
+SQLITE_MMAP_SIZE = int(os.environ.get("SQLITE_MMAP_SIZE", str(256 * 1024 * 1024)))
+SQLITE_CACHE_SIZE_KB = int(os.environ.get("SQLITE_CACHE_SIZE_KB", str(64 * 1024)))
+
+# PostgreSQL 会话参数
+PG_STATEMENT_TIMEOUT_MS = int(os.environ.get("PG_STATEMENT_TIMEOUT_MS", "30000"))
+PG_APPLICATION_NAME = os.environ.get("PG_APPLICATION_NAME", "saas-pos")
+
+
+def _is_sqlite_memory(url) -> bool:
+    return url.database in (None, "", ":memory:")
+
+
+def sqlite_pragmas(url) -> list[str]:
+    """每个新连接上执行的 PRAGMA 语句"""
+    pragmas = [
+        f"PRAGMA busy_timeout={SQLITE_BUSY_TIMEOUT_MS}",
+        f"PRAGMA synchronous={SQLITE_SYNCHRONOUS}",
+        f"PRAGMA cache_size=-{SQLITE_CACHE_SIZE_KB}",
+        "PRAGMA temp_store=MEMORY",
+    ]
+    if not _is_sqlite_memory(url):
+        pragmas.insert(0, f"PRAGMA journal_mode={SQLITE_JOURNAL_MODE}")
+        pragmas.append(f"PRAGMA mmap_size={SQLITE_MMAP_SIZE}")
+    return pragmas
+
+
+def async_database_url(database_url: str) -> str:
+    """把同步连接串换成对应的异步驱动"""
+    override = os.environ.get("ASYNC_DATABASE_URL")
+    if override:
+        return override
+    url = make_url(database_url)
+    driver = ASYNC_DRIVERS.get(url.get_backend_name())
+    if driver is None:
+        raise ValueError(f"不支持异步访问的数据库: {url.get_backend_name()}")
+    return url.set(drivername=f"{url.get_backend_name()}+{driver}").render_as_string(hide_password=False)
+
+
+def engine_options(database_url: str) -> dict:
+    """按数据库方言生成 create_engine / create_async_engine 参数"""
+    url = make_url(database_url)
+    backend = url.get_backend_name()
+
+    if backend == "sqlite":
+        options = {
+            "connect_args": {
+                "check_same_thread": False,
+                "timeout": SQLITE_BUSY_TIMEOUT_MS / 1000,
+            },
+        }
+        if _is_sqlite_memory(url):
+            # 内存库只能共享同一个连接
+            options["poolclass"] = StaticPool
+        else:
+            options.update(
+                pool_size=DB_POOL_SIZE,
+                max_overflow=DB_MAX_OVERFLOW,
+                pool_timeout=DB_POOL_TIMEOUT,
+            )
+        return options
+
+    if backend == "postgresql":
+        options = {
+            "pool_size": DB_POOL_SIZE,
+            "max_overflow": DB_MAX_OVERFLOW,
+            "pool_timeout": DB_POOL_TIMEOUT,
+            "pool_recycle": DB_POOL_RECYCLE,
+            "pool_pre_ping": True,
+        }
+        if url.get_driver_name() == "asyncpg":
+            options["connect_args"] = {
+                "server_settings": {
+                    "application_name": PG_APPLICATION_NAME,
+                    "statement_timeout": str(PG_STATEMENT_TIMEOUT_MS),
+                },
+            }
+        else:
+            options["connect_args"] = {
+                "application_name": PG_APPLICATION_NAME,
+                "options": f"-c statement_timeout={PG_STATEMENT_TIMEOUT_MS}",
+            }
+        return options
+
+    return {"pool_pre_ping": True}
+
+
+def configure_engine(engine) -> None:
+    """为 SQLite 引擎注册连接时的 PRAGMA 设置"""
+    url = engine.url
+    if url.get_backend_name() != "sqlite":
+        return
+
+    pragmas = sqlite_pragmas(url)
+
+    @event.listens_for(engine, "connect")
+    def _set_sqlite_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        try:
+            for pragma in pragmas:
+                cursor.execute(pragma)
+        finally:
+            cursor.close()
+
+
+engine = create_engine(SQLALCHEMY_DATABASE_URL, **engine_options(SQLALCHEMY_DATABASE_URL))
+configure_engine(engine)
 
-engine = create_engine(
-    SQLALCHEMY_DATABASE_URL, connect_args={"check_same_thread": False}
-)
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 Base = declarative_base()
 
+ASYNC_DATABASE_URL = async_database_url(SQLALCHEMY_DATABASE_URL)
+async_engine = create_async_engine(ASYNC_DATABASE_URL, **engine_options(ASYNC_DATABASE_URL))
+configure_engine(async_engine.sync_engine)
+
+# expire_on_commit=False：提交后仍可序列化已加载的对象，避免在事件循环中触发惰性加载
+AsyncSessionLocal = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
+
+
+# 已被替换的索引：改了列的索引使用新名字，旧库中的同名旧索引在启动时删除
+OBSOLETE_INDEXES = (
+    "idx_order_timestamp",  # 单列 timestamp，已由 idx_order_timestamp_id 取代
+)
+
+
+def create_indexes(bind) -> None:
+    """create_all 不会给已存在的表补建索引；逐个检查并创建模型中新增的索引，再删除已替换的旧索引"""
+    for table in Base.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(bind=bind, checkfirst=True)
+    with bind.begin() as conn:
+        for name in OBSOLETE_INDEXES:
+            conn.execute(text(f"DROP INDEX IF EXISTS {name}"))
+
+
+def get_db():
+    """同步会话依赖"""
+    db: Session = SessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
+
+
+async def get_async_db():
+    """异步会话依赖，配合 AsyncSession.run_sync 复用 crud 中的函数"""
+    async with AsyncSessionLocal() as db:
+        yield db
@@ -0,0 +1,88 @@
+"""
+后台任务命令行入口
+
+用法:
+    python -m backend.app.jobs rebuild-rollups [--start-ts N] [--end-ts N]
+    python -m backend.app.jobs purge-deleted [--days 180] [--archive deleted.ndjson]
+    python -m backend.app.jobs archive-orders [--days 180] [--vacuum]
+"""
+
+import argparse
+import time
+from datetime import datetime, timedelta
+
+from sqlalchemy import text
+
+from backend.app.database import Base, engine, SessionLocal, create_indexes
+from backend.app import archive, crud, member_search
+
+
+def rebuild_rollups(args) -> None:
+    """按原始订单重算销售预聚合"""
+    db = SessionLocal()
+    try:
+        count = crud.rebuild_sales_rollups(db, args.start_ts, args.end_ts)
+        print(f"✓ 已重算销售汇总 {count} 行")
+    finally:
+        db.close()
+
+
+def purge_deleted(args) -> None:
+    """物理删除软删除超过 --days 天且不再被历史数据引用的商品、供应商和会员"""
+    before = (datetime.utcnow() - timedelta(days=args.days)).isoformat()
+    archive = open(args.archive, "a", encoding="utf-8") if args.archive else None
+    db = SessionLocal()
+    try:
+        counts = crud.purge_soft_deleted(db, before, archive)
+        print(f"✓ 已清除 {counts}" + (f"，归档到 {args.archive}" if archive else ""))
+    finally:
+        db.close()
+        if archive:
+            archive.close()
+
+
+def archive_orders(args) -> None:
+    """把超过 --days 天的已结束订单和库存日志移入按月归档库"""
+    before = int(time.time()) - args.days * archive.DAY
+    before -= before % archive.DAY
+    db = SessionLocal()
+    try:
+        for month in archive.archive_before(db, before):
+            print(f"✓ {month['month']}: 订单 {month['orders']}，订单项 {month['orderItems']}，库存日志 {month['stockLogs']}")
+    finally:
+        db.close()
+    if args.vacuum:
+        # 归还删除行占用的空间；VACUUM 不能在事务中执行
+        with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+            conn.execute(text("VACUUM" if engine.dialect.name == "sqlite" else "VACUUM ANALYZE"))
+        print("✓ 已压缩主库")
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(prog="python -m backend.app.jobs", description="SaaS POS 后台任务")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p = sub.add_parser("rebuild-rollups", help="重算销售预聚合表")
+    p.add_argument("--start-ts", type=int, default=None, help="起始时间戳（秒），默认最早订单")
+    p.add_argument("--end-ts", type=int, default=None, help="结束时间戳（秒），默认最新订单")
+    p.set_defaults(func=rebuild_rollups)
+
+    p = sub.add_parser("purge-deleted", help="清除早已软删除的行")
+    p.add_argument("--days", type=int, default=180, help="删除超过多少天后清除")
+    p.add_argument("--archive", default=None, help="清除前追加写入的 NDJSON 文件")
+    p.set_defaults(func=purge_deleted)
+
+    p = sub.add_parser("archive-orders", help="归档早于保留期的已结束订单")
+    p.add_argument("--days", type=int, default=archive.ARCHIVE_AFTER_DAYS, help="保留最近多少天的订单（按整天取整）")
+    p.add_argument("--vacuum", action="store_true", help="归档后压缩主库文件")
+    p.set_defaults(func=archive_orders)
+
+    args = parser.parse_args(argv)
+    Base.metadata.create_all(bind=engine)
+    create_indexes(engine)
+    member_search.create_index(engine)
+    args.func(args)
+
+
+if __name__ == "__main__":
+    main()
@@ -2,21 +2,28 @@
 FastAPI 应用主入口
 """
 
-import hashlib
+import asyncio
 import uuid
 from datetime import datetime
 from contextlib import asynccontextmanager
 
 from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, PlainTextResponse
 
-from backend.app.database import Base, engine, SessionLocal
+from backend.app.database import Base, engine, async_engine, AsyncSessionLocal, SessionLocal, create_indexes
+from backend.app.observability import ObservabilityMiddleware, logger, metrics, setup_logging, shutdown_logging
+from backend.app.profiling import QueryProfilingMiddleware, instrument_engine
 from backend.app.routers import (
     products, categories, suppliers, tables, users,
-    orders, reservations, inventory, analytics, auth, ai_proxy
+    orders, reservations, inventory, analytics, auth, ai_proxy,
+    exports, debug, menu
 )
-from backend.app import models
+from backend.app import crud, member_search, models
+from backend.app.realtime import hub
+from backend.app.passwords import hash_password
+from backend.app.token_store import run_token_sweeper
+from backend.app.signed_tokens import revocation_list
 
 
 # ==================== 应用生命周期管理 ====================
@@ -24,16 +31,47 @@ from backend.app import models
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     """应用启动和关闭时的处理"""
-    # 启动时：创建数据库表
+    # 启动日志输出线程
+    setup_logging()
+
+    # 启动时：创建数据库表，并为已有的表补建新增索引
     Base.metadata.create_all(bind=engine)
+    create_indexes(engine)
+    member_search.create_index(engine)
 
     # 创建默认管理员账户
     create_default_admin()
 
+    # 补算预聚合上线前的历史订单；完成前销售汇总回查原始订单
+    rollups_task = asyncio.create_task(asyncio.to_thread(catch_up_sales_rollups))
+
+    # 定期清理过期令牌
+    sweeper = asyncio.create_task(run_token_sweeper(revocation_list.purge_expired))
+    # 读取 table_changes 推送桌台变更
+    realtime_task = asyncio.create_task(hub.run(AsyncSessionLocal))
+
     yield
 
-    # 关闭时的清理工作（如果需要）
-    pass
+    # 关闭时：停止后台任务，释放异步连接池
+    sweeper.cancel()
+    realtime_task.cancel()
+    # 等轮询任务归还连接后再释放连接池，否则进行中的查询可能永远等不到结果
+    await asyncio.gather(sweeper, realtime_task, return_exceptions=True)
+    await async_engine.dispose()
+    shutdown_logging()
+
+
+def catch_up_sales_rollups():
+    """首次启动时重算销售预聚合并写入水位，已有水位时直接返回；多个 worker 同时执行结果相同"""
+    db = SessionLocal()
+    try:
+        count = crud.catch_up_sales_rollups(db)
+        if count is not None:
+            logger.info("sales rollups caught up: %d rows", count)
+    except Exception:
+        logger.exception("sales rollup catch-up failed")
+    finally:
+        db.close()
 
 
 def create_default_admin():
@@ -49,7 +87,7 @@ def create_default_admin():
             admin = models.SystemUser(
                 id=str(uuid.uuid4()),
                 username="admin",
-                passwordHash=hashlib.sha256("admin123".encode()).hexdigest(),
+                passwordHash=hash_password("admin123"),
                 name="系统管理员",
                 role="admin",
                 isActive=True,
@@ -98,8 +136,10 @@ app.add_middleware(
 @app.exception_handler(Exception)
 async def global_exception_handler(request: Request, exc: Exception):
     """全局异常处理器"""
-    # 记录错误（生产环境应使用日志系统）
-    print(f"[ERROR] {request.method} {request.url}: {exc}")
+    logger.error("unhandled exception", exc_info=exc, extra={"fields": {
+        "method": request.method,
+        "path": request.url.path,
+    }})
 
     return JSONResponse(
         status_code=500,
@@ -110,20 +150,13 @@ async def global_exception_handler(request: Request, exc: Exception):
     )
 
 
-# ==================== 请求日志中间件 ====================
-
-@app.middleware("http")
-async def log_requests(request: Request, call_next):
-    """请求日志中间件"""
-    # 记录请求（开发环境）
-    print(f"→ {request.method} {request.url.path}")
-
-    response = await call_next(request)
-
-    # 记录响应状态
-    print(f"← {request.method} {request.url.path} [{response.status_code}]")
+# ==================== 请求日志与指标 ====================
 
-    return response
+instrument_engine(engine)
+instrument_engine(async_engine.sync_engine)
+# 后添加的在外层：ObservabilityMiddleware 先建立请求统计，QueryProfilingMiddleware 再写响应头
+app.add_middleware(QueryProfilingMiddleware)
+app.add_middleware(ObservabilityMiddleware)
 
 
 # ==================== 注册路由 ====================
@@ -144,6 +177,11 @@ app.include_router(orders.router)
 app.include_router(reservations.router)
 app.include_router(inventory.router)
 app.include_router(analytics.router)
+app.include_router(exports.router)
+app.include_router(menu.router)
+
+# 调试路由
+app.include_router(debug.router)
 
 
 # ==================== 健康检查端点 ====================
@@ -158,6 +196,12 @@ async def health_check():
     }
 
 
+@app.get("/metrics", include_in_schema=False)
+async def get_metrics():
+    """Prometheus 指标"""
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
+
+
 @app.get("/")
 async def root():
     """根路径"""
@@ -0,0 +1,130 @@
+"""
+会员搜索索引 - 收银台按手机号前缀或姓名片段查找会员
+
+- 手机号前缀走 users.phone 上的唯一索引（范围查询），不需要额外结构
+- SQLite：姓名建 FTS5 trigram 表 users_fts，以外部内容表 users_search 为内容源。
+  users 没有 INTEGER PRIMARY KEY，VACUUM 或备份恢复会重排 rowid，不能直接用 rowid 对应；
+  users_search 以 INTEGER PRIMARY KEY 作为 FTS 的 rowid（VACUUM 不会改变），userId 上有唯一索引对应 users.id。
+  触发器随 users 的增删改同步 users_search，再由 users_search 的触发器按 rowid 更新 FTS，
+  改名和删除会员都是按索引的单行操作；任何写入路径（crud、批量导入、datagen）都会更新。
+- 片段不足 3 个字符时 trigram 无法匹配，改用 LIKE
+- PostgreSQL：pg_trgm 的 GIN 索引直接加速 ILIKE '%片段%'；没有建扩展的权限时退化为顺序扫描
+"""
+
+import logging
+from typing import Optional
+
+from sqlalchemy import text
+from sqlalchemy.exc import DBAPIError
+
+logger = logging.getLogger("pos.search")
+
+FTS_TABLE = "users_fts"
+SEARCH_TABLE = "users_search"
+# trigram 分词器只能匹配至少 3 个字符的片段
+MIN_FTS_LENGTH = 3
+
+# 含旧版直接建在 users 上的 users_fts_* 触发器，迁移时一并删除
+SQLITE_TRIGGERS = (
+    "users_fts_ai", "users_fts_ad", "users_fts_au", "users_search_ai", "users_search_ad", "users_search_au",
+)
+SQLITE_TABLES = (
+    f"CREATE TABLE {SEARCH_TABLE} (id INTEGER PRIMARY KEY, userId TEXT NOT NULL UNIQUE, name TEXT)",
+    f"CREATE VIRTUAL TABLE {FTS_TABLE} USING fts5(name, content='{SEARCH_TABLE}', content_rowid='id', "
+    f"tokenize='trigram')",
+)
+SQLITE_POPULATE = (
+    f"INSERT INTO {SEARCH_TABLE}(userId, name) SELECT id, name FROM users",
+    f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')",
+)
+SQLITE_TRIGGER_DDL = (
+    f"""CREATE TRIGGER IF NOT EXISTS users_search_ai AFTER INSERT ON users BEGIN
+        INSERT INTO {SEARCH_TABLE}(userId, name) VALUES (new.id, new.name);
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS users_search_ad AFTER DELETE ON users BEGIN
+        DELETE FROM {SEARCH_TABLE} WHERE userId = old.id;
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS users_search_au AFTER UPDATE OF name ON users BEGIN
+        UPDATE {SEARCH_TABLE} SET name = new.name WHERE userId = old.id;
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS users_fts_ai AFTER INSERT ON {SEARCH_TABLE} BEGIN
+        INSERT INTO {FTS_TABLE}(rowid, name) VALUES (new.id, new.name);
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS users_fts_ad AFTER DELETE ON {SEARCH_TABLE} BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, name) VALUES ('delete', old.id, old.name);
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS users_fts_au AFTER UPDATE OF name ON {SEARCH_TABLE} BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, name) VALUES ('delete', old.id, old.name);
+        INSERT INTO {FTS_TABLE}(rowid, name) VALUES (new.id, new.name);
+    END""",
+)
+# 命中片段的 users.id，供 crud.search_users 作为 IN 子查询
+SQLITE_MATCH_USER_IDS = (
+    f"SELECT s.userId FROM {FTS_TABLE} JOIN {SEARCH_TABLE} s ON s.id = {FTS_TABLE}.rowid "
+    f"WHERE {FTS_TABLE} MATCH :match"
+)
+
+POSTGRESQL_DDL = (
+    "CREATE EXTENSION IF NOT EXISTS pg_trgm",
+    "CREATE INDEX IF NOT EXISTS idx_user_name_trgm ON users USING gin (name gin_trgm_ops)",
+)
+
+# 引擎 URL -> 是否已有 FTS 表
+_fts_enabled: dict = {}
+
+
+def _fts_table_sql(conn) -> Optional[str]:
+    return conn.execute(
+        text("SELECT sql FROM sqlite_master WHERE type = 'table' AND name = :name"), {"name": FTS_TABLE}
+    ).scalar()
+
+
+def _has_fts_table(conn) -> bool:
+    return _fts_table_sql(conn) is not None
+
+
+def create_index(bind) -> None:
+    """建立姓名搜索索引（已存在则跳过）；新建时从 users 全量导入，
+    旧版的 FTS 表连同触发器删除后重建"""
+    dialect = bind.dialect.name
+    try:
+        with bind.begin() as conn:
+            if dialect == "sqlite":
+                created = _fts_table_sql(conn) != SQLITE_TABLES[1]
+                if created:
+                    for trigger in SQLITE_TRIGGERS:
+                        conn.execute(text(f"DROP TRIGGER IF EXISTS {trigger}"))
+                    conn.execute(text(f"DROP TABLE IF EXISTS {FTS_TABLE}"))
+                    conn.execute(text(f"DROP TABLE IF EXISTS {SEARCH_TABLE}"))
+                    for ddl in SQLITE_TABLES + SQLITE_POPULATE:
+                        conn.execute(text(ddl))
+                for ddl in SQLITE_TRIGGER_DDL:
+                    conn.execute(text(ddl))
+            elif dialect == "postgresql":
+                for ddl in POSTGRESQL_DDL:
+                    conn.execute(text(ddl))
+    except DBAPIError as e:
+        # SQLite 未编译 FTS5/trigram（< 3.34）或 PostgreSQL 无权建扩展：搜索退化为 LIKE
+        logger.warning("member search index unavailable: %s", e.orig)
+    _fts_enabled.pop(str(bind.url), None)
+
+
+def fts_enabled(bind) -> bool:
+    if bind.dialect.name != "sqlite":
+        return False
+    key = str(bind.url)
+    enabled = _fts_enabled.get(key)
+    if enabled is None:
+        with bind.connect() as conn:
+            enabled = _fts_enabled[key] = _has_fts_table(conn)
+    return enabled
+
+
+def fts_query(fragment: str) -> str:
+    """把输入作为一个短语匹配（转义双引号，避免被解析为 FTS5 语法）"""
+    return '"' + fragment.replace('"', '""') + '"'
+
+
+def like_pattern(fragment: str) -> str:
+    escaped = fragment.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+    return f"%{escaped}%"
@@ -0,0 +1,139 @@
+"""
+菜单快照缓存 - 商品、分类等读多写少的列表预先序列化为 JSON 字节，附带强 ETag 和预压缩正文
+
+- 快照按共享版本号缓存：crud 中新增、修改、删除商品和新增分类的函数在同一事务内把 system_configs 的
+  menu.version 更新为新值（见 crud.touch_config_version），各 worker 每次请求读取该值，
+  与快照的版本不同即重建，多进程部署下不会继续返回旧商品和价格
+- 库存随每笔销售变化，不进入快照（由 /api/products/stock 单独返回），下单不会使快照失效
+- 同一进程内并发未命中的请求等待同一次构建；压缩在线程池中执行，不阻塞事件循环
+- ETag 为正文的 SHA-256，多 worker 之间一致；If-None-Match 命中时返回 304
+- 正文超过 MENU_COMPRESS_MIN_SIZE 字节时预先 gzip 压缩，安装了 brotli 时同时生成 br 版本
+- 随请求变化的少量字段（如扫码菜单的桌台）不进入快照：response 传入 prefix/suffix 在快照正文外拼接，
+  gzip 时只压缩这两段并与预先压缩好的正文 deflate 流拼成一个 gzip 成员，ETag 由快照 ETag 和外层字段派生
+- 每个键只保留当前版本的快照；写入新版本时丢弃其他旧版本的快照
+"""
+
+import asyncio
+import gzip
+import hashlib
+import os
+import struct
+import zlib
+from typing import Awaitable, Callable, Optional
+
+from fastapi import Request, Response
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+MENU_COMPRESS_MIN_SIZE = int(os.environ.get("MENU_COMPRESS_MIN_SIZE", "1024"))
+
+
+# mtime=0、XFL=2（最高压缩率）、OS=255
+GZIP_HEADER = b"\x1f\x8b\x08\x00\x00\x00\x00\x00\x02\xff"
+
+
+def _raw_deflate(data: bytes, final: bool) -> bytes:
+    compressor = zlib.compressobj(9, zlib.DEFLATED, -zlib.MAX_WBITS)
+    return compressor.compress(data) + compressor.flush(zlib.Z_FINISH if final else zlib.Z_SYNC_FLUSH)
+
+
+class Snapshot:
+    __slots__ = ("etag", "body", "encoded", "deflated")
+
+    def __init__(self, body: bytes):
+        self.body = body
+        self.etag = f'"{hashlib.sha256(body).hexdigest()[:32]}"'
+        self.encoded: dict[str, bytes] = {}
+        # 以同步刷新结尾的 raw deflate 流，供拼接外层字段时复用
+        self.deflated: Optional[bytes] = None
+        if len(body) >= MENU_COMPRESS_MIN_SIZE:
+            if brotli is not None:
+                self.encoded["br"] = brotli.compress(body, quality=11)
+            self.encoded["gzip"] = gzip.compress(body, compresslevel=9, mtime=0)
+            self.deflated = _raw_deflate(body, final=False)
+
+    def response(self, request: Request, prefix: bytes = b"", suffix: bytes = b"") -> Response:
+        """prefix/suffix 为拼接在快照正文前后、不缓存的外层字节"""
+        if prefix or suffix:
+            etag = f'"{hashlib.sha256(self.etag.encode() + prefix + suffix).hexdigest()[:32]}"'
+        else:
+            etag = self.etag
+        headers = {"ETag": etag, "Cache-Control": "no-cache", "Vary": "Accept-Encoding"}
+        if _etag_matches(request.headers.get("if-none-match"), etag):
+            return Response(status_code=304, headers=headers)
+        accepted = _accepted_encodings(request.headers.get("accept-encoding", ""))
+        if prefix or suffix:
+            body = prefix + self.body + suffix
+            if self.deflated is not None and "gzip" in accepted:
+                headers["Content-Encoding"] = "gzip"
+                return Response(self._gzip_around(prefix, suffix, body), media_type="application/json", headers=headers)
+            return Response(body, media_type="application/json", headers=headers)
+        for encoding in ("br", "gzip"):
+            if encoding in self.encoded and encoding in accepted:
+                headers["Content-Encoding"] = encoding
+                return Response(self.encoded[encoding], media_type="application/json", headers=headers)
+        return Response(self.body, media_type="application/json", headers=headers)
+
+    def _gzip_around(self, prefix: bytes, suffix: bytes, body: bytes) -> bytes:
+        """只压缩 prefix 和 suffix：各段 deflate 流以同步刷新结束在字节边界，可以直接首尾相接"""
+        return b"".join((
+            GZIP_HEADER, _raw_deflate(prefix, final=False), self.deflated, _raw_deflate(suffix, final=True),
+            struct.pack("<II", zlib.crc32(body), len(body) & 0xFFFFFFFF),
+        ))
+
+
+def _etag_matches(header: Optional[str], etag: str) -> bool:
+    if not header:
+        return False
+    return any(tag.strip() in (etag, "*", f"W/{etag}") for tag in header.split(","))
+
+
+def _accepted_encodings(header: str) -> set:
+    accepted = set()
+    for part in header.split(","):
+        name, _, params = part.strip().partition(";")
+        if params.strip().replace(" ", "") in ("q=0", "q=0.0"):
+            continue
+        accepted.add(name.strip().lower())
+    return accepted
+
+
+class MenuCache:
+    def __init__(self):
+        # key -> (共享版本号, 快照)
+        self._snapshots: dict[str, tuple[str, Snapshot]] = {}
+        self._build_locks: dict[str, asyncio.Lock] = {}
+
+    def get(self, key: str, version: str) -> Optional[Snapshot]:
+        entry = self._snapshots.get(key)
+        return entry[1] if entry is not None and entry[0] == version else None
+
+    def store(self, key: str, version: str, snapshot: Snapshot) -> Snapshot:
+        """version 为构建前读取的共享版本号；正文至少与该版本一样新。所有键共用 menu.version，
+        版本变化后其他键的旧快照不会再命中，一并丢弃"""
+        stale = [k for k, (v, _) in self._snapshots.items() if v != version]
+        for k in stale:
+            del self._snapshots[k]
+        self._snapshots[key] = (version, snapshot)
+        return snapshot
+
+    async def get_or_build(self, key: str, version: str, build: Callable[[], Awaitable[bytes]]) -> Snapshot:
+        """快照不存在或版本不同时调用 build 生成正文；并发请求只构建一次"""
+        snapshot = self.get(key, version)
+        if snapshot is not None:
+            return snapshot
+        lock = self._build_locks.setdefault(key, asyncio.Lock())
+        async with lock:
+            snapshot = self.get(key, version)
+            if snapshot is None:
+                body = await build()
+                snapshot = self.store(key, version, await asyncio.to_thread(Snapshot, body))
+        return snapshot
+
+
+menu_cache = MenuCache()
+
+MENU_VERSION_KEY = "menu.version"
@@ -4,8 +4,8 @@
 
 import uuid
 from datetime import datetime
-from sqlalchemy import Column, String, Integer, Float, Text, ForeignKey, Boolean, Index, event
-from sqlalchemy.orm import relationship
+from sqlalchemy import BigInteger, Column, String, Integer, Float, Text, ForeignKey, Boolean, Index, event, text
+from sqlalchemy.orm import Session, relationship, with_loader_criteria
 from backend.app.database import Base
 
 
@@ -18,11 +18,16 @@ class TimestampMixin:
 
 
 class SoftDeleteMixin:
-    """软删除混入类"""
+    """软删除混入类；ORM 查询默认排除已删除的行（见文件末尾的 do_orm_execute 监听器）"""
     isDeleted = Column(Boolean, default=False, nullable=False)
     deletedAt = Column(String, nullable=True)
 
 
+# 未删除行的部分索引条件（SQLite 布尔值存为 0/1）
+LIVE_ROWS_SQLITE = text('"isDeleted" = 0')
+LIVE_ROWS_POSTGRESQL = text('NOT "isDeleted"')
+
+
 # ==================== 系统用户模型（用于认证） ====================
 
 class SystemUser(Base, TimestampMixin):
@@ -46,6 +51,38 @@ class SystemUser(Base, TimestampMixin):
     )
 
 
+class AuthToken(Base):
+    """登录令牌 - 多进程共享的会话存储（仅保存令牌哈希）"""
+    __tablename__ = "auth_tokens"
+
+    tokenHash = Column(String(64), primary_key=True)
+    userId = Column(String, nullable=False)
+    type = Column(String(20), nullable=False)  # access, refresh
+    expiresAt = Column(Integer, nullable=False)  # 过期时间（UTC秒）
+    createdAt = Column(String, nullable=False, default=lambda: datetime.utcnow().isoformat())
+
+    __table_args__ = (
+        Index('idx_auth_token_user', 'userId'),
+        Index('idx_auth_token_expires', 'expiresAt'),
+    )
+
+
+class RevokedToken(Base):
+    """签名令牌撤销记录 - jti 级别或用户级别（notBefore 之前签发的令牌全部失效）"""
+    __tablename__ = "revoked_tokens"
+
+    id = Column(String(100), primary_key=True)  # jti 或 user:<userId>
+    userId = Column(String, nullable=True)
+    notBefore = Column(BigInteger, nullable=True)  # 毫秒
+    expiresAt = Column(Integer, nullable=False)  # 超过此时间记录可清理
+    revokedAt = Column(Integer, nullable=False)
+
+    __table_args__ = (
+        Index('idx_revoked_token_revoked_at', 'revokedAt'),
+        Index('idx_revoked_token_expires', 'expiresAt'),
+    )
+
+
 # ==================== 业务模型 ====================
 
 class Category(Base, TimestampMixin):
@@ -87,6 +124,7 @@ class Supplier(Base, TimestampMixin, SoftDeleteMixin):
     __table_args__ = (
         Index('idx_supplier_name', 'name'),
         Index('idx_supplier_deleted', 'isDeleted'),
+        Index('idx_supplier_deleted_at', 'isDeleted', 'deletedAt'),
     )
 
 
@@ -121,6 +159,11 @@ class Product(Base, TimestampMixin, SoftDeleteMixin):
         Index('idx_product_stock', 'stock'),
         Index('idx_product_deleted', 'isDeleted'),
         Index('idx_product_barcode', 'barcode'),
+        Index('idx_product_deleted_category', 'isDeleted', 'categoryId'),
+        Index('idx_product_deleted_at', 'isDeleted', 'deletedAt'),
+        # 点单菜单：只覆盖未删除的商品
+        Index('idx_product_live_shelf', 'isOnShelf', 'categoryId',
+              sqlite_where=LIVE_ROWS_SQLITE, postgresql_where=LIVE_ROWS_POSTGRESQL),
     )
 
 
@@ -147,6 +190,22 @@ class Table(Base, TimestampMixin):
     )
 
 
+class TableChange(Base):
+    """桌台变更日志 - 与变更在同一事务写入，自增 id 即多进程共享的推送版本号"""
+    __tablename__ = "table_changes"
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    tableId = Column(String, nullable=False)
+    kind = Column(String(20), nullable=False)  # table.created, table.updated
+    timestamp = Column(Integer, nullable=False)
+
+    __table_args__ = (
+        Index('idx_table_change_table', 'tableId', 'id'),
+        # 清理旧日志后 id 不复用，版本号单调递增
+        {'sqlite_autoincrement': True},
+    )
+
+
 class User(Base, TimestampMixin, SoftDeleteMixin):
     """会员用户"""
     __tablename__ = "users"
@@ -167,7 +226,11 @@ class User(Base, TimestampMixin, SoftDeleteMixin):
     __table_args__ = (
         Index('idx_user_type', 'type'),
         Index('idx_user_level', 'level'),
+        # 会员搜索：软删除条件 + 手机号前缀范围 / 按 (name, id) 分页，免去排序
+        Index('idx_user_live_phone', 'isDeleted', 'phone'),
+        Index('idx_user_live_name', 'isDeleted', 'name', 'id'),
         Index('idx_user_deleted', 'isDeleted'),
+        Index('idx_user_deleted_at', 'isDeleted', 'deletedAt'),
     )
 
 
@@ -199,7 +262,7 @@ class Order(Base, TimestampMixin):
         Index('idx_order_table', 'tableId'),
         Index('idx_order_user', 'userId'),
         Index('idx_order_status', 'status'),
-        Index('idx_order_timestamp', 'timestamp'),
+        Index('idx_order_timestamp_id', 'timestamp', 'id'),  # 游标分页 (timestamp, id)
         Index('idx_order_type', 'type'),
         Index('idx_order_payment', 'paymentMethod'),
     )
@@ -279,6 +342,41 @@ class StockLog(Base):
     )
 
 
+# ==================== 分析汇总模型 ====================
+
+class SalesRollup(Base):
+    """销售预聚合 - 按小时/天分桶，写订单时增量累加"""
+    __tablename__ = "sales_rollups"
+
+    id = Column(String, primary_key=True, default=lambda: str(uuid.uuid4()))
+    granularity = Column(String(10), nullable=False)  # hour, day
+    bucketStart = Column(Integer, nullable=False)  # 桶起始时间（UTC秒）
+    dimension = Column(String(20), nullable=False)  # all, type, payment, area
+    dimensionValue = Column(String(50), nullable=False, default="")
+    orders = Column(Integer, nullable=False, default=0)
+    gross = Column(Float, nullable=False, default=0.0)
+    cost = Column(Float, nullable=False, default=0.0)
+    discount = Column(Float, nullable=False, default=0.0)
+
+    __table_args__ = (
+        Index('idx_sales_rollup_bucket', 'granularity', 'dimension', 'bucketStart', 'dimensionValue', unique=True),
+    )
+
+
+class ArchivePartition(Base):
+    """已归档到月度归档库的订单/库存日志（按 UTC 自然月）"""
+    __tablename__ = "archive_partitions"
+
+    month = Column(String(7), primary_key=True)  # YYYY-MM
+    url = Column(String(500), nullable=False)  # 归档库连接串
+    startTs = Column(Integer, nullable=False)  # 该月起始时间（UTC秒）
+    endTs = Column(Integer, nullable=False)  # 已归档到的时间（不含）
+    orders = Column(Integer, nullable=False, default=0)
+    orderItems = Column(Integer, nullable=False, default=0)
+    stockLogs = Column(Integer, nullable=False, default=0)
+    updatedAt = Column(String, nullable=True)
+
+
 # ==================== 配置相关模型 ====================
 
 class SystemConfig(Base, TimestampMixin):
@@ -335,6 +433,12 @@ def order_before_update(mapper, connection, target):
     target.updatedAt = datetime.utcnow().isoformat()
 
 
+@event.listens_for(SystemUser, 'before_update')
+def system_user_before_update(mapper, connection, target):
+    """系统用户更新前设置更新时间（认证缓存据此判断快照是否过期）"""
+    target.updatedAt = datetime.utcnow().isoformat()
+
+
 @event.listens_for(User, 'before_update')
 def user_before_update(mapper, connection, target):
     """用户更新前设置更新时间"""
@@ -345,3 +449,22 @@ def user_before_update(mapper, connection, target):
 def supplier_before_update(mapper, connection, target):
     """供应商更新前设置更新时间"""
     target.updatedAt = datetime.utcnow().isoformat()
+
+
+@event.listens_for(Session, 'do_orm_execute')
+def filter_soft_deleted(execute_state):
+    """ORM 查询（含关联加载和 Session.get）只返回未删除的行；
+    需要历史数据时使用 execution_options(include_deleted=True)
+
+    只作用于发往数据库的查询：Session.get 命中标识映射（本会话已加载过该行）时直接返回对象而不查询，
+    同一会话中软删除后仍能取到，因此 crud._soft_delete 提交后把对象移出会话。
+    """
+    if (
+        execute_state.is_select
+        and not execute_state.is_column_load
+        and not execute_state.is_relationship_load
+        and not execute_state.execution_options.get("include_deleted", False)
+    ):
+        execute_state.statement = execute_state.statement.options(
+            with_loader_criteria(SoftDeleteMixin, lambda cls: cls.isDeleted == False, include_aliases=True)  # noqa: E712
+        )
@@ -0,0 +1,274 @@
+"""
+可观测性 - 结构化访问日志、请求延迟直方图和数据库查询计数
+
+- 日志以 JSON 行写入队列，由后台线程（QueueListener）输出，请求路径上不做 I/O；
+  队列满时丢弃并计数，不阻塞请求
+- 每请求的数据库查询数和耗时由 profiling 模块的引擎事件累加到 current_request
+- 指标按路由模板（如 /api/orders/{order_id}）聚合，/metrics 以 Prometheus 文本格式输出，
+  多 worker 部署时每个进程各自统计
+- 高频路由（如桌台轮询）可通过 LOG_SAMPLE_RATES 按比例采样日志；5xx 和慢请求始终记录
+"""
+
+import contextvars
+import copy
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import random
+import sys
+import threading
+import time
+from datetime import datetime, timezone
+from typing import Optional
+
+LOG_LEVEL = os.environ.get("LOG_LEVEL", "INFO")
+LOG_QUEUE_SIZE = int(os.environ.get("LOG_QUEUE_SIZE", "10000"))
+LOG_SLOW_MS = float(os.environ.get("LOG_SLOW_MS", "1000"))
+# 形如 "GET /api/tables/=0.01,/api/orders/page=0.1"；键为 "方法 路由模板" 或仅路由模板
+LOG_SAMPLE_RATES = os.environ.get("LOG_SAMPLE_RATES", "")
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100)
+UNMATCHED_ROUTE = "<unmatched>"
+
+
+def parse_sample_rates(spec: str) -> dict[str, float]:
+    rates = {}
+    for part in spec.split(","):
+        if "=" not in part:
+            continue
+        key, rate = part.rsplit("=", 1)
+        rates[key.strip()] = min(1.0, max(0.0, float(rate)))
+    return rates
+
+
+sample_rates = parse_sample_rates(LOG_SAMPLE_RATES)
+
+
+# ==================== 结构化日志 ====================
+
+class JsonFormatter(logging.Formatter):
+    """每条日志一行 JSON；extra={"fields": {...}} 中的字段并入输出"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        data = {
+            "ts": datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage(),
+        }
+        data.update(getattr(record, "fields", {}))
+        if record.exc_info:
+            data["exc"] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            data["exc"] = record.exc_text
+        return json.dumps(data, ensure_ascii=False, default=str)
+
+
+class DroppingQueueHandler(logging.handlers.QueueHandler):
+    """队列满时丢弃日志而不是阻塞调用方"""
+
+    dropped = 0
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # 默认实现会把异常堆栈拼进 msg；这里单独保存，由 JsonFormatter 输出为 exc 字段
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            DroppingQueueHandler.dropped += 1
+
+
+logger = logging.getLogger("pos")
+access_logger = logging.getLogger("pos.access")
+_listener: Optional[logging.handlers.QueueListener] = None
+
+
+def setup_logging() -> None:
+    """把 pos.* 日志接到队列，由后台线程写 stdout（重复调用无副作用）"""
+    global _listener
+    if _listener is not None:
+        return
+    log_queue: queue.Queue = queue.Queue(maxsize=LOG_QUEUE_SIZE)
+    output = logging.StreamHandler(sys.stdout)
+    output.setFormatter(JsonFormatter())
+    _listener = logging.handlers.QueueListener(log_queue, output, respect_handler_level=False)
+    _listener.start()
+    logger.handlers = [DroppingQueueHandler(log_queue)]
+    logger.setLevel(LOG_LEVEL)
+    logger.propagate = False
+
+
+def shutdown_logging() -> None:
+    """停止后台线程，输出队列中剩余的日志"""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+
+# ==================== 指标 ====================
+
+class Histogram:
+    def __init__(self, buckets: tuple):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float) -> None:
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[i] += 1
+                break
+        self.sum += value
+        self.count += 1
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(**labels) -> str:
+    return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in labels.items()) + "}"
+
+
+class Metrics:
+    """进程内指标注册表"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.requests: dict[tuple, int] = {}
+        self.latency: dict[tuple, Histogram] = {}
+        self.db_queries: dict[tuple, Histogram] = {}
+        self.in_flight = 0
+
+    def request_started(self) -> None:
+        with self._lock:
+            self.in_flight += 1
+
+    def request_finished(self, method: str, route: str, status: int, seconds: float, queries: int) -> None:
+        with self._lock:
+            self.in_flight -= 1
+            key = (method, route, str(status))
+            self.requests[key] = self.requests.get(key, 0) + 1
+            self.latency.setdefault((method, route), Histogram(LATENCY_BUCKETS)).observe(seconds)
+            self.db_queries.setdefault((method, route), Histogram(QUERY_BUCKETS)).observe(queries)
+
+    def _histogram_lines(self, name: str, series: dict) -> list[str]:
+        lines = [f"# TYPE {name} histogram"]
+        for (method, route), hist in sorted(series.items()):
+            cumulative = 0
+            for bound, count in zip(hist.buckets, hist.counts):
+                cumulative += count
+                lines.append(f"{name}_bucket{_labels(method=method, route=route, le=bound)} {cumulative}")
+            lines.append(f"{name}_bucket{_labels(method=method, route=route, le='+Inf')} {hist.count}")
+            lines.append(f"{name}_sum{_labels(method=method, route=route)} {hist.sum}")
+            lines.append(f"{name}_count{_labels(method=method, route=route)} {hist.count}")
+        return lines
+
+    def render(self) -> str:
+        """Prometheus 文本格式"""
+        with self._lock:
+            lines = ["# TYPE http_requests_total counter"]
+            for (method, route, status), count in sorted(self.requests.items()):
+                lines.append(f"http_requests_total{_labels(method=method, route=route, status=status)} {count}")
+            lines += ["# TYPE http_requests_in_flight gauge", f"http_requests_in_flight {self.in_flight}"]
+            lines += self._histogram_lines("http_request_duration_seconds", self.latency)
+            lines += self._histogram_lines("http_request_db_queries", self.db_queries)
+            lines += ["# TYPE log_records_dropped_total counter",
+                      f"log_records_dropped_total {DroppingQueueHandler.dropped}"]
+        return "\n".join(lines) + "\n"
+
+    def reset(self) -> None:
+        with self._lock:
+            self.requests.clear()
+            self.latency.clear()
+            self.db_queries.clear()
+
+
+metrics = Metrics()
+
+
+# ==================== 每请求数据库查询统计 ====================
+
+class RequestStats:
+    """当前请求的统计；放入 contextvar 的是可变对象，线程池和 run_sync 中的累加对中间件可见"""
+    __slots__ = ("queries", "query_time")
+
+    def __init__(self):
+        self.queries = 0
+        self.query_time = 0.0
+
+
+current_request: contextvars.ContextVar[Optional[RequestStats]] = contextvars.ContextVar("current_request", default=None)
+
+
+# ==================== ASGI中间件 ====================
+
+def _route_template(scope) -> str:
+    route = scope.get("route")
+    return getattr(route, "path", None) or UNMATCHED_ROUTE
+
+
+def _should_log(method: str, route: str, status: int, duration_ms: float) -> bool:
+    if status >= 500 or duration_ms >= LOG_SLOW_MS:
+        return True
+    rate = sample_rates.get(f"{method} {route}", sample_rates.get(route, 1.0))
+    return rate >= 1.0 or random.random() < rate
+
+
+class ObservabilityMiddleware:
+    """记录每个 HTTP 请求的耗时、状态码和数据库查询数"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        stats = RequestStats()
+        token = current_request.set(stats)
+        status_code = 500
+        start = time.perf_counter()
+        metrics.request_started()
+
+        async def send_wrapper(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        except Exception:
+            status_code = 500
+            raise
+        finally:
+            elapsed = time.perf_counter() - start
+            current_request.reset(token)
+            method, route = scope["method"], _route_template(scope)
+            metrics.request_finished(method, route, status_code, elapsed, stats.queries)
+            duration_ms = round(elapsed * 1000, 2)
+            if _should_log(method, route, status_code, duration_ms):
+                access_logger.info("request", extra={"fields": {
+                    "method": method,
+                    "path": scope["path"],
+                    "route": route,
+                    "status": status_code,
+                    "durationMs": duration_ms,
+                    "dbQueries": stats.queries,
+                    "dbTimeMs": round(stats.query_time * 1000, 2),
+                }})
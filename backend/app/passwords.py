@@ -0,0 +1,111 @@
+"""
+密码哈希 - 带版本前缀的 scrypt / PBKDF2 格式，兼容旧版无盐 SHA-256
+
+存储格式：
+- scrypt$<n>$<r>$<p>$<salt>$<hash>
+- pbkdf2_sha256$<iterations>$<salt>$<hash>
+- 64位十六进制：旧版 sha256(password)，登录成功后自动升级
+
+哈希计算在独立的有界线程池中执行（hashlib 计算期间释放 GIL），
+登录高峰时排队等待而不会占满事件循环和请求线程池。
+"""
+
+import asyncio
+import base64
+import hashlib
+import hmac
+import os
+import re
+import secrets
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional
+
+PASSWORD_SCHEME = os.environ.get("PASSWORD_SCHEME", "scrypt")  # scrypt, pbkdf2_sha256
+SCRYPT_N = int(os.environ.get("SCRYPT_N", str(2 ** 14)))
+SCRYPT_R = int(os.environ.get("SCRYPT_R", "8"))
+SCRYPT_P = int(os.environ.get("SCRYPT_P", "1"))
+PBKDF2_ITERATIONS = int(os.environ.get("PBKDF2_ITERATIONS", "600000"))
+PASSWORD_HASH_WORKERS = int(os.environ.get("PASSWORD_HASH_WORKERS", "2"))
+
+SALT_BYTES = 16
+HASH_BYTES = 32
+_LEGACY_SHA256 = re.compile(r"^[0-9a-f]{64}$")
+
+_executor = ThreadPoolExecutor(max_workers=PASSWORD_HASH_WORKERS, thread_name_prefix="password-hash")
+
+
+def _b64(raw: bytes) -> str:
+    return base64.b64encode(raw).decode().rstrip("=")
+
+
+def _unb64(text: str) -> bytes:
+    return base64.b64decode(text + "=" * (-len(text) % 4))
+
+
+def _scrypt(password: str, salt: bytes, n: int, r: int, p: int) -> bytes:
+    # maxmem 需覆盖 128 * r * n 字节的工作内存
+    return hashlib.scrypt(
+        password.encode(), salt=salt, n=n, r=r, p=p, dklen=HASH_BYTES, maxmem=256 * r * n + 1024 * 1024
+    )
+
+
+def _pbkdf2(password: str, salt: bytes, iterations: int) -> bytes:
+    return hashlib.pbkdf2_hmac("sha256", password.encode(), salt, iterations, dklen=HASH_BYTES)
+
+
+def hash_password(password: str, scheme: Optional[str] = None, cost: Optional[int] = None) -> str:
+    """生成密码哈希；cost 对 scrypt 为 n，对 PBKDF2 为迭代次数"""
+    scheme = scheme or PASSWORD_SCHEME
+    salt = secrets.token_bytes(SALT_BYTES)
+    if scheme == "scrypt":
+        n = cost or SCRYPT_N
+        digest = _scrypt(password, salt, n, SCRYPT_R, SCRYPT_P)
+        return f"scrypt${n}${SCRYPT_R}${SCRYPT_P}${_b64(salt)}${_b64(digest)}"
+    if scheme == "pbkdf2_sha256":
+        iterations = cost or PBKDF2_ITERATIONS
+        digest = _pbkdf2(password, salt, iterations)
+        return f"pbkdf2_sha256${iterations}${_b64(salt)}${_b64(digest)}"
+    raise ValueError(f"未知的密码哈希算法: {scheme}")
+
+
+def verify_password(plain_password: str, hashed_password: str) -> bool:
+    """验证密码（常量时间比较）"""
+    parts = hashed_password.split("$")
+    try:
+        if parts[0] == "scrypt" and len(parts) == 6:
+            n, r, p = int(parts[1]), int(parts[2]), int(parts[3])
+            expected = _unb64(parts[5])
+            return hmac.compare_digest(_scrypt(plain_password, _unb64(parts[4]), n, r, p), expected)
+        if parts[0] == "pbkdf2_sha256" and len(parts) == 4:
+            expected = _unb64(parts[3])
+            return hmac.compare_digest(_pbkdf2(plain_password, _unb64(parts[2]), int(parts[1])), expected)
+    except (ValueError, TypeError):
+        return False
+    if _LEGACY_SHA256.match(hashed_password):
+        legacy = hashlib.sha256(plain_password.encode()).hexdigest()
+        return hmac.compare_digest(legacy, hashed_password)
+    return False
+
+
+def needs_rehash(hashed_password: str) -> bool:
+    """哈希格式或参数与当前配置不一致时需要升级"""
+    parts = hashed_password.split("$")
+    if PASSWORD_SCHEME == "scrypt":
+        return parts[:4] != ["scrypt", str(SCRYPT_N), str(SCRYPT_R), str(SCRYPT_P)]
+    if PASSWORD_SCHEME == "pbkdf2_sha256":
+        return parts[:2] != ["pbkdf2_sha256", str(PBKDF2_ITERATIONS)]
+    return False
+
+
+# 用户不存在时也做一次同等代价的校验，避免通过响应时间判断用户名是否存在
+DUMMY_HASH = hash_password(secrets.token_urlsafe(16))
+
+
+async def hash_password_async(password: str) -> str:
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_executor, hash_password, password)
+
+
+async def verify_password_async(plain_password: str, hashed_password: str) -> bool:
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_executor, verify_password, plain_password, hashed_password)
@@ -0,0 +1,125 @@
+"""
+SQL 查询剖析 - 引擎级查询计数/计时、慢查询日志和调试响应头
+
+- 每条语句的耗时累加到当前请求（observability.current_request），始终开启，开销为两次计时
+- 开启剖析（QUERY_PROFILING=1 或 PUT /api/debug/profiling）后：
+  - 超过 SLOW_QUERY_MS 的 SELECT 连同执行计划（SQLite: EXPLAIN QUERY PLAN，PostgreSQL: EXPLAIN）写入 pos.sql 日志
+  - 响应附带 X-Query-Count / X-Query-Time-Ms；设置了 QUERY_BUDGET 时附带 X-Query-Budget，超出预算记录告警
+"""
+
+import os
+import threading
+import time
+from dataclasses import dataclass, asdict
+
+from sqlalchemy import event
+
+from backend.app.observability import current_request, logger
+
+sql_logger = logger.getChild("sql")
+
+MAX_LOGGED_STATEMENT = 2000
+
+
+@dataclass
+class ProfilingSettings:
+    enabled: bool = os.environ.get("QUERY_PROFILING", "").lower() in ("1", "true", "yes")
+    slow_query_ms: float = float(os.environ.get("SLOW_QUERY_MS", "200"))
+    explain: bool = os.environ.get("SLOW_QUERY_EXPLAIN", "true").lower() in ("1", "true", "yes")
+    query_budget: int = int(os.environ.get("QUERY_BUDGET", "0"))  # 0 表示不限制
+
+    def to_dict(self) -> dict:
+        return asdict(self)
+
+
+settings = ProfilingSettings()
+_settings_lock = threading.Lock()
+
+
+def update_settings(**changes) -> ProfilingSettings:
+    """运行时修改剖析设置（仅对本进程生效）"""
+    with _settings_lock:
+        for key, value in changes.items():
+            if value is not None:
+                setattr(settings, key, value)
+    return settings
+
+
+def _explain(conn, statement: str, parameters) -> list:
+    """在同一连接上取执行计划；使用新游标，不影响当前结果集"""
+    prefix = "EXPLAIN QUERY PLAN " if conn.dialect.name == "sqlite" else "EXPLAIN "
+    cursor = conn.connection.cursor()
+    try:
+        cursor.execute(prefix + statement, parameters)
+        # SQLite 计划行为 (id, parent, notused, detail)，PostgreSQL 为单列文本
+        return [str(row[-1]) for row in cursor.fetchall()]
+    finally:
+        cursor.close()
+
+
+def _log_slow_query(conn, statement: str, parameters, executemany: bool, duration_ms: float) -> None:
+    fields = {
+        "statement": statement[:MAX_LOGGED_STATEMENT],
+        "durationMs": round(duration_ms, 2),
+        "executemany": executemany,
+    }
+    if settings.explain and not executemany and statement.lstrip().upper().startswith("SELECT"):
+        try:
+            fields["plan"] = _explain(conn, statement, parameters)
+        except Exception as e:
+            fields["planError"] = str(e)
+    sql_logger.warning("slow query", extra={"fields": fields})
+
+
+def instrument_engine(engine) -> None:
+    """为同步引擎（异步引擎传 sync_engine）注册查询计数、计时和慢查询日志"""
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("query_start", []).append(time.perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        starts = conn.info.get("query_start")
+        if not starts:
+            return
+        elapsed = time.perf_counter() - starts.pop()
+        stats = current_request.get()
+        if stats is not None:
+            stats.queries += 1
+            stats.query_time += elapsed
+        if settings.enabled and elapsed * 1000 >= settings.slow_query_ms:
+            _log_slow_query(conn, statement, parameters, executemany, elapsed * 1000)
+
+
+class QueryProfilingMiddleware:
+    """剖析开启时在响应头中报告本请求的查询数和耗时；需位于 ObservabilityMiddleware 内层"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not settings.enabled:
+            await self.app(scope, receive, send)
+            return
+
+        async def send_wrapper(message):
+            stats = current_request.get()
+            if message["type"] == "http.response.start" and stats is not None:
+                headers = list(message.get("headers", []))
+                headers.append((b"x-query-count", str(stats.queries).encode()))
+                headers.append((b"x-query-time-ms", f"{stats.query_time * 1000:.2f}".encode()))
+                budget = settings.query_budget
+                if budget:
+                    headers.append((b"x-query-budget", str(budget).encode()))
+                    if stats.queries > budget:
+                        sql_logger.warning("query budget exceeded", extra={"fields": {
+                            "method": scope["method"],
+                            "path": scope["path"],
+                            "dbQueries": stats.queries,
+                            "budget": budget,
+                        }})
+                message = dict(message, headers=headers)
+            await send(message)
+
+        await self.app(scope, receive, send_wrapper)
@@ -0,0 +1,214 @@
+"""
+桌台实时推送 - 替代终端对 GET /api/tables/ 的轮询
+
+- crud 修改桌台时在同一事务中调用 record_change 写入 table_changes，自增 id 即版本号，所有 worker 共享
+- 每个进程运行一个轮询任务（TableEventHub.run），读取新的变更行并推送给本进程的 SSE/WebSocket 订阅者；
+  本进程提交的变更通过 notify() 立即唤醒轮询，其他 worker 的变更最多延迟 REALTIME_POLL_INTERVAL 秒
+- 订阅者是事件循环中的 asyncio.Queue；队列满（客户端太慢）时标记 lagging，由连接方重发快照
+- 断线重连的客户端带上最后收到的版本号（可以连到任意 worker），从 table_changes 补发之后变更过的桌台，
+  同一桌台只发当前状态；版本号早于保留的日志（最近 REALTIME_RETAIN 条）或 epoch 不同（换库）时重新发送快照
+"""
+
+import asyncio
+import logging
+import os
+import threading
+import time
+import uuid
+from typing import Optional
+
+from sqlalchemy import delete, func, select
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from backend.app import models
+
+logger = logging.getLogger("pos.realtime")
+
+REALTIME_RETAIN = int(os.environ.get("REALTIME_RETAIN", "10000"))
+REALTIME_QUEUE_SIZE = int(os.environ.get("REALTIME_QUEUE_SIZE", "256"))
+REALTIME_HEARTBEAT = float(os.environ.get("REALTIME_HEARTBEAT", "15"))
+REALTIME_POLL_INTERVAL = float(os.environ.get("REALTIME_POLL_INTERVAL", "1"))
+
+EPOCH_KEY = "realtime.epoch"
+FETCH_LIMIT = 500
+# PostgreSQL 的序列号按分配顺序而非提交顺序可见：每次轮询回看最近这些版本号，补上晚提交的较小 id
+FETCH_LOOKBACK = 100
+PRUNE_INTERVAL = 60
+
+TABLE_FIELDS = ("id", "name", "status", "capacity", "area", "currentOrderId")
+
+
+def table_payload(obj) -> dict:
+    return {f: getattr(obj, f) for f in TABLE_FIELDS}
+
+
+# ==================== 变更日志 ====================
+
+def record_change(db: Session, table_id: str, kind: str = "table.updated") -> None:
+    """登记一次桌台变更，不提交；提交后调用 notify()"""
+    db.add(models.TableChange(tableId=table_id, kind=kind, timestamp=int(time.time())))
+
+
+def current_version(db: Session) -> int:
+    return db.execute(select(func.max(models.TableChange.id))).scalar() or 0
+
+
+def snapshot(db: Session) -> tuple:
+    """(版本号, 全部桌台)；先取版本号再读桌台，之后的事件可能与快照重复，客户端按 id 覆盖即可"""
+    version = current_version(db)
+    tables = db.execute(select(models.Table)).scalars().all()
+    return version, [table_payload(t) for t in tables]
+
+
+def _events(db: Session, after: int, limit: Optional[int] = None, latest_only: bool = False) -> list:
+    change = models.TableChange
+    stmt = select(change.id, change.kind, models.Table).join(models.Table, models.Table.id == change.tableId)
+    if latest_only:
+        latest = select(func.max(change.id)).where(change.id > after).group_by(change.tableId)
+        stmt = stmt.where(change.id.in_(latest))
+    else:
+        stmt = stmt.where(change.id > after)
+    stmt = stmt.order_by(change.id)
+    if limit:
+        stmt = stmt.limit(limit)
+    return [{"version": cid, "type": kind, "table": table_payload(t)} for cid, kind, t in db.execute(stmt).all()]
+
+
+def changes_since(db: Session, version: int) -> Optional[list]:
+    """version 之后的变更，同一桌台合并为最新一条；日志已被清理或版本号来自其他库时返回 None"""
+    change = models.TableChange
+    lo, hi = db.execute(select(func.min(change.id), func.max(change.id))).one()
+    hi = hi or 0
+    if version > hi:
+        return None
+    if version == hi:
+        return []
+    if lo is not None and version < lo - 1:
+        return None
+    return _events(db, version, latest_only=True)
+
+
+def _load_epoch(db: Session) -> str:
+    """整个数据库共享的 epoch，首次启动时生成"""
+    config = models.SystemConfig
+    value = db.execute(select(config.value).where(config.key == EPOCH_KEY)).scalar()
+    if value is None:
+        value = uuid.uuid4().hex[:12]
+        db.add(config(key=EPOCH_KEY, value=value, type="string", group="realtime"))
+        try:
+            db.commit()
+        except IntegrityError:
+            # 其他 worker 同时启动
+            db.rollback()
+            value = db.execute(select(config.value).where(config.key == EPOCH_KEY)).scalar()
+    return value
+
+
+def _prune(db: Session) -> None:
+    hi = current_version(db)
+    if hi > REALTIME_RETAIN:
+        db.execute(delete(models.TableChange).where(models.TableChange.id <= hi - REALTIME_RETAIN))
+        db.commit()
+
+
+# ==================== 进程内推送 ====================
+
+class Subscriber:
+    """一个 SSE/WebSocket 连接；队列满（客户端太慢）时标记 lagging，由连接方重发快照"""
+
+    def __init__(self):
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=REALTIME_QUEUE_SIZE)
+        self.lagging = False
+
+    def put(self, event: dict) -> None:
+        try:
+            self.queue.put_nowait(event)
+        except asyncio.QueueFull:
+            self.lagging = True
+
+
+class TableEventHub:
+    def __init__(self):
+        self.epoch: Optional[str] = None
+        self.version = 0  # 已推送给本进程订阅者的最大版本号
+        self._recent: set = set()  # 回看窗口内已推送的版本号
+        self._subscribers: set = set()
+        self._lock = threading.Lock()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._wakeup: Optional[asyncio.Event] = None
+
+    def subscribe(self) -> Subscriber:
+        sub = Subscriber()
+        with self._lock:
+            self._subscribers.add(sub)
+        return sub
+
+    def unsubscribe(self, sub: Subscriber) -> None:
+        with self._lock:
+            self._subscribers.discard(sub)
+
+    @property
+    def subscriber_count(self) -> int:
+        return len(self._subscribers)
+
+    def notify(self) -> None:
+        """唤醒轮询任务；crud 可能运行在线程池中"""
+        loop, wakeup = self._loop, self._wakeup
+        if loop is None or wakeup is None:
+            return
+        try:
+            loop.call_soon_threadsafe(wakeup.set)
+        except RuntimeError:
+            # 事件循环已关闭
+            pass
+
+    def _broadcast(self, event: dict) -> None:
+        self.version = max(self.version, event["version"])
+        self._recent.add(event["version"])
+        with self._lock:
+            subscribers = list(self._subscribers)
+        for sub in subscribers:
+            sub.put(event)
+
+    async def run(self, session_factory) -> None:
+        """轮询 table_changes 并推送新事件，在应用生命周期内运行"""
+        self._loop = asyncio.get_running_loop()
+        self._wakeup = asyncio.Event()
+        async with session_factory() as db:
+            self.epoch = await db.run_sync(_load_epoch)
+            self.version = await db.run_sync(current_version)
+        # 启动前已有的事件不再推送
+        self._recent = set(range(max(self.version - FETCH_LOOKBACK, 0) + 1, self.version + 1))
+        pruned_at = time.monotonic()
+        while True:
+            # 用定时器代替 wait_for：唤醒与取消同时发生时 wait_for 会吞掉取消，关闭时任务退不出去
+            timer = self._loop.call_later(REALTIME_POLL_INTERVAL, self._wakeup.set)
+            try:
+                await self._wakeup.wait()
+            finally:
+                timer.cancel()
+            self._wakeup.clear()
+            try:
+                async with session_factory() as db:
+                    events = await db.run_sync(_events, max(self.version - FETCH_LOOKBACK, 0), FETCH_LIMIT)
+                    if time.monotonic() - pruned_at > PRUNE_INTERVAL:
+                        pruned_at = time.monotonic()
+                        await db.run_sync(_prune)
+            except Exception:
+                logger.exception("table change poll failed")
+                continue
+            for event in events:
+                if event["version"] not in self._recent:
+                    self._broadcast(event)
+            self._recent = {v for v in self._recent if v > self.version - FETCH_LOOKBACK}
+            if len(events) == FETCH_LIMIT:
+                self._wakeup.set()
+
+
+hub = TableEventHub()
+
+
+def notify() -> None:
+    """在登记了变更的事务提交后调用"""
+    hub.notify()
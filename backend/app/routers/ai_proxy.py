@@ -1,25 +1,84 @@
 """
 AI代理路由 - 将AI调用移到后端，保护API密钥安全
+
+模型调用以异步方式执行，带超时（AI_TIMEOUT，含等待并发名额的时间）和并发上限（AI_MAX_CONCURRENCY），
+超时前仍没有空闲名额时返回 503；
+成功的结果按提示词内容的 SHA-256 缓存（AI_CACHE_TTL），相同商品名或相同数据窗口直接命中。
+设置 AI_STUB=1 使用本地桩客户端，无需API密钥即可联调和压测。
 """
 
+import asyncio
+import functools
+import hashlib
+import json
+import logging
 import os
-from typing import Optional
+import time
+from typing import List, Optional
+
+from fastapi import APIRouter, Depends, HTTPException
+from pydantic import BaseModel, Field
+from sqlalchemy.ext.asyncio import AsyncSession
 
-from fastapi import APIRouter, HTTPException
-from pydantic import BaseModel
+from backend.app import crud
+from backend.app.cache import TTLCache
+from backend.app.database import get_async_db
+from backend.app.routers.analytics import STORE_ID, analytics_cache
 
 router = APIRouter(prefix="/api/ai", tags=["ai"])
+logger = logging.getLogger("pos.ai")
 
 # 从环境变量获取API密钥
 GEMINI_API_KEY = os.environ.get("GEMINI_API_KEY", "")
+AI_MODEL = os.environ.get("AI_MODEL", "gemini-2.5-flash")
+AI_STUB = os.environ.get("AI_STUB", "").lower() in ("1", "true", "yes")
+AI_STUB_DELAY = float(os.environ.get("AI_STUB_DELAY", "0"))
+AI_TIMEOUT = float(os.environ.get("AI_TIMEOUT", "20"))
+AI_MAX_CONCURRENCY = int(os.environ.get("AI_MAX_CONCURRENCY", "4"))
+AI_CACHE_TTL = float(os.environ.get("AI_CACHE_TTL", str(24 * 3600)))
+MAX_BATCH_DESCRIPTIONS = 200
+HOUR = 3600
+
+response_cache = TTLCache(maxsize=int(os.environ.get("AI_CACHE_SIZE", "2048")), ttl=AI_CACHE_TTL)
+# 相同提示词的并发请求共享同一个调用任务
+_inflight: dict[str, asyncio.Task] = {}
+_semaphore: Optional[asyncio.Semaphore] = None
+_semaphore_loop = None
 
 # 延迟导入Google GenAI
 genai_client = None
 
 
+class StubResponse:
+    def __init__(self, text: str):
+        self.text = text
+
+
+class StubModels:
+    def __init__(self, delay: float):
+        self.delay = delay
+        self.calls = 0
+
+    def generate_content(self, model: str, contents: str) -> StubResponse:
+        self.calls += 1
+        if self.delay:
+            time.sleep(self.delay)
+        digest = hashlib.sha256(contents.encode()).hexdigest()[:8]
+        return StubResponse(f"[stub:{model}:{digest}] 精选食材，匠心制作。")
+
+
+class StubGenAIClient:
+    """本地桩客户端，与 genai.Client 的 models.generate_content 接口一致"""
+
+    def __init__(self, delay: float = AI_STUB_DELAY):
+        self.models = StubModels(delay)
+
+
 def get_genai_client():
     """获取或创建GenAI客户端"""
     global genai_client
+    if genai_client is None and AI_STUB:
+        genai_client = StubGenAIClient()
     if genai_client is None and GEMINI_API_KEY:
         try:
             from google import genai
@@ -29,17 +88,122 @@ def get_genai_client():
     return genai_client
 
 
+def set_genai_client(client) -> None:
+    """替换模型客户端（测试时注入桩客户端），同时清空响应缓存"""
+    global genai_client
+    genai_client = client
+    response_cache.clear()
+
+
+def ai_configured() -> bool:
+    return AI_STUB or bool(GEMINI_API_KEY) or genai_client is not None
+
+
+def _get_semaphore() -> asyncio.Semaphore:
+    """并发上限信号量，与当前事件循环绑定"""
+    global _semaphore, _semaphore_loop
+    loop = asyncio.get_running_loop()
+    if _semaphore is None or _semaphore_loop is not loop:
+        _semaphore = asyncio.Semaphore(AI_MAX_CONCURRENCY)
+        _semaphore_loop = loop
+    return _semaphore
+
+
+class AIBusyError(Exception):
+    """截止时间前没有空闲的模型调用名额"""
+
+
+async def _acquire_slot(semaphore: asyncio.Semaphore, deadline: float) -> None:
+    """在截止时间前取得调用名额，否则抛出 AIBusyError"""
+    if not semaphore.locked():
+        # 有空闲名额时立即取得，不受剩余时间影响
+        await semaphore.acquire()
+        return
+    try:
+        await asyncio.wait_for(semaphore.acquire(), timeout=deadline - asyncio.get_running_loop().time())
+    except asyncio.TimeoutError:
+        raise AIBusyError() from None
+
+
+async def _call_sync_model(client, prompt: str, deadline: float):
+    """同步客户端在线程中调用；线程无法取消，超时后名额保留到线程结束，避免超时请求堆积出超过上限的线程"""
+    semaphore = _get_semaphore()
+    await _acquire_slot(semaphore, deadline)
+    try:
+        future = asyncio.get_running_loop().run_in_executor(
+            None, functools.partial(client.models.generate_content, model=AI_MODEL, contents=prompt)
+        )
+    except BaseException:
+        semaphore.release()
+        raise
+    future.add_done_callback(lambda _: semaphore.release())
+    # shield：超时只放弃等待，future 仍在线程结束时完成并释放名额
+    return await asyncio.wait_for(asyncio.shield(future), timeout=deadline - asyncio.get_running_loop().time())
+
+
+async def _call_model(client, prompt: str, key: str) -> Optional[str]:
+    # 等待名额和调用模型共用 AI_TIMEOUT
+    deadline = asyncio.get_running_loop().time() + AI_TIMEOUT
+    aio = getattr(client, "aio", None)
+    if aio is not None:
+        semaphore = _get_semaphore()
+        await _acquire_slot(semaphore, deadline)
+        try:
+            response = await asyncio.wait_for(
+                aio.models.generate_content(model=AI_MODEL, contents=prompt),
+                timeout=deadline - asyncio.get_running_loop().time(),
+            )
+        finally:
+            semaphore.release()
+    else:
+        response = await _call_sync_model(client, prompt, deadline)
+    text = response.text or None
+    if text:
+        response_cache.set(key, text)
+    return text
+
+
+def _discard_inflight(key: str, task: asyncio.Task) -> None:
+    _inflight.pop(key, None)
+    if not task.cancelled():
+        # 所有等待方都已断开时避免 "exception was never retrieved" 警告
+        task.exception()
+
+
+async def generate_text(client, prompt: str) -> Optional[str]:
+    """调用模型生成文本，命中缓存时不调用；没有空闲名额时抛出 AIBusyError，超时或出错时抛出异常，空结果返回 None"""
+    key = hashlib.sha256(f"{AI_MODEL}\n{prompt}".encode()).hexdigest()
+    cached = response_cache.get(key)
+    if cached is not None:
+        return cached
+
+    task = _inflight.get(key)
+    if task is None:
+        # 调用在独立任务中完成，请求方断开时结果仍写入缓存
+        task = asyncio.create_task(_call_model(client, prompt, key))
+        _inflight[key] = task
+        task.add_done_callback(lambda t: _discard_inflight(key, t))
+    return await asyncio.shield(task)
+
+
 # ==================== 请求模型 ====================
 
 class InsightRequest(BaseModel):
-    salesData: dict
-    recentOrders: list
+    """salesData 省略时由服务端按最近 days 天的数据生成摘要"""
+    salesData: Optional[dict] = None
+    recentOrders: Optional[list] = None
+    days: int = Field(7, ge=1, le=90)
+    tz: Optional[str] = None
 
 
 class ProductDescriptionRequest(BaseModel):
     productName: str
 
 
+class ProductDescriptionBatchRequest(BaseModel):
+    productNames: List[str] = Field(..., max_length=MAX_BATCH_DESCRIPTIONS)
+
+
 class InsightResponse(BaseModel):
     insight: str
 
@@ -48,20 +212,29 @@ class DescriptionResponse(BaseModel):
     description: str
 
 
-# ==================== API端点 ====================
+class ProductDescriptionItem(BaseModel):
+    productName: str
+    description: str
+    generated: bool
 
-@router.post("/insight", response_model=InsightResponse)
-async def generate_insight(request: InsightRequest):
-    """生成业务洞察"""
-    if not GEMINI_API_KEY:
-        return InsightResponse(insight="AI服务未配置。请联系管理员设置API密钥。")
 
-    client = get_genai_client()
-    if not client:
-        return InsightResponse(insight="AI服务暂不可用。")
+class DescriptionBatchResponse(BaseModel):
+    items: List[ProductDescriptionItem]
 
-    try:
-        prompt = f"""
+
+# ==================== 提示词 ====================
+
+def insight_prompt(sales_data: dict, recent_orders: list) -> str:
+    # 按键排序序列化，同一数据窗口生成相同的提示词，从而命中缓存
+    data = json.dumps(sales_data, ensure_ascii=False, sort_keys=True, default=str)
+    orders = ""
+    if recent_orders:
+        sample = json.dumps(recent_orders[:5], ensure_ascii=False, sort_keys=True, default=str)
+        orders = f"""
+        Recent Orders Sample:
+        {sample}
+        """
+    return f"""
         Act as a senior business analyst for a restaurant using a SaaS system like KeRuYun.
         Analyze the following sales data and recent orders.
         Provide a concise, bulleted list of 3 strategic insights and 1 marketing recommendation to improve revenue.
@@ -69,30 +242,82 @@ async def generate_insight(request: InsightRequest):
         Please respond in Chinese.
 
         Data:
-        {request.salesData}
+        {data}
+        {orders}"""
 
-        Recent Orders Sample:
-        {request.recentOrders[:5] if request.recentOrders else []}
+
+async def load_insight_digest(db: AsyncSession, days: int, tz: Optional[str]) -> dict:
+    """最近 days 天（截至上一个整点）的经营摘要；窗口在一小时内不变，摘要和模型结果都可命中缓存"""
+    end_ts = int(time.time()) // HOUR * HOUR - 1
+    start_ts = end_ts + 1 - days * 24 * HOUR
+    key = ("insight-digest", STORE_ID, start_ts, end_ts, tz)
+    digest = analytics_cache.get(key)
+    if digest is None:
+        digest = await db.run_sync(crud.insight_digest, start_ts, end_ts, tz)
+        analytics_cache.set(key, digest, ttl=HOUR)
+    return digest
+
+
+def description_prompt(product_name: str) -> str:
+    return f"""
+        Write a short, mouth-watering menu description (max 20 words) for a dish named: "{product_name.strip()}".
+        Please respond in Chinese.
         """
 
-        response = client.models.generate_content(
-            model='gemini-2.5-flash',
-            contents=prompt,
-        )
 
-        return InsightResponse(
-            insight=response.text if response.text else "无法生成洞察，请稍后重试。"
-        )
+# ==================== API端点 ====================
+
+@router.post("/insight", response_model=InsightResponse)
+async def generate_insight(request: InsightRequest, db: AsyncSession = Depends(get_async_db)):
+    """生成业务洞察"""
+    if not ai_configured():
+        return InsightResponse(insight="AI服务未配置。请联系管理员设置API密钥。")
+
+    client = get_genai_client()
+    if not client:
+        return InsightResponse(insight="AI服务暂不可用。")
+
+    sales_data = request.salesData
+    if sales_data is None:
+        try:
+            sales_data = await load_insight_digest(db, request.days, request.tz)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+
+    try:
+        text = await generate_text(client, insight_prompt(sales_data, request.recentOrders or []))
+        return InsightResponse(insight=text or "无法生成洞察，请稍后重试。")
 
-    except Exception as e:
-        print(f"AI insight error: {e}")
+    except AIBusyError:
+        raise HTTPException(status_code=503, detail="AI服务繁忙，请稍后重试")
+    except asyncio.TimeoutError:
+        return InsightResponse(insight="AI服务响应超时，请稍后重试。")
+    except Exception:
+        logger.exception("AI insight failed")
         return InsightResponse(insight="生成洞察时出错，请稍后重试。")
 
 
+async def describe_product(client, product_name: str) -> tuple[str, bool]:
+    """返回 (描述, 是否由模型生成)；失败时返回默认文案（不缓存），没有空闲名额时抛出 AIBusyError"""
+    try:
+        text = await generate_text(client, description_prompt(product_name))
+    except AIBusyError:
+        raise
+    except asyncio.TimeoutError:
+        logger.warning("AI description timed out: %s", product_name)
+        return "精选食材，匠心制作。", False
+    except Exception:
+        logger.exception("AI description failed: %s", product_name)
+        return "精选食材，匠心制作。", False
+    if not text:
+        return "美味佳肴，不容错过。", False
+    return text, True
+
+
 @router.post("/product-description", response_model=DescriptionResponse)
 async def generate_product_description(request: ProductDescriptionRequest):
     """生成商品描述"""
-    if not GEMINI_API_KEY:
+    if not ai_configured():
         return DescriptionResponse(description="美味可口，值得品尝。")
 
     client = get_genai_client()
@@ -100,28 +325,43 @@ async def generate_product_description(request: ProductDescriptionRequest):
         return DescriptionResponse(description="精心制作，口感绝佳。")
 
     try:
-        prompt = f"""
-        Write a short, mouth-watering menu description (max 20 words) for a dish named: "{request.productName}".
-        Please respond in Chinese.
-        """
+        description, _ = await describe_product(client, request.productName)
+    except AIBusyError:
+        raise HTTPException(status_code=503, detail="AI服务繁忙，请稍后重试")
+    return DescriptionResponse(description=description)
 
-        response = client.models.generate_content(
-            model='gemini-2.5-flash',
-            contents=prompt,
-        )
 
-        return DescriptionResponse(
-            description=response.text if response.text else "美味佳肴，不容错过。"
-        )
+@router.post("/product-descriptions", response_model=DescriptionBatchResponse)
+async def generate_product_descriptions(request: ProductDescriptionBatchRequest):
+    """批量生成商品描述（菜单导入），重复的商品名只生成一次，并发受 AI_MAX_CONCURRENCY 限制"""
+    client = get_genai_client() if ai_configured() else None
+    if not client:
+        raise HTTPException(status_code=503, detail="AI服务未配置")
 
-    except Exception:
-        return DescriptionResponse(description="精选食材，匠心制作。")
+    names = list(dict.fromkeys(name.strip() for name in request.productNames if name.strip()))
+    # 本批次最多同时发起 AI_MAX_CONCURRENCY 个调用，排在后面的商品名不会在等待名额时耗尽各自的 AI_TIMEOUT
+    gate = asyncio.Semaphore(AI_MAX_CONCURRENCY)
+
+    async def describe(name: str) -> tuple[str, bool]:
+        async with gate:
+            try:
+                return await describe_product(client, name)
+            except AIBusyError:
+                logger.warning("AI description skipped, no free slot: %s", name)
+                return "精选食材，匠心制作。", False
+
+    results = await asyncio.gather(*(describe(name) for name in names))
+    return DescriptionBatchResponse(items=[
+        ProductDescriptionItem(productName=name, description=description, generated=generated)
+        for name, (description, generated) in zip(names, results)
+    ])
 
 
 @router.get("/status")
 async def get_ai_status():
     """检查AI服务状态"""
     return {
-        "available": bool(GEMINI_API_KEY),
-        "provider": "Google Gemini" if GEMINI_API_KEY else None
+        "available": ai_configured(),
+        "provider": "Stub" if AI_STUB else ("Google Gemini" if GEMINI_API_KEY else None),
+        "cachedResponses": len(response_cache),
     }
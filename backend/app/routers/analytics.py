@@ -1,19 +1,64 @@
-from typing import List
-from fastapi import APIRouter, Depends
+import os
+from typing import List, Literal, Optional
+from fastapi import APIRouter, Depends, HTTPException, Query
 from sqlalchemy.orm import Session
-from backend.app.database import SessionLocal
+from backend.app.database import get_db
 from backend.app import crud
+from backend.app.cache import TTLCache
 
 router = APIRouter(prefix="/api/analytics", tags=["analytics"])
 
-def get_db():
-    db = SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
+# 商品/分类/毛利分析结果缓存，按门店和时间窗口区分
+STORE_ID = os.environ.get("STORE_ID", "default")
+ANALYTICS_CACHE_TTL = float(os.environ.get("ANALYTICS_CACHE_TTL", "60"))
+analytics_cache = TTLCache(maxsize=512, ttl=ANALYTICS_CACHE_TTL)
 
 @router.get("/sales-summary")
-def sales_summary(start_ts: int, end_ts: int, db: Session = Depends(get_db)):
-    return crud.sales_summary_daily(db, start_ts, end_ts)
+def sales_summary(
+    start_ts: int,
+    end_ts: int,
+    granularity: Literal["hour", "day", "week", "month"] = "day",
+    tz: Optional[str] = None,
+    db: Session = Depends(get_db)
+):
+    try:
+        return crud.sales_summary(db, start_ts, end_ts, granularity, tz)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@router.get("/hourly-sales")
+def hourly_sales(start_ts: int, end_ts: int, tz: Optional[str] = None, db: Session = Depends(get_db)):
+    try:
+        return crud.hourly_sales_curve(db, start_ts, end_ts, tz)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@router.get("/sales-breakdown")
+def sales_breakdown(
+    dimension: Literal["type", "payment", "area"],
+    start_ts: int,
+    end_ts: int,
+    db: Session = Depends(get_db)
+):
+    return crud.sales_breakdown(db, dimension, start_ts, end_ts)
+
+@router.get("/top-products")
+def top_products(
+    limit: int = Query(10, ge=1, le=100),
+    start_ts: Optional[int] = None,
+    end_ts: Optional[int] = None,
+    sort_by: Literal["revenue", "quantity", "profit"] = "revenue",
+    db: Session = Depends(get_db)
+):
+    key = ("top-products", STORE_ID, start_ts, end_ts, limit, sort_by)
+    return analytics_cache.get_or_set(key, lambda: crud.top_products(db, start_ts, end_ts, limit, sort_by))
+
+@router.get("/category-sales")
+def category_sales(start_ts: Optional[int] = None, end_ts: Optional[int] = None, db: Session = Depends(get_db)):
+    key = ("category-sales", STORE_ID, start_ts, end_ts)
+    return analytics_cache.get_or_set(key, lambda: crud.category_sales(db, start_ts, end_ts))
 
+@router.get("/gross-margin")
+def gross_margin(start_ts: Optional[int] = None, end_ts: Optional[int] = None, db: Session = Depends(get_db)):
+    key = ("gross-margin", STORE_ID, start_ts, end_ts)
+    return analytics_cache.get_or_set(key, lambda: crud.gross_margin(db, start_ts, end_ts))
@@ -2,30 +2,47 @@
 认证路由 - 处理用户登录、注册、令牌刷新等
 """
 
-from datetime import datetime, timedelta
+from dataclasses import dataclass
+from datetime import datetime
 from typing import Optional
+import os
 import uuid
-import hashlib
 import secrets
+import time
 
 from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi.concurrency import run_in_threadpool
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from pydantic import BaseModel
-from sqlalchemy.orm import Session
+from sqlalchemy import event, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session, object_session
 
-from backend.app.database import get_db
+from backend.app.database import get_db, get_async_db
 from backend.app import models
+from backend.app.passwords import (
+    DUMMY_HASH, needs_rehash, hash_password_async, verify_password_async,
+)
+from backend.app.token_store import token_store
+from backend.app.signed_tokens import is_signed_token, sign_token, decode_token, revocation_list
+from backend.app.cache import TTLCache
 
 router = APIRouter(prefix="/api/auth", tags=["auth"])
 security = HTTPBearer()
 
 # 配置
-SECRET_KEY = secrets.token_hex(32)  # 生产环境应从环境变量获取
 ACCESS_TOKEN_EXPIRE_MINUTES = 60 * 24  # 24小时
 REFRESH_TOKEN_EXPIRE_DAYS = 7
+ACCESS_TOKEN_TTL = ACCESS_TOKEN_EXPIRE_MINUTES * 60
+REFRESH_TOKEN_TTL = REFRESH_TOKEN_EXPIRE_DAYS * 24 * 3600
 
-# 简单的token存储（生产环境应使用Redis）
-active_tokens: dict[str, dict] = {}
+# 令牌模式：opaque（随机串，存于令牌存储）或 signed（HMAC签名，校验无需查询存储）
+TOKEN_MODE = os.environ.get("TOKEN_MODE", "opaque")
+
+# 已认证用户缓存；命中时不查询数据库。本进程提交的修改立即清除对应缓存，
+# 其他进程对用户的修改（禁用、改角色）最多延迟 PRINCIPAL_CACHE_TTL 秒生效
+PRINCIPAL_CACHE_TTL = float(os.environ.get("PRINCIPAL_CACHE_TTL", "10"))
+principal_cache = TTLCache(maxsize=int(os.environ.get("PRINCIPAL_CACHE_SIZE", "1024")), ttl=PRINCIPAL_CACHE_TTL)
 
 
 # ==================== 数据模型 ====================
@@ -70,92 +87,166 @@ class RefreshTokenRequest(BaseModel):
 
 # ==================== 辅助函数 ====================
 
-def hash_password(password: str) -> str:
-    """密码哈希"""
-    return hashlib.sha256(password.encode()).hexdigest()
-
-
-def verify_password(plain_password: str, hashed_password: str) -> bool:
-    """验证密码"""
-    return hash_password(plain_password) == hashed_password
-
-
 def generate_token() -> str:
     """生成随机token"""
     return secrets.token_urlsafe(32)
 
 
+# 角色权限表
+ROLE_PERMISSIONS = {
+    "admin": [
+        "product:view", "product:create", "product:edit", "product:delete",
+        "order:view", "order:create", "order:cancel", "order:refund",
+        "inventory:view", "inventory:manage",
+        "user:view", "user:manage",
+        "report:view", "report:export",
+        "config:view", "config:manage",
+        "system:admin"
+    ],
+    "manager": [
+        "product:view", "product:create", "product:edit",
+        "order:view", "order:create", "order:cancel", "order:refund",
+        "inventory:view", "inventory:manage",
+        "user:view",
+        "report:view", "report:export",
+        "config:view"
+    ],
+    "cashier": [
+        "product:view",
+        "order:view", "order:create",
+        "inventory:view",
+        "user:view"
+    ],
+    "staff": [
+        "product:view",
+        "order:view",
+        "inventory:view"
+    ]
+}
+
+# 预计算的不可变权限集合，权限校验为 O(1)
+ROLE_PERMISSION_SETS = {role: frozenset(perms) for role, perms in ROLE_PERMISSIONS.items()}
+
+
 def get_permissions_for_role(role: str) -> list[str]:
     """根据角色获取权限列表"""
-    permissions_map = {
-        "admin": [
-            "product:view", "product:create", "product:edit", "product:delete",
-            "order:view", "order:create", "order:cancel", "order:refund",
-            "inventory:view", "inventory:manage",
-            "user:view", "user:manage",
-            "report:view", "report:export",
-            "config:view", "config:manage",
-            "system:admin"
-        ],
-        "manager": [
-            "product:view", "product:create", "product:edit",
-            "order:view", "order:create", "order:cancel", "order:refund",
-            "inventory:view", "inventory:manage",
-            "user:view",
-            "report:view", "report:export",
-            "config:view"
-        ],
-        "cashier": [
-            "product:view",
-            "order:view", "order:create",
-            "inventory:view",
-            "user:view"
-        ],
-        "staff": [
-            "product:view",
-            "order:view",
-            "inventory:view"
-        ]
-    }
-    return permissions_map.get(role, permissions_map["staff"])
+    return list(ROLE_PERMISSIONS.get(role, ROLE_PERMISSIONS["staff"]))
+
+
+@dataclass(frozen=True)
+class Principal:
+    """已认证用户的缓存快照"""
+    id: str
+    username: str
+    name: str
+    role: str
+    avatar: Optional[str]
+    isActive: bool
+    permissions: frozenset
+
+    @classmethod
+    def from_user(cls, user: models.SystemUser) -> "Principal":
+        return cls(
+            id=user.id,
+            username=user.username,
+            name=user.name,
+            role=user.role,
+            avatar=user.avatar,
+            isActive=bool(user.isActive),
+            permissions=ROLE_PERMISSION_SETS.get(user.role, ROLE_PERMISSION_SETS["staff"]),
+        )
+
+
+def load_principal(db: Session, user_id: str) -> Optional[Principal]:
+    """读取用户快照；命中缓存时直接返回，不查询数据库"""
+    principal = principal_cache.get(user_id)
+    if principal is not None:
+        return principal
+    user = db.get(models.SystemUser, user_id)
+    if not user:
+        return None
+    principal = Principal.from_user(user)
+    principal_cache.set(user_id, principal)
+    return principal
+
+
+def invalidate_principal(user_id: str) -> None:
+    """用户被禁用、改密码或改角色后清除缓存"""
+    principal_cache.pop(user_id)
+
+
+@event.listens_for(models.SystemUser, "after_update")
+@event.listens_for(models.SystemUser, "after_delete")
+def _system_user_changed(mapper, connection, target):
+    """flush 时只记录，事务提交后再清除缓存；否则提交前并发的请求可能把旧行重新放回缓存"""
+    session = object_session(target)
+    if session is not None:
+        session.info.setdefault("changed_principals", set()).add(target.id)
+
+
+@event.listens_for(Session, "after_commit")
+def _invalidate_committed_principals(session):
+    for user_id in session.info.pop("changed_principals", ()):
+        invalidate_principal(user_id)
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_principal_changes(session):
+    session.info.pop("changed_principals", None)
+
+
+def issue_token(user: models.SystemUser, token_type: str, ttl: int) -> str:
+    """按 TOKEN_MODE 签发令牌"""
+    if TOKEN_MODE == "signed":
+        return sign_token(user.id, user.role, token_type, ttl)
+    token = generate_token()
+    token_store.put(token, {"user_id": user.id, "type": token_type}, ttl)
+    return token
+
+
+def lookup_token(token: str) -> Optional[dict]:
+    """解析令牌为 {"user_id", "type", "expires"}；签名令牌只校验签名和本地撤销列表"""
+    if is_signed_token(token):
+        payload = decode_token(token)
+        if payload is None:
+            return None
+        return {"user_id": payload["sub"], "type": payload["typ"], "expires": payload["exp"], "payload": payload}
+    return token_store.get(token)
+
+
+def discard_token(token: str, token_data: Optional[dict] = None) -> None:
+    """注销令牌：签名令牌加入撤销列表，随机令牌从存储删除"""
+    if is_signed_token(token):
+        token_data = token_data or lookup_token(token)
+        if token_data and time.time() <= token_data["expires"]:
+            revocation_list.revoke_token(token_data["payload"])
+    else:
+        token_store.delete(token)
 
 
 def create_tokens(user: models.SystemUser) -> tuple[str, str]:
     """创建访问令牌和刷新令牌"""
-    access_token = generate_token()
-    refresh_token = generate_token()
-
-    # 存储token信息
-    active_tokens[access_token] = {
-        "user_id": user.id,
-        "type": "access",
-        "expires": datetime.utcnow() + timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
-    }
-    active_tokens[refresh_token] = {
-        "user_id": user.id,
-        "type": "refresh",
-        "expires": datetime.utcnow() + timedelta(days=REFRESH_TOKEN_EXPIRE_DAYS)
-    }
-
+    access_token = issue_token(user, "access", ACCESS_TOKEN_TTL)
+    refresh_token = issue_token(user, "refresh", REFRESH_TOKEN_TTL)
     return access_token, refresh_token
 
 
-def get_current_user(
+def get_current_principal(
     credentials: HTTPAuthorizationCredentials = Depends(security),
     db: Session = Depends(get_db)
-) -> models.SystemUser:
-    """获取当前用户（依赖注入）"""
+) -> Principal:
+    """获取当前用户快照（依赖注入）"""
     token = credentials.credentials
 
-    token_data = active_tokens.get(token)
+    token_data = lookup_token(token)
     if not token_data:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="无效的访问令牌"
         )
 
-    if datetime.utcnow() > token_data["expires"]:
-        del active_tokens[token]
+    if time.time() > token_data["expires"]:
+        discard_token(token, token_data)
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="访问令牌已过期"
@@ -167,39 +258,67 @@ def get_current_user(
             detail="无效的令牌类型"
         )
 
-    user = db.get(models.SystemUser, token_data["user_id"])
-    if not user:
+    principal = load_principal(db, token_data["user_id"])
+    if not principal:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="用户不存在"
         )
 
-    if not user.isActive:
+    if not principal.isActive:
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
             detail="用户已被禁用"
         )
 
+    return principal
+
+
+def get_current_user(
+    principal: Principal = Depends(get_current_principal),
+    db: Session = Depends(get_db)
+) -> models.SystemUser:
+    """获取当前用户数据库记录（需要修改用户时使用）"""
+    user = db.get(models.SystemUser, principal.id)
+    if not user:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="用户不存在"
+        )
     return user
 
 
+def require_permission(permission: str):
+    """权限校验依赖：Depends(require_permission("order:create"))"""
+    def checker(principal: Principal = Depends(get_current_principal)) -> Principal:
+        if permission not in principal.permissions:
+            raise HTTPException(
+                status_code=status.HTTP_403_FORBIDDEN,
+                detail="权限不足"
+            )
+        return principal
+    return checker
+
+
 # ==================== API端点 ====================
 
 @router.post("/login", response_model=TokenResponse)
-def login(request: LoginRequest, db: Session = Depends(get_db)):
-    """用户登录"""
+async def login(request: LoginRequest, db: AsyncSession = Depends(get_async_db)):
+    """用户登录（密码校验在独立线程池中执行，不阻塞事件循环）"""
     # 查找用户
-    user = db.query(models.SystemUser).filter(
-        models.SystemUser.username == request.username
-    ).first()
+    user = (await db.execute(
+        select(models.SystemUser).where(models.SystemUser.username == request.username)
+    )).scalars().first()
 
     if not user:
+        # 同样执行一次校验，使响应时间与密码错误时一致
+        await verify_password_async(request.password, DUMMY_HASH)
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="用户名或密码错误"
         )
 
-    if not verify_password(request.password, user.passwordHash):
+    if not await verify_password_async(request.password, user.passwordHash):
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="用户名或密码错误"
@@ -211,12 +330,16 @@ def login(request: LoginRequest, db: Session = Depends(get_db)):
             detail="用户已被禁用"
         )
 
+    # 旧格式或低于当前成本参数的哈希，用本次明文重新计算
+    if needs_rehash(user.passwordHash):
+        user.passwordHash = await hash_password_async(request.password)
+
     # 生成令牌
-    access_token, refresh_token = create_tokens(user)
+    access_token, refresh_token = await run_in_threadpool(create_tokens, user)
 
     # 更新最后登录时间
     user.lastLogin = datetime.utcnow().isoformat()
-    db.commit()
+    await db.commit()
 
     return TokenResponse(
         access_token=access_token,
@@ -233,12 +356,12 @@ def login(request: LoginRequest, db: Session = Depends(get_db)):
 
 
 @router.post("/register")
-def register(request: RegisterRequest, db: Session = Depends(get_db)):
-    """用户注册"""
+async def register(request: RegisterRequest, db: AsyncSession = Depends(get_async_db)):
+    """用户注册（密码哈希在独立线程池中计算）"""
     # 检查用户名是否存在
-    existing_user = db.query(models.SystemUser).filter(
-        models.SystemUser.username == request.username
-    ).first()
+    existing_user = (await db.execute(
+        select(models.SystemUser).where(models.SystemUser.username == request.username)
+    )).scalars().first()
 
     if existing_user:
         raise HTTPException(
@@ -250,7 +373,7 @@ def register(request: RegisterRequest, db: Session = Depends(get_db)):
     user = models.SystemUser(
         id=str(uuid.uuid4()),
         username=request.username,
-        passwordHash=hash_password(request.password),
+        passwordHash=await hash_password_async(request.password),
         name=request.name,
         phone=request.phone,
         role=request.role,
@@ -259,8 +382,8 @@ def register(request: RegisterRequest, db: Session = Depends(get_db)):
     )
 
     db.add(user)
-    db.commit()
-    db.refresh(user)
+    await db.commit()
+    await db.refresh(user)
 
     return {"id": user.id, "username": user.username}
 
@@ -271,14 +394,13 @@ def logout(credentials: HTTPAuthorizationCredentials = Depends(security)):
     token = credentials.credentials
 
     # 删除token
-    if token in active_tokens:
-        del active_tokens[token]
+    discard_token(token)
 
     return {"message": "登出成功"}
 
 
 @router.get("/me", response_model=UserResponse)
-def get_me(current_user: models.SystemUser = Depends(get_current_user)):
+def get_me(current_user: Principal = Depends(get_current_principal)):
     """获取当前用户信息"""
     return UserResponse(
         id=current_user.id,
@@ -293,7 +415,7 @@ def get_me(current_user: models.SystemUser = Depends(get_current_user)):
 @router.post("/refresh")
 def refresh_token(request: RefreshTokenRequest, db: Session = Depends(get_db)):
     """刷新访问令牌"""
-    token_data = active_tokens.get(request.refresh_token)
+    token_data = lookup_token(request.refresh_token)
 
     if not token_data:
         raise HTTPException(
@@ -301,8 +423,8 @@ def refresh_token(request: RefreshTokenRequest, db: Session = Depends(get_db)):
             detail="无效的刷新令牌"
         )
 
-    if datetime.utcnow() > token_data["expires"]:
-        del active_tokens[request.refresh_token]
+    if time.time() > token_data["expires"]:
+        discard_token(request.refresh_token, token_data)
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="刷新令牌已过期"
@@ -322,31 +444,29 @@ def refresh_token(request: RefreshTokenRequest, db: Session = Depends(get_db)):
         )
 
     # 生成新的访问令牌
-    new_access_token = generate_token()
-    active_tokens[new_access_token] = {
-        "user_id": user.id,
-        "type": "access",
-        "expires": datetime.utcnow() + timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
-    }
+    new_access_token = issue_token(user, "access", ACCESS_TOKEN_TTL)
 
     return {"access_token": new_access_token}
 
 
 @router.post("/change-password")
-def change_password(
+async def change_password(
     request: ChangePasswordRequest,
     current_user: models.SystemUser = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
-    """修改密码"""
-    if not verify_password(request.oldPassword, current_user.passwordHash):
+    """修改密码（密码校验和哈希在独立线程池中执行，同步会话的提交也放到线程池）"""
+    if not await verify_password_async(request.oldPassword, current_user.passwordHash):
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="原密码错误"
         )
 
-    current_user.passwordHash = hash_password(request.newPassword)
+    current_user.passwordHash = await hash_password_async(request.newPassword)
     current_user.updatedAt = datetime.utcnow().isoformat()
-    db.commit()
+    await run_in_threadpool(db.commit)
+
+    # 此前签发的签名令牌全部失效
+    await run_in_threadpool(revocation_list.revoke_user, current_user.id, REFRESH_TOKEN_TTL)
 
     return {"message": "密码修改成功"}
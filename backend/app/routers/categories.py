@@ -1,20 +1,23 @@
 from typing import List
-from fastapi import APIRouter, Depends
-from sqlalchemy.orm import Session
-from backend.app.database import SessionLocal
+from fastapi import APIRouter, Depends, Request
+from pydantic import TypeAdapter
+from sqlalchemy.ext.asyncio import AsyncSession
+from backend.app.database import get_async_db
 from backend.app import crud
+from backend.app.menu_cache import MENU_VERSION_KEY, menu_cache
 from backend.app.schemas import Category
 
 router = APIRouter(prefix="/api/categories", tags=["categories"])
 
-def get_db():
-    db = SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
+category_list = TypeAdapter(List[Category])
 
 @router.get("/", response_model=List[Category])
-def list_categories(db: Session = Depends(get_db)):
-    return crud.list_categories(db)
+async def list_categories(request: Request, db: AsyncSession = Depends(get_async_db)):
+    """返回预序列化的快照，支持 If-None-Match"""
+    async def build() -> bytes:
+        objs = await db.run_sync(crud.list_categories)
+        return category_list.dump_json(category_list.validate_python(objs, from_attributes=True))
 
+    version = await db.run_sync(crud.get_config_value, MENU_VERSION_KEY, "")
+    snapshot = await menu_cache.get_or_build("categories", version, build)
+    return snapshot.response(request)
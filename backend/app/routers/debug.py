@@ -0,0 +1,21 @@
+from typing import Optional
+from fastapi import APIRouter, Depends
+from pydantic import BaseModel, Field
+from backend.app import profiling
+from backend.app.routers.auth import require_permission
+
+router = APIRouter(prefix="/api/debug", tags=["debug"])
+
+class ProfilingUpdate(BaseModel):
+    enabled: Optional[bool] = None
+    slow_query_ms: Optional[float] = Field(None, ge=0)
+    explain: Optional[bool] = None
+    query_budget: Optional[int] = Field(None, ge=0)
+
+@router.get("/profiling", dependencies=[Depends(require_permission("system:admin"))])
+def get_profiling():
+    return profiling.settings.to_dict()
+
+@router.put("/profiling", dependencies=[Depends(require_permission("system:admin"))])
+def update_profiling(payload: ProfilingUpdate):
+    return profiling.update_settings(**payload.model_dump()).to_dict()
@@ -0,0 +1,117 @@
+"""
+数据导出路由 - 以NDJSON/CSV流式输出订单、订单项和库存日志
+"""
+
+import csv
+import io
+import json
+from typing import Callable, Iterator, List, Literal, Optional
+
+from fastapi import APIRouter
+from fastapi.responses import StreamingResponse
+
+from backend.app.database import SessionLocal
+from backend.app import crud, models
+
+router = APIRouter(prefix="/api/export", tags=["export"])
+
+# 每次向客户端写出的行数
+FLUSH_ROWS = 500
+
+MEDIA_TYPES = {
+    "ndjson": "application/x-ndjson",
+    "csv": "text/csv; charset=utf-8",
+}
+
+ORDER_ITEM_COLUMNS = [c.name for c in models.OrderItem.__table__.columns] + ["orderNo", "timestamp"]
+
+
+def _encode_ndjson(rows: Iterator[dict]) -> Iterator[str]:
+    buf: List[str] = []
+    for row in rows:
+        buf.append(json.dumps(row, ensure_ascii=False))
+        if len(buf) >= FLUSH_ROWS:
+            yield "\n".join(buf) + "\n"
+            buf = []
+    if buf:
+        yield "\n".join(buf) + "\n"
+
+
+def _encode_csv(rows: Iterator[dict], columns: List[str]) -> Iterator[str]:
+    out = io.StringIO()
+    writer = csv.DictWriter(out, fieldnames=columns, extrasaction="ignore")
+    writer.writeheader()
+    count = 0
+    for row in rows:
+        writer.writerow(row)
+        count += 1
+        if count >= FLUSH_ROWS:
+            yield out.getvalue()
+            out.seek(0)
+            out.truncate()
+            count = 0
+    yield out.getvalue()
+
+
+def _stream(fetch: Callable, fmt: str, columns: List[str], filename: str) -> StreamingResponse:
+    """会话由生成器自行持有，直到最后一个字节写出后才关闭"""
+    def body() -> Iterator[str]:
+        db = SessionLocal()
+        try:
+            rows = fetch(db)
+            if fmt == "csv":
+                yield from _encode_csv(rows, columns)
+            else:
+                yield from _encode_ndjson(rows)
+        finally:
+            db.close()
+
+    return StreamingResponse(
+        body(),
+        media_type=MEDIA_TYPES[fmt],
+        headers={"Content-Disposition": f'attachment; filename="{filename}.{fmt}"'},
+    )
+
+
+@router.get("/orders")
+def export_orders(
+    format: Literal["ndjson", "csv"] = "ndjson",
+    start_ts: Optional[int] = None,
+    end_ts: Optional[int] = None,
+    status: Optional[str] = None,
+):
+    """导出订单"""
+    columns = [c.name for c in models.Order.__table__.columns]
+    return _stream(
+        lambda db: crud.iter_orders_export(db, start_ts, end_ts, status),
+        format, columns, "orders",
+    )
+
+
+@router.get("/order-items")
+def export_order_items(
+    format: Literal["ndjson", "csv"] = "ndjson",
+    start_ts: Optional[int] = None,
+    end_ts: Optional[int] = None,
+    status: Optional[str] = None,
+):
+    """导出订单项（附带订单号和下单时间）"""
+    return _stream(
+        lambda db: crud.iter_order_items_export(db, start_ts, end_ts, status),
+        format, ORDER_ITEM_COLUMNS, "order_items",
+    )
+
+
+@router.get("/stock-logs")
+def export_stock_logs(
+    format: Literal["ndjson", "csv"] = "ndjson",
+    start_ts: Optional[int] = None,
+    end_ts: Optional[int] = None,
+    product_id: Optional[str] = None,
+):
+    """导出库存日志"""
+    columns = [c.name for c in models.StockLog.__table__.columns]
+    return _stream(
+        lambda db: crud.iter_stock_logs_export(db, start_ts, end_ts, product_id),
+        format, columns, "stock_logs",
+    )
@@ -0,0 +1,44 @@
+"""
+顾客扫码点单菜单 - 一次请求返回桌台信息和按分类分组的在架商品
+
+分类和商品正文经 menu_cache 预序列化并压缩，按共享版本号缓存，商品或分类变化后各 worker 都会重建；
+所有桌台共用同一份快照，桌台信息在快照外拼接，不随桌台数量增加缓存条目。
+"""
+
+from typing import List, Optional
+
+from fastapi import APIRouter, HTTPException, Request
+from pydantic import TypeAdapter
+
+from backend.app.database import AsyncSessionLocal
+from backend.app import crud
+from backend.app.menu_cache import MENU_VERSION_KEY, menu_cache
+from backend.app.schemas import Menu, MenuCategory, MenuTable
+
+router = APIRouter(prefix="/api/menu", tags=["menu"])
+
+category_list = TypeAdapter(List[MenuCategory])
+
+
+@router.get("", response_model=Menu)
+async def get_menu(request: Request, table: Optional[str] = None):
+    """table 为桌台 id 或二维码内容；命中缓存时只读取菜单版本号和桌台"""
+    def lookup(db):
+        return crud.get_config_value(db, MENU_VERSION_KEY, ""), crud.find_table(db, table) if table else None
+
+    async with AsyncSessionLocal() as db:
+        version, obj = await db.run_sync(lookup)
+    table_json = b"null"
+    if table:
+        if obj is None:
+            raise HTTPException(status_code=404, detail="桌台不存在")
+        table_json = MenuTable.model_validate(obj).model_dump_json().encode()
+
+    async def build() -> bytes:
+        async with AsyncSessionLocal() as db:
+            categories = await db.run_sync(crud.menu)
+        return category_list.dump_json(category_list.validate_python(categories))
+
+    snapshot = await menu_cache.get_or_build("menu", version, build)
+    # 与 Menu 的字段顺序一致：{"table": ..., "categories": [...]}
+    return snapshot.response(request, b'{"table":' + table_json + b',"categories":', b"}")
@@ -1,24 +1,60 @@
 from typing import List, Optional
-from fastapi import APIRouter, Depends
-from sqlalchemy.orm import Session
-from backend.app.database import SessionLocal
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy.ext.asyncio import AsyncSession
+from backend.app.database import get_async_db
 from backend.app import crud
-from backend.app.schemas import Order, OrderCreate
+from backend.app.schemas import Order, OrderCreate, OrderPage, OrderBatchCreate, OrderBatchResult
 
 router = APIRouter(prefix="/api/orders", tags=["orders"])
 
-def get_db():
-    db = SessionLocal()
+@router.get("/", response_model=List[Order])
+async def list_orders(
+    status: Optional[str] = None,
+    type: Optional[str] = None,
+    table_id: Optional[str] = None,
+    start_ts: Optional[int] = None,
+    end_ts: Optional[int] = None,
+    db: AsyncSession = Depends(get_async_db)
+):
+    return await db.run_sync(crud.list_orders, status, type, table_id, start_ts, end_ts)
+
+@router.get("/page", response_model=OrderPage)
+async def list_orders_page(
+    limit: int = Query(50, ge=1, le=500),
+    cursor: Optional[str] = None,
+    status: Optional[str] = None,
+    type: Optional[str] = None,
+    table_id: Optional[str] = None,
+    start_ts: Optional[int] = None,
+    end_ts: Optional[int] = None,
+    db: AsyncSession = Depends(get_async_db)
+):
     try:
-        yield db
-    finally:
-        db.close()
+        items, next_cursor = await db.run_sync(
+            crud.list_orders_page, limit, cursor, status, type, table_id, start_ts, end_ts
+        )
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    return OrderPage(items=items, nextCursor=next_cursor)
 
-@router.get("/", response_model=List[Order])
-def list_orders(status: Optional[str] = None, db: Session = Depends(get_db)):
-    return crud.list_orders(db, status)
+@router.get("/{order_id}", response_model=Order)
+async def get_order(order_id: str, db: AsyncSession = Depends(get_async_db)):
+    obj = await db.run_sync(crud.get_order, order_id)
+    if not obj:
+        raise HTTPException(status_code=404, detail="Not found")
+    return obj
 
 @router.post("/", response_model=Order)
-def create_order(payload: OrderCreate, db: Session = Depends(get_db)):
-    return crud.create_order(db, payload.model_dump())
+async def create_order(payload: OrderCreate, db: AsyncSession = Depends(get_async_db)):
+    try:
+        return await db.run_sync(crud.create_order, payload.model_dump())
+    except crud.InsufficientStockError as e:
+        raise HTTPException(status_code=409, detail=str(e))
 
+@router.post("/batch", response_model=OrderBatchResult)
+async def create_orders_batch(payload: OrderBatchCreate, db: AsyncSession = Depends(get_async_db)):
+    results = await db.run_sync(crud.create_orders_bulk, [o.model_dump() for o in payload.orders])
+    counts = {status: sum(1 for r in results if r["status"] == status) for status in ("created", "duplicate", "rejected")}
+    return OrderBatchResult(
+        created=counts["created"], duplicates=counts["duplicate"], rejected=counts["rejected"], results=results
+    )
@@ -1,45 +1,53 @@
 from typing import List
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
-from backend.app.database import SessionLocal
+from fastapi import APIRouter, Depends, HTTPException, Request
+from pydantic import TypeAdapter
+from sqlalchemy.ext.asyncio import AsyncSession
+from backend.app.database import get_async_db
 from backend.app import crud
-from backend.app.schemas import Product, ProductCreate
+from backend.app.menu_cache import MENU_VERSION_KEY, menu_cache
+from backend.app.schemas import CatalogProduct, Product, ProductCreate, ProductStock
 
 router = APIRouter(prefix="/api/products", tags=["products"])
 
-def get_db():
-    db = SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
+product_list = TypeAdapter(List[CatalogProduct])
 
-@router.get("/", response_model=List[Product])
-def list_products(db: Session = Depends(get_db)):
-    return crud.list_products(db)
+@router.get("/", response_model=List[CatalogProduct])
+async def list_products(request: Request, db: AsyncSession = Depends(get_async_db)):
+    """返回预序列化的快照，支持 If-None-Match；快照不含库存，库存见 /stock"""
+    async def build() -> bytes:
+        objs = await db.run_sync(crud.list_products)
+        return product_list.dump_json(product_list.validate_python(objs, from_attributes=True))
+
+    version = await db.run_sync(crud.get_config_value, MENU_VERSION_KEY, "")
+    snapshot = await menu_cache.get_or_build("products", version, build)
+    return snapshot.response(request)
+
+@router.get("/stock", response_model=List[ProductStock])
+async def list_product_stock(db: AsyncSession = Depends(get_async_db)):
+    """各商品实时库存，不缓存"""
+    return await db.run_sync(crud.list_product_stock)
 
 @router.get("/{product_id}", response_model=Product)
-def get_product(product_id: str, db: Session = Depends(get_db)):
-    obj = crud.get_product(db, product_id)
+async def get_product(product_id: str, db: AsyncSession = Depends(get_async_db)):
+    obj = await db.run_sync(crud.get_product, product_id)
     if not obj:
         raise HTTPException(status_code=404, detail="Not found")
     return obj
 
 @router.post("/", response_model=Product)
-def create_product(payload: ProductCreate, db: Session = Depends(get_db)):
-    return crud.create_product(db, payload.model_dump())
+async def create_product(payload: ProductCreate, db: AsyncSession = Depends(get_async_db)):
+    return await db.run_sync(crud.create_product, payload.model_dump())
 
 @router.put("/{product_id}", response_model=Product)
-def update_product(product_id: str, payload: ProductCreate, db: Session = Depends(get_db)):
-    obj = crud.update_product(db, product_id, payload.model_dump())
+async def update_product(product_id: str, payload: ProductCreate, db: AsyncSession = Depends(get_async_db)):
+    obj = await db.run_sync(crud.update_product, product_id, payload.model_dump())
     if not obj:
         raise HTTPException(status_code=404, detail="Not found")
     return obj
 
 @router.delete("/{product_id}")
-def delete_product(product_id: str, db: Session = Depends(get_db)):
-    ok = crud.delete_product(db, product_id)
+async def delete_product(product_id: str, db: AsyncSession = Depends(get_async_db)):
+    ok = await db.run_sync(crud.delete_product, product_id)
     if not ok:
         raise HTTPException(status_code=404, detail="Not found")
     return {"ok": True}
-
@@ -1,19 +1,12 @@
 from typing import List
 from fastapi import APIRouter, Depends
 from sqlalchemy.orm import Session
-from backend.app.database import SessionLocal
+from backend.app.database import get_db
 from backend.app import crud
 from backend.app.schemas import Reservation, ReservationCreate
 
 router = APIRouter(prefix="/api/reservations", tags=["reservations"])
 
-def get_db():
-    db = SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
-
 @router.get("/", response_model=List[Reservation])
 def list_reservations(db: Session = Depends(get_db)):
     return crud.list_reservations(db)
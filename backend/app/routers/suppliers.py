@@ -1,20 +1,13 @@
 from typing import List
-from fastapi import APIRouter, Depends
+from fastapi import APIRouter, Depends, HTTPException
 from sqlalchemy.orm import Session
-from backend.app.database import SessionLocal
+from backend.app.database import get_db
 from backend.app import crud
 from backend.app.schemas import Supplier
 from fastapi import Body
 
 router = APIRouter(prefix="/api/suppliers", tags=["suppliers"])
 
-def get_db():
-    db = SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
-
 @router.get("/", response_model=List[Supplier])
 def list_suppliers(db: Session = Depends(get_db)):
     return crud.list_suppliers(db)
@@ -28,3 +21,9 @@ def create_supplier(
     db: Session = Depends(get_db)
 ):
     return crud.create_supplier(db, name, contactName, phone, email)
+
+@router.delete("/{supplier_id}")
+def delete_supplier(supplier_id: str, db: Session = Depends(get_db)):
+    if not crud.delete_supplier(db, supplier_id):
+        raise HTTPException(status_code=404, detail="Not found")
+    return {"ok": True}
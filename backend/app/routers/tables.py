@@ -1,31 +1,124 @@
-from typing import List
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
-from backend.app.database import SessionLocal
-from backend.app import crud
-from backend.app.schemas import Table, TableCreate
+import asyncio
+import json
+from typing import List, Optional
+from fastapi import APIRouter, Depends, HTTPException, Header, Request, WebSocket, WebSocketDisconnect
+from fastapi.responses import StreamingResponse
+from sqlalchemy.ext.asyncio import AsyncSession
+from backend.app.database import AsyncSessionLocal, get_async_db
+from backend.app import crud, realtime
+from backend.app.realtime import REALTIME_HEARTBEAT, hub
+from backend.app.schemas import Table, TableChanges, TableCreate
 
 router = APIRouter(prefix="/api/tables", tags=["tables"])
 
-def get_db():
-    db = SessionLocal()
+@router.get("/", response_model=List[Table])
+async def list_tables(db: AsyncSession = Depends(get_async_db)):
+    return await db.run_sync(crud.list_tables)
+
+@router.post("/", response_model=Table)
+async def create_table(payload: TableCreate, db: AsyncSession = Depends(get_async_db)):
+    return await db.run_sync(crud.create_table, payload.model_dump())
+
+# ==================== 变更推送 ====================
+
+async def _snapshot() -> dict:
+    """完整快照，版本号取自共享的 table_changes"""
+    async with AsyncSessionLocal() as db:
+        version, tables = await db.run_sync(realtime.snapshot)
+    return {"type": "snapshot", "epoch": hub.epoch, "version": version, "tables": tables}
+
+async def _changes_since(since: Optional[int], epoch: Optional[str]) -> Optional[list]:
+    """since 之后的变更（可能由其他 worker 推送过）；版本号来自其他库或已被清理时返回 None"""
+    if since is None or (epoch is not None and epoch != hub.epoch):
+        return None
+    async with AsyncSessionLocal() as db:
+        return await db.run_sync(realtime.changes_since, since)
+
+async def _initial_events(since: Optional[int], epoch: Optional[str]) -> list:
+    """重连时只补发 since 之后的变更，无法补齐时发送快照"""
+    changes = await _changes_since(since, epoch)
+    return changes if changes is not None else [await _snapshot()]
+
+def _parse_last_event_id(value: Optional[str]) -> tuple:
+    """SSE 事件 id 形如 "epoch:version" """
+    if value and ":" in value:
+        epoch, version = value.rsplit(":", 1)
+        if version.isdigit():
+            return epoch, int(version)
+    return None, None
+
+def _sse(event: dict) -> str:
+    return f"id: {hub.epoch}:{event['version']}\nevent: {event['type']}\ndata: {json.dumps(event, ensure_ascii=False)}\n\n"
+
+async def _events(since: Optional[int], epoch: Optional[str]):
+    """订阅后依次产出补发事件和实时事件；订阅者跟不上时改发快照"""
+    sub = hub.subscribe()
     try:
-        yield db
+        for event in await _initial_events(since, epoch):
+            yield event
+        while True:
+            try:
+                event = await asyncio.wait_for(sub.queue.get(), timeout=REALTIME_HEARTBEAT)
+            except asyncio.TimeoutError:
+                yield None
+                continue
+            if sub.lagging:
+                sub.lagging = False
+                while not sub.queue.empty():
+                    sub.queue.get_nowait()
+                yield await _snapshot()
+            else:
+                yield event
     finally:
-        db.close()
+        hub.unsubscribe(sub)
 
-@router.get("/", response_model=List[Table])
-def list_tables(db: Session = Depends(get_db)):
-    return crud.list_tables(db)
+@router.get("/changes", response_model=TableChanges)
+async def table_changes(since: int, epoch: Optional[str] = None):
+    """轮询客户端的增量接口：返回 since 之后变更过的桌台；reset=true 时 tables 为完整列表"""
+    changes = await _changes_since(since, epoch)
+    if changes is None:
+        snapshot = await _snapshot()
+        return {"epoch": snapshot["epoch"], "version": snapshot["version"], "reset": True, "tables": snapshot["tables"]}
+    version = changes[-1]["version"] if changes else since
+    return {"epoch": hub.epoch, "version": version, "reset": False, "tables": [e["table"] for e in changes]}
 
-@router.post("/", response_model=Table)
-def create_table(payload: TableCreate, db: Session = Depends(get_db)):
-    return crud.create_table(db, payload.model_dump())
+@router.get("/stream")
+async def stream_tables(
+    request: Request,
+    since: Optional[int] = None,
+    epoch: Optional[str] = None,
+    last_event_id: Optional[str] = Header(None),
+):
+    """SSE：首条为快照（或 since 之后的增量），之后推送 table.created / table.updated"""
+    if since is None:
+        epoch, since = _parse_last_event_id(last_event_id)
+
+    async def body():
+        async for event in _events(since, epoch):
+            if await request.is_disconnected():
+                break
+            yield ": keep-alive\n\n" if event is None else _sse(event)
+
+    return StreamingResponse(body(), media_type="text/event-stream", headers={
+        "Cache-Control": "no-cache",
+        "X-Accel-Buffering": "no",
+    })
+
+@router.websocket("/ws")
+async def tables_ws(websocket: WebSocket, since: Optional[int] = None, epoch: Optional[str] = None):
+    """WebSocket：消息格式与 SSE 的 data 相同，心跳为 {"type": "ping"}"""
+    await websocket.accept()
+    try:
+        async for event in _events(since, epoch):
+            await websocket.send_json({"type": "ping"} if event is None else event)
+    except WebSocketDisconnect:
+        pass
 
 @router.put("/{table_id}", response_model=Table)
-def update_table(table_id: str, payload: TableCreate, db: Session = Depends(get_db)):
-    obj = crud.update_table(db, table_id, payload.model_dump())
+async def update_table(table_id: str, payload: TableCreate, db: AsyncSession = Depends(get_async_db)):
+    # 未传 currentOrderId 时保留下单时关联的订单
+    data = payload.model_dump(exclude={"currentOrderId"} if "currentOrderId" not in payload.model_fields_set else None)
+    obj = await db.run_sync(crud.update_table, table_id, data)
     if not obj:
         raise HTTPException(status_code=404, detail="Not found")
     return obj
-
@@ -1,24 +1,36 @@
-from typing import List
-from fastapi import APIRouter, Depends
+from typing import List, Optional
+from fastapi import APIRouter, Depends, HTTPException, Query
 from sqlalchemy.orm import Session
-from backend.app.database import SessionLocal
+from backend.app.database import get_db
 from backend.app import crud
-from backend.app.schemas import User, UserCreate
+from backend.app.schemas import User, UserCreate, UserPage
 
 router = APIRouter(prefix="/api/users", tags=["users"])
 
-def get_db():
-    db = SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
-
 @router.get("/", response_model=List[User])
 def list_users(db: Session = Depends(get_db)):
     return crud.list_users(db)
 
+@router.get("/search", response_model=UserPage)
+def search_users(
+    q: str = Query(..., min_length=1, max_length=100),
+    limit: int = Query(20, ge=1, le=100),
+    cursor: Optional[str] = None,
+    db: Session = Depends(get_db)
+):
+    """收银台会员查找：q 为手机号前缀或姓名片段"""
+    try:
+        items, next_cursor = crud.search_users(db, q, limit, cursor)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    return UserPage(items=items, nextCursor=next_cursor)
+
 @router.post("/", response_model=User)
 def create_user(payload: UserCreate, db: Session = Depends(get_db)):
     return crud.create_user(db, payload.model_dump())
 
+@router.delete("/{user_id}")
+def delete_user(user_id: str, db: Session = Depends(get_db)):
+    if not crud.delete_user(db, user_id):
+        raise HTTPException(status_code=404, detail="Not found")
+    return {"ok": True}
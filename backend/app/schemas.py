@@ -1,6 +1,6 @@
-from typing import List, Optional
-from pydantic import BaseModel
-from pydantic import ConfigDict
+from typing import Annotated, List, Optional
+from pydantic import BaseModel, Field
+from pydantic import BeforeValidator, ConfigDict
 
 class Category(BaseModel):
     id: str
@@ -16,21 +16,61 @@ class Supplier(BaseModel):
     email: Optional[str] = None
     model_config = ConfigDict(from_attributes=True)
 
-class Product(BaseModel):
+def _split_sales_mode(v):
+    # 数据库中以逗号分隔存储
+    if isinstance(v, str):
+        return [m for m in v.split(",") if m]
+    return v
+
+SalesMode = Annotated[Optional[List[str]], BeforeValidator(_split_sales_mode)]
+
+class CatalogProduct(BaseModel):
+    """商品目录字段，不含实时库存；商品列表快照按此序列化"""
     id: str
     name: str
     price: float
     costPrice: Optional[float] = None
     categoryId: str
     image: Optional[str] = None
-    stock: int
     minStock: Optional[int] = None
     unit: str
-    salesMode: Optional[List[str]] = None
+    salesMode: SalesMode = None
     isOnShelf: bool
     supplierId: Optional[str] = None
     model_config = ConfigDict(from_attributes=True)
 
+class Product(CatalogProduct):
+    stock: int
+
+class ProductStock(BaseModel):
+    id: str
+    stock: int
+    model_config = ConfigDict(from_attributes=True)
+
+class MenuProduct(BaseModel):
+    id: str
+    name: str
+    price: float
+    image: Optional[str] = None
+    unit: str
+    salesMode: SalesMode = None
+
+class MenuCategory(BaseModel):
+    id: str
+    name: str
+    icon: Optional[str] = None
+    products: List[MenuProduct]
+
+class MenuTable(BaseModel):
+    id: str
+    name: str
+    area: Optional[str] = None
+    model_config = ConfigDict(from_attributes=True)
+
+class Menu(BaseModel):
+    table: Optional[MenuTable] = None
+    categories: List[MenuCategory]
+
 class ProductCreate(BaseModel):
     name: str
     price: float
@@ -58,6 +98,13 @@ class TableCreate(BaseModel):
     status: str
     capacity: int
     area: Optional[str] = None
+    currentOrderId: Optional[str] = None
+
+class TableChanges(BaseModel):
+    epoch: str
+    version: int
+    reset: bool
+    tables: List[Table]
 
 class User(BaseModel):
     id: str
@@ -70,6 +117,10 @@ class User(BaseModel):
     joinDate: str
     model_config = ConfigDict(from_attributes=True)
 
+class UserPage(BaseModel):
+    items: List[User]
+    nextCursor: Optional[str] = None
+
 class UserCreate(BaseModel):
     name: str
     phone: str
@@ -112,6 +163,10 @@ class Order(BaseModel):
     type: str
     model_config = ConfigDict(from_attributes=True)
 
+class OrderPage(BaseModel):
+    items: List[Order]
+    nextCursor: Optional[str] = None
+
 class OrderCreate(BaseModel):
     orderNo: str
     tableId: str
@@ -121,6 +176,21 @@ class OrderCreate(BaseModel):
     timestamp: int
     type: str
 
+class OrderBatchCreate(BaseModel):
+    orders: List[OrderCreate] = Field(..., max_length=2000)
+
+class OrderBatchItemResult(BaseModel):
+    orderNo: str
+    id: Optional[str] = None
+    status: str  # created, duplicate, rejected
+    detail: Optional[str] = None
+
+class OrderBatchResult(BaseModel):
+    created: int
+    duplicates: int
+    rejected: int = 0
+    results: List[OrderBatchItemResult]
+
 class Reservation(BaseModel):
     id: str
     tableId: str
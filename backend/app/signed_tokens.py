@@ -0,0 +1,192 @@
+"""
+签名访问令牌 - HMAC-SHA256 自包含令牌，校验时不查询令牌存储
+
+格式: v2.<base64url(payload)>.<base64url(signature)>
+payload: {"sub": 用户ID, "role": 角色, "typ": access/refresh, "iat": 签发时间（毫秒）, "exp": 过期时间（秒）, "jti": 令牌ID}
+
+iat 精确到毫秒，修改密码后同一秒内重新登录签发的令牌不会被用户级撤销误判（v1 的 iat 只到秒，已不再接受）。
+
+签名密钥取自 SECRET_KEY 环境变量；未设置时首次使用生成并保存在 system_configs（auth.secret_key），
+所有 worker 和重启后共用同一密钥。注销和修改密码通过撤销列表生效，撤销列表按
+REVOCATION_REFRESH_INTERVAL 秒从数据库增量同步到本进程内存。
+"""
+
+import base64
+import hashlib
+import hmac
+import json
+import os
+import secrets
+import threading
+import time
+from typing import Optional
+
+from sqlalchemy import select, delete
+from sqlalchemy.exc import IntegrityError
+
+from backend.app.database import SessionLocal
+from backend.app import models
+
+TOKEN_PREFIX = "v2."
+SECRET_KEY_CONFIG = "auth.secret_key"
+REVOCATION_REFRESH_INTERVAL = float(os.environ.get("REVOCATION_REFRESH_INTERVAL", "5"))
+
+_secret_key: Optional[bytes] = None
+_secret_lock = threading.Lock()
+
+
+def _b64encode(raw: bytes) -> str:
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def _b64decode(text: str) -> bytes:
+    return base64.urlsafe_b64decode(text + "=" * (-len(text) % 4))
+
+
+def get_secret_key() -> bytes:
+    """读取持久化的签名密钥"""
+    global _secret_key
+    if _secret_key is not None:
+        return _secret_key
+    with _secret_lock:
+        if _secret_key is None:
+            env_key = os.environ.get("SECRET_KEY")
+            _secret_key = env_key.encode() if env_key else _load_or_create_key()
+    return _secret_key
+
+
+def _load_or_create_key() -> bytes:
+    with SessionLocal() as db:
+        stmt = select(models.SystemConfig.value).where(models.SystemConfig.key == SECRET_KEY_CONFIG)
+        value = db.execute(stmt).scalar()
+        if value is None:
+            db.add(models.SystemConfig(
+                key=SECRET_KEY_CONFIG,
+                value=secrets.token_hex(32),
+                type="string",
+                description="访问令牌签名密钥",
+                group="auth",
+            ))
+            try:
+                db.commit()
+            except IntegrityError:
+                # 其他 worker 已先写入
+                db.rollback()
+            value = db.execute(stmt).scalar()
+        return value.encode()
+
+
+def is_signed_token(token: str) -> bool:
+    return token.startswith(TOKEN_PREFIX)
+
+
+def sign_token(user_id: str, role: str, token_type: str, ttl: int) -> str:
+    """签发令牌"""
+    now_ms = time.time_ns() // 1_000_000
+    payload = {
+        "sub": user_id,
+        "role": role,
+        "typ": token_type,
+        "iat": now_ms,
+        "exp": now_ms // 1000 + ttl,
+        "jti": secrets.token_urlsafe(12),
+    }
+    body = _b64encode(json.dumps(payload, separators=(",", ":")).encode())
+    signature = hmac.new(get_secret_key(), body.encode(), hashlib.sha256).digest()
+    return f"{TOKEN_PREFIX}{body}.{_b64encode(signature)}"
+
+
+def decode_token(token: str) -> Optional[dict]:
+    """校验签名并返回 payload；签名错误、格式错误或已撤销时返回 None（不检查过期）"""
+    if not is_signed_token(token):
+        return None
+    try:
+        body, signature = token[len(TOKEN_PREFIX):].split(".")
+        expected = hmac.new(get_secret_key(), body.encode(), hashlib.sha256).digest()
+        if not hmac.compare_digest(expected, _b64decode(signature)):
+            return None
+        payload = json.loads(_b64decode(body))
+    except (ValueError, TypeError):
+        return None
+    if revocation_list.is_revoked(payload):
+        return None
+    return payload
+
+
+class RevocationList:
+    """进程内撤销列表：jti -> 过期时间，userId -> (notBefore 毫秒, 过期时间)"""
+
+    def __init__(self, session_factory=SessionLocal, refresh_interval: float = REVOCATION_REFRESH_INTERVAL):
+        self.session_factory = session_factory
+        self.refresh_interval = refresh_interval
+        self._jtis: dict[str, int] = {}
+        self._not_before: dict[str, tuple[int, int]] = {}
+        self._watermark = 0
+        self._last_refresh = 0.0
+        self._lock = threading.Lock()
+
+    def is_revoked(self, payload: dict) -> bool:
+        if time.monotonic() - self._last_refresh > self.refresh_interval:
+            self.refresh()
+        if payload.get("jti") in self._jtis:
+            return True
+        entry = self._not_before.get(payload.get("sub"))
+        return entry is not None and payload.get("iat", 0) <= entry[0]
+
+    def refresh(self) -> None:
+        """增量同步其他进程写入的撤销记录"""
+        with self._lock:
+            self._last_refresh = time.monotonic()
+            # 回看一个同步周期，覆盖事务提交延迟和时钟误差
+            since = max(0, self._watermark - int(self.refresh_interval * 2) - 1)
+            with self.session_factory() as db:
+                rows = db.execute(select(models.RevokedToken).where(
+                    models.RevokedToken.revokedAt >= since,
+                    models.RevokedToken.expiresAt >= int(time.time()),
+                )).scalars().all()
+            for row in rows:
+                self._apply(row.id, row.userId, row.notBefore, row.expiresAt)
+                self._watermark = max(self._watermark, row.revokedAt)
+
+    def _apply(self, key: str, user_id: Optional[str], not_before: Optional[int], expires_at: int) -> None:
+        if not_before is not None and user_id:
+            self._not_before[user_id] = max(self._not_before.get(user_id, (0, 0)), (not_before, expires_at))
+        else:
+            self._jtis[key] = expires_at
+
+    def _persist(self, row: models.RevokedToken) -> None:
+        with self.session_factory() as db:
+            db.merge(row)
+            db.commit()
+
+    def revoke_token(self, payload: dict) -> None:
+        """撤销单个令牌（注销）"""
+        now = int(time.time())
+        self._apply(payload["jti"], payload.get("sub"), None, payload["exp"])
+        self._persist(models.RevokedToken(
+            id=payload["jti"], userId=payload.get("sub"), notBefore=None,
+            expiresAt=payload["exp"], revokedAt=now,
+        ))
+
+    def revoke_user(self, user_id: str, max_ttl: int) -> None:
+        """撤销用户此前签发的全部令牌（修改密码）；max_ttl 之后这些令牌都已过期，记录可清理"""
+        now_ms = time.time_ns() // 1_000_000
+        now = now_ms // 1000
+        self._apply(f"user:{user_id}", user_id, now_ms, now + max_ttl)
+        self._persist(models.RevokedToken(
+            id=f"user:{user_id}", userId=user_id, notBefore=now_ms,
+            expiresAt=now + max_ttl, revokedAt=now,
+        ))
+
+    def purge_expired(self) -> int:
+        now = int(time.time())
+        with self._lock:
+            self._jtis = {k: exp for k, exp in self._jtis.items() if exp >= now}
+            self._not_before = {k: entry for k, entry in self._not_before.items() if entry[1] >= now}
+        with self.session_factory() as db:
+            result = db.execute(delete(models.RevokedToken).where(models.RevokedToken.expiresAt < now))
+            db.commit()
+            return result.rowcount or 0
+
+
+revocation_list = RevocationList()
@@ -0,0 +1,179 @@
+"""
+令牌存储 - 多进程共享的登录会话
+
+TOKEN_STORE 环境变量选择后端：
+- db（默认）：auth_tokens 表，与业务库共用连接配置
+- redis：REDIS_URL 指向的 Redis，未配置 REDIS_URL 时启动失败（LocalRedis 只是测试用的进程内替身，多 worker 之间不共享）
+"""
+
+import asyncio
+import abc
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from typing import Optional
+
+from sqlalchemy import select, delete
+
+from backend.app.database import SessionLocal
+from backend.app import models
+
+logger = logging.getLogger("pos.auth")
+
+TOKEN_STORE = os.environ.get("TOKEN_STORE", "db")
+REDIS_URL = os.environ.get("REDIS_URL", "")
+REDIS_KEY_PREFIX = os.environ.get("REDIS_KEY_PREFIX", "pos:token:")
+TOKEN_SWEEP_INTERVAL = int(os.environ.get("TOKEN_SWEEP_INTERVAL", "300"))
+
+
+class TokenStore(abc.ABC):
+    """令牌存储接口；get 返回 {"user_id", "type", "expires"}，expires 为 UTC 秒"""
+
+    @abc.abstractmethod
+    def put(self, token: str, data: dict, ttl: int) -> None:
+        ...
+
+    @abc.abstractmethod
+    def get(self, token: str) -> Optional[dict]:
+        ...
+
+    @abc.abstractmethod
+    def delete(self, token: str) -> None:
+        ...
+
+    def purge_expired(self) -> int:
+        """清理过期令牌，返回清理数量"""
+        return 0
+
+
+def _hash_token(token: str) -> str:
+    return hashlib.sha256(token.encode()).hexdigest()
+
+
+class DatabaseTokenStore(TokenStore):
+    """基于 auth_tokens 表的令牌存储"""
+
+    def __init__(self, session_factory=SessionLocal):
+        self.session_factory = session_factory
+
+    def put(self, token: str, data: dict, ttl: int) -> None:
+        with self.session_factory() as db:
+            db.add(models.AuthToken(
+                tokenHash=_hash_token(token),
+                userId=data["user_id"],
+                type=data["type"],
+                expiresAt=int(time.time()) + ttl,
+            ))
+            db.commit()
+
+    def get(self, token: str) -> Optional[dict]:
+        with self.session_factory() as db:
+            row = db.execute(
+                select(models.AuthToken.userId, models.AuthToken.type, models.AuthToken.expiresAt)
+                .where(models.AuthToken.tokenHash == _hash_token(token))
+            ).first()
+        if row is None:
+            return None
+        return {"user_id": row[0], "type": row[1], "expires": row[2]}
+
+    def delete(self, token: str) -> None:
+        with self.session_factory() as db:
+            db.execute(delete(models.AuthToken).where(models.AuthToken.tokenHash == _hash_token(token)))
+            db.commit()
+
+    def purge_expired(self) -> int:
+        with self.session_factory() as db:
+            result = db.execute(delete(models.AuthToken).where(models.AuthToken.expiresAt < int(time.time())))
+            db.commit()
+            return result.rowcount or 0
+
+
+class LocalRedis:
+    """Redis 的进程内替身，只实现令牌存储用到的 set(ex)/get/delete"""
+
+    def __init__(self):
+        self._data: dict[str, tuple[float, str]] = {}
+        self._lock = threading.Lock()
+
+    def set(self, name: str, value: str, ex: Optional[int] = None) -> None:
+        expires = time.time() + ex if ex else float("inf")
+        with self._lock:
+            self._data[name] = (expires, value)
+
+    def get(self, name: str) -> Optional[str]:
+        with self._lock:
+            entry = self._data.get(name)
+            if entry is None:
+                return None
+            if entry[0] < time.time():
+                del self._data[name]
+                return None
+            return entry[1]
+
+    def delete(self, *names: str) -> int:
+        with self._lock:
+            return sum(1 for n in names if self._data.pop(n, None) is not None)
+
+    def purge_expired(self) -> int:
+        now = time.time()
+        with self._lock:
+            expired = [k for k, (exp, _) in self._data.items() if exp < now]
+            for k in expired:
+                del self._data[k]
+        return len(expired)
+
+
+class RedisTokenStore(TokenStore):
+    """基于 Redis 的令牌存储，过期由 Redis 的 TTL 处理"""
+
+    def __init__(self, client, prefix: str = REDIS_KEY_PREFIX):
+        self.client = client
+        self.prefix = prefix
+
+    def _key(self, token: str) -> str:
+        return self.prefix + _hash_token(token)
+
+    def put(self, token: str, data: dict, ttl: int) -> None:
+        value = dict(data, expires=int(time.time()) + ttl)
+        self.client.set(self._key(token), json.dumps(value), ex=ttl)
+
+    def get(self, token: str) -> Optional[dict]:
+        raw = self.client.get(self._key(token))
+        return json.loads(raw) if raw else None
+
+    def delete(self, token: str) -> None:
+        self.client.delete(self._key(token))
+
+    def purge_expired(self) -> int:
+        purge = getattr(self.client, "purge_expired", None)
+        return purge() if purge else 0
+
+
+def create_token_store() -> TokenStore:
+    """按 TOKEN_STORE 配置创建令牌存储"""
+    if TOKEN_STORE == "redis":
+        if not REDIS_URL:
+            raise ValueError("TOKEN_STORE=redis 需要设置 REDIS_URL")
+        import redis  # 可选依赖
+        return RedisTokenStore(redis.Redis.from_url(REDIS_URL, decode_responses=True))
+    if TOKEN_STORE == "db":
+        return DatabaseTokenStore()
+    raise ValueError(f"未知的 TOKEN_STORE: {TOKEN_STORE}")
+
+
+token_store = create_token_store()
+
+
+async def run_token_sweeper(*purgers, interval: int = TOKEN_SWEEP_INTERVAL) -> None:
+    """后台定期清理过期令牌（以及调用方传入的其他清理函数）"""
+    purgers = (token_store.purge_expired,) + purgers
+    while True:
+        await asyncio.sleep(interval)
+        for purge in purgers:
+            try:
+                await asyncio.to_thread(purge)
+            except Exception:
+                logger.exception("token sweep failed")
@@ -0,0 +1,61 @@
+"""
+密码哈希基准测试 - 各成本参数下的单次校验耗时与登录吞吐
+
+用法:
+    python -m backend.benchmarks.password_hash [--logins 64] [--workers 1 2 4]
+
+选择 SCRYPT_N / PBKDF2_ITERATIONS 时，以单次校验耗时和目标登录高峰（如交班时的并发登录数）为参考。
+"""
+
+import argparse
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from backend.app.passwords import hash_password, verify_password
+
+COST_SETTINGS = [
+    ("scrypt", 2 ** 13),
+    ("scrypt", 2 ** 14),
+    ("scrypt", 2 ** 15),
+    ("scrypt", 2 ** 16),
+    ("pbkdf2_sha256", 100_000),
+    ("pbkdf2_sha256", 310_000),
+    ("pbkdf2_sha256", 600_000),
+]
+
+
+def verify_ms(stored: str) -> float:
+    """单次校验耗时（毫秒）"""
+    start = time.perf_counter()
+    verify_password("bench-password", stored)
+    return (time.perf_counter() - start) * 1000
+
+
+def logins_per_second(stored: str, logins: int, workers: int) -> float:
+    """在 workers 个线程的池中并发校验 logins 次的吞吐"""
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        start = time.perf_counter()
+        results = list(pool.map(lambda _: verify_password("bench-password", stored), range(logins)))
+        elapsed = time.perf_counter() - start
+    assert all(results)
+    return logins / elapsed
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(prog="python -m backend.benchmarks.password_hash", description="密码哈希基准测试")
+    parser.add_argument("--logins", type=int, default=64, help="每组参数模拟的登录次数")
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4], help="哈希线程池大小")
+    args = parser.parse_args(argv)
+
+    header = f"{'scheme':<15}{'cost':>10}{'verify ms':>12}" + "".join(f"{f'{w}w login/s':>14}" for w in args.workers)
+    print(header)
+    print("-" * len(header))
+    for scheme, cost in COST_SETTINGS:
+        stored = hash_password("bench-password", scheme=scheme, cost=cost)
+        row = f"{scheme:<15}{cost:>10}{verify_ms(stored):>12.1f}"
+        for workers in args.workers:
+            row += f"{logins_per_second(stored, args.logins, workers):>14.1f}"
+        print(row)
+
+if __name__ == "__main__":
+    main()
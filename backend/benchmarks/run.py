@@ -0,0 +1,323 @@
+"""
+API 基准测试 - 吞吐量与 p50/p95/p99 延迟，支持保存基线并对比回归
+
+用法:
+    # 进程内（httpx ASGITransport），不存在数据时先写入 small 数据集
+    python -m backend.benchmarks.run --database-url sqlite:////tmp/bench.db --preset small
+
+    # 启动 uvicorn 多 worker 后通过网络压测
+    python -m backend.benchmarks.run --database-url sqlite:////tmp/bench.db --mode uvicorn --workers 4
+
+    # 保存基线 / 与基线对比（吞吐下降或 p99 上升超过 --tolerance 时退出码为 1）
+    python -m backend.benchmarks.run ... --save backend/benchmarks/baselines/local.json
+    python -m backend.benchmarks.run ... --compare backend/benchmarks/baselines/local.json
+
+场景: create_order, list_orders, sales_summary, table_status, login
+"""
+
+import argparse
+import asyncio
+import json
+import math
+import os
+import platform
+import random
+import socket
+import subprocess
+import sys
+import time
+from contextlib import asynccontextmanager
+from datetime import datetime, timezone
+
+SCENARIOS = ["create_order", "list_orders", "sales_summary", "table_status", "login"]
+DAY = 86400
+
+
+# ==================== 场景 ====================
+
+class Context:
+    """各场景共用的数据：商品、桌台和运行标识"""
+
+    def __init__(self, products: list, tables: list, seed_value: int):
+        self.products = products
+        self.tables = tables
+        self.rng = random.Random(seed_value)
+        self.run_id = f"{int(time.time())}{os.getpid()}"
+
+
+async def create_order(client, ctx: Context, i: int):
+    items = [{
+        "productId": p["id"], "name": p["name"], "price": p["price"], "costPrice": p.get("costPrice"),
+        "unit": p["unit"], "quantity": ctx.rng.randint(1, 3),
+    } for p in ctx.rng.sample(ctx.products, min(len(ctx.products), ctx.rng.randint(1, 4)))]
+    return await client.post("/api/orders/", json={
+        "orderNo": f"B{ctx.run_id}-{i}", "tableId": ctx.rng.choice(ctx.tables)["id"], "items": items,
+        "status": "COMPLETED", "paymentMethod": "CASH", "timestamp": int(time.time()), "type": "DINE_IN",
+    })
+
+
+async def list_orders(client, ctx: Context, i: int):
+    return await client.get("/api/orders/page", params={"limit": 50})
+
+
+async def sales_summary(client, ctx: Context, i: int):
+    now = int(time.time())
+    return await client.get("/api/analytics/sales-summary", params={
+        "start_ts": now - 30 * DAY, "end_ts": now, "granularity": "day",
+    })
+
+
+async def table_status(client, ctx: Context, i: int):
+    table = ctx.tables[i % len(ctx.tables)]
+    return await client.put(f"/api/tables/{table['id']}", json={
+        "name": table["name"], "status": "UNPAID" if i % 2 else "AVAILABLE",
+        "capacity": table["capacity"], "area": table.get("area"),
+    })
+
+
+async def login(client, ctx: Context, i: int):
+    from backend.benchmarks.seed import BENCH_USERNAME, BENCH_PASSWORD
+    return await client.post("/api/auth/login", json={"username": BENCH_USERNAME, "password": BENCH_PASSWORD})
+
+
+SCENARIO_FUNCS = {
+    "create_order": create_order,
+    "list_orders": list_orders,
+    "sales_summary": sales_summary,
+    "table_status": table_status,
+    "login": login,
+}
+
+
+# ==================== 统计 ====================
+
+def percentile(sorted_values: list, p: float) -> float:
+    if not sorted_values:
+        return 0.0
+    # nearest-rank
+    index = min(len(sorted_values) - 1, max(0, math.ceil(p / 100 * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+
+def summarize(latencies: list, errors: int, elapsed: float) -> dict:
+    values = sorted(latencies)
+    return {
+        "requests": len(values),
+        "errors": errors,
+        "rps": round(len(values) / elapsed, 2) if elapsed else 0.0,
+        "meanMs": round(sum(values) / len(values) * 1000, 2) if values else 0.0,
+        "p50Ms": round(percentile(values, 50) * 1000, 2),
+        "p95Ms": round(percentile(values, 95) * 1000, 2),
+        "p99Ms": round(percentile(values, 99) * 1000, 2),
+    }
+
+
+async def run_scenario(client, ctx: Context, name: str, requests: int, concurrency: int, warmup: int) -> dict:
+    func = SCENARIO_FUNCS[name]
+    for i in range(warmup):
+        await func(client, ctx, -1 - i)
+
+    latencies: list = []
+    errors = 0
+    counter = iter(range(requests))
+
+    async def worker():
+        nonlocal errors
+        for i in counter:
+            start = time.perf_counter()
+            try:
+                response = await func(client, ctx, i)
+                failed = response.status_code >= 400
+            except Exception:
+                failed = True
+            latencies.append(time.perf_counter() - start)
+            errors += failed
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return summarize(latencies, errors, time.perf_counter() - start)
+
+
+# ==================== 运行方式 ====================
+
+@asynccontextmanager
+async def asgi_client():
+    """进程内：直接调用 ASGI 应用，手动执行 lifespan"""
+    import httpx
+    from backend.app.main import app
+
+    async with app.router.lifespan_context(app):
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=60) as client:
+            yield client
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+@asynccontextmanager
+async def uvicorn_client(workers: int, port: int = 0):
+    """启动 uvicorn 子进程（多 worker），通过本机网络访问"""
+    import httpx
+
+    port = port or _free_port()
+    process = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "backend.app.main:app", "--host", "127.0.0.1", "--port", str(port),
+         "--workers", str(workers), "--log-level", "warning", "--no-access-log"],
+        env=os.environ.copy(),
+    )
+    base_url = f"http://127.0.0.1:{port}"
+    limits = httpx.Limits(max_connections=256, max_keepalive_connections=256)
+    try:
+        async with httpx.AsyncClient(base_url=base_url, timeout=60, limits=limits) as client:
+            for _ in range(300):
+                if process.poll() is not None:
+                    raise RuntimeError("uvicorn 启动失败")
+                try:
+                    if (await client.get("/health")).status_code == 200:
+                        break
+                except httpx.TransportError:
+                    pass
+                await asyncio.sleep(0.1)
+            else:
+                raise RuntimeError("等待 uvicorn 启动超时")
+            yield client
+    finally:
+        process.terminate()
+        process.wait(timeout=30)
+
+
+# ==================== 基线 ====================
+
+def compare(current: dict, baseline: dict, tolerance: float) -> list[str]:
+    """返回回归说明：吞吐下降或 p99 上升超过 tolerance（比例）"""
+    regressions = []
+    for name, result in current["results"].items():
+        base = baseline["results"].get(name)
+        if not base:
+            continue
+        if base["rps"] and result["rps"] < base["rps"] * (1 - tolerance):
+            regressions.append(f"{name}: rps {base['rps']} -> {result['rps']}")
+        if base["p99Ms"] and result["p99Ms"] > base["p99Ms"] * (1 + tolerance):
+            regressions.append(f"{name}: p99 {base['p99Ms']}ms -> {result['p99Ms']}ms")
+    return regressions
+
+
+def _git_revision() -> str:
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return ""
+
+
+def dataset_counts() -> dict:
+    from sqlalchemy import func, select
+    from backend.app.database import SessionLocal
+    from backend.app import models
+
+    with SessionLocal() as db:
+        return {
+            table.__tablename__: db.execute(select(func.count()).select_from(table)).scalar()
+            for table in (models.Product, models.Table, models.Order, models.OrderItem, models.StockLog)
+        }
+
+
+async def run(args) -> dict:
+    if args.mode == "uvicorn":
+        client_cm = uvicorn_client(args.workers, args.port)
+    else:
+        client_cm = asgi_client()
+
+    results = {}
+    async with client_cm as client:
+        products = (await client.get("/api/products/")).json()
+        tables = (await client.get("/api/tables/")).json()
+        if not products or not tables:
+            raise RuntimeError("数据库中没有商品或桌台，请使用 --preset 写入数据集")
+        ctx = Context(products, tables, args.seed)
+        for name in args.scenarios:
+            requests = args.login_requests if name == "login" else args.requests
+            results[name] = await run_scenario(client, ctx, name, requests, args.concurrency, args.warmup)
+            r = results[name]
+            print(f"{name:<15}{r['requests']:>8}{r['errors']:>8}{r['rps']:>10.1f}"
+                  f"{r['p50Ms']:>10.2f}{r['p95Ms']:>10.2f}{r['p99Ms']:>10.2f}")
+    return results
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m backend.benchmarks.run", description="SaaS POS API 基准测试")
+    parser.add_argument("--database-url", default=os.environ.get("DATABASE_URL"), help="默认取 DATABASE_URL")
+    parser.add_argument("--preset", default=None, help="数据库为空时先写入的数据集规模")
+    parser.add_argument("--mode", choices=["asgi", "uvicorn"], default="asgi")
+    parser.add_argument("--workers", type=int, default=4, help="uvicorn worker 数")
+    parser.add_argument("--port", type=int, default=0, help="uvicorn 端口，默认随机")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--requests", type=int, default=500, help="每个场景的请求数")
+    parser.add_argument("--login-requests", type=int, default=100, help="login 场景的请求数（哈希开销大）")
+    parser.add_argument("--warmup", type=int, default=10)
+    parser.add_argument("--scenarios", nargs="+", choices=SCENARIOS, default=SCENARIOS)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--save", help="把结果保存为基线 JSON")
+    parser.add_argument("--compare", help="与基线 JSON 对比")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="允许的退化比例")
+    args = parser.parse_args(argv)
+
+    # 必须在导入 backend.app 之前设置
+    if args.database_url:
+        os.environ["DATABASE_URL"] = args.database_url
+    os.environ.setdefault("LOG_LEVEL", "WARNING")
+
+    from backend.app.database import Base, engine
+    from backend.app import models  # noqa: F401  注册全部表
+    Base.metadata.create_all(bind=engine)
+    counts = dataset_counts()
+    if args.preset and not counts["orders"]:
+        from backend.benchmarks.seed import PRESETS, seed
+        start = time.perf_counter()
+        seed(**PRESETS[args.preset], seed_value=args.seed)
+        counts = dataset_counts()
+        print(f"✓ 数据集已写入（{time.perf_counter() - start:.1f}s）")
+    print(f"数据集: {counts}")
+    print(f"{'scenario':<15}{'reqs':>8}{'errors':>8}{'rps':>10}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}")
+
+    report = {
+        "meta": {
+            "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "revision": _git_revision(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "mode": args.mode,
+            "workers": args.workers if args.mode == "uvicorn" else 1,
+            "concurrency": args.concurrency,
+            "dataset": counts,
+        },
+        "results": asyncio.run(run(args)),
+    }
+
+    if args.save:
+        os.makedirs(os.path.dirname(os.path.abspath(args.save)), exist_ok=True)
+        with open(args.save, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        print(f"✓ 基线已保存: {args.save}")
+
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            baseline = json.load(f)
+        for key in ("mode", "workers", "concurrency", "dataset"):
+            if baseline["meta"].get(key) != report["meta"][key]:
+                print(f"! 基线的 {key} 不同: {baseline['meta'].get(key)} -> {report['meta'][key]}")
+        regressions = compare(report, baseline, args.tolerance)
+        if regressions:
+            print("✗ 性能回归:")
+            for line in regressions:
+                print(f"  {line}")
+            return 1
+        print("✓ 未发现超过阈值的回归")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
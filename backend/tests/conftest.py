@@ -0,0 +1,103 @@
+"""
+后端测试公共夹具
+
+导入应用前把 DATABASE_URL 和归档库模板指向临时目录；每个测试结束后清空主库、删除归档库并重置进程内缓存。
+运行：python -m pytest backend/tests -q
+"""
+
+import os
+import shutil
+import tempfile
+from contextlib import contextmanager
+
+import pytest
+from sqlalchemy import event
+
+_TMP = tempfile.mkdtemp(prefix="pos-tests-")
+ARCHIVE_DIR = os.path.join(_TMP, "archive")
+os.environ["DATABASE_URL"] = f"sqlite:///{_TMP}/test.db"
+os.environ["ARCHIVE_URL_TEMPLATE"] = f"sqlite:///{ARCHIVE_DIR}/orders_{{month}}.db"
+
+from backend.app.database import Base, SessionLocal, engine, create_indexes  # noqa: E402
+from backend.app import archive, crud, member_search, models  # noqa: E402
+from backend.app.menu_cache import menu_cache  # noqa: E402
+from backend.app.routers.analytics import analytics_cache  # noqa: E402
+from backend.app.routers.auth import principal_cache  # noqa: E402
+
+DAY = archive.DAY
+
+
+def _reset() -> None:
+    with engine.begin() as conn:
+        for table in reversed(Base.metadata.sorted_tables):
+            conn.execute(table.delete())
+    for archive_engine in archive._engines.values():
+        archive_engine.dispose()
+    archive._engines.clear()
+    archive._catalog.update(version=None, partitions=[])
+    shutil.rmtree(ARCHIVE_DIR, ignore_errors=True)
+    menu_cache._snapshots.clear()
+    principal_cache.clear()
+    analytics_cache.clear()
+
+
+@pytest.fixture
+def db():
+    Base.metadata.create_all(bind=engine)
+    create_indexes(engine)
+    member_search.create_index(engine)
+    session = SessionLocal()
+    try:
+        yield session
+    finally:
+        session.close()
+        _reset()
+
+
+@pytest.fixture
+def client(db):
+    from fastapi.testclient import TestClient
+    from backend.app.main import app
+
+    with TestClient(app) as test_client:
+        yield test_client
+
+
+@pytest.fixture
+def menu(db):
+    """一张桌台、一个分类、两个商品"""
+    table = crud.create_table(db, {"name": "A1", "status": "AVAILABLE", "capacity": 4})
+    category = crud.create_category(db, "热菜")
+    products = [
+        crud.create_product(db, {"name": name, "price": price, "costPrice": cost, "categoryId": category.id,
+                                 "stock": 1000, "unit": "份"})
+        for name, price, cost in (("宫保鸡丁", 38.0, 15.0), ("鱼香肉丝", 32.0, 12.0))
+    ]
+    return {"table": table, "category": category, "products": products}
+
+
+def place_order(db, menu, order_no: str, timestamp: int, quantity: int = 1, product=None,
+                status: str = "COMPLETED") -> models.Order:
+    product = product or menu["products"][0]
+    return crud.create_order(db, {
+        "orderNo": order_no, "tableId": menu["table"].id, "status": status, "timestamp": timestamp,
+        "type": "DINE_IN", "items": [{
+            "productId": product.id, "name": product.name, "price": product.price,
+            "costPrice": product.costPrice, "unit": product.unit, "quantity": quantity,
+        }],
+    })
+
+
+@contextmanager
+def count_queries():
+    """收集代码块内主库执行的 SQL 语句"""
+    statements = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    event.listen(engine, "before_cursor_execute", record)
+    try:
+        yield statements
+    finally:
+        event.remove(engine, "before_cursor_execute", record)
@@ -0,0 +1,54 @@
+import asyncio
+
+import pytest
+
+from backend.app.routers import ai_proxy
+from backend.app.routers.ai_proxy import AIBusyError, StubGenAIClient, generate_text
+
+
+@pytest.fixture
+def stub(monkeypatch):
+    monkeypatch.setattr(ai_proxy, "AI_MAX_CONCURRENCY", 1)
+    monkeypatch.setattr(ai_proxy, "AI_TIMEOUT", 0.2)
+    client = StubGenAIClient(delay=0.5)
+    ai_proxy.set_genai_client(client)
+    yield client
+    ai_proxy.set_genai_client(None)
+
+
+def test_waiting_for_a_slot_counts_against_the_deadline(stub):
+    async def scenario():
+        first = asyncio.create_task(generate_text(stub, "甲"))
+        await asyncio.sleep(0.05)
+        # 唯一的名额被第一个调用占用到线程结束，第二个调用在截止时间前取不到名额
+        with pytest.raises(AIBusyError):
+            await generate_text(stub, "乙")
+        with pytest.raises(asyncio.TimeoutError):
+            await first
+
+    asyncio.run(scenario())
+    assert stub.models.calls == 1
+
+
+def test_results_are_cached(stub, monkeypatch):
+    monkeypatch.setattr(ai_proxy, "AI_TIMEOUT", 5)
+    stub.models.delay = 0
+
+    async def scenario():
+        return [await generate_text(stub, "宫保鸡丁") for _ in range(3)]
+
+    first, *rest = asyncio.run(scenario())
+    assert first.startswith("[stub:") and rest == [first, first]
+    assert stub.models.calls == 1
+
+
+def test_busy_slot_returns_503(client, stub, monkeypatch):
+    async def busy(client, prompt):
+        raise AIBusyError()
+
+    monkeypatch.setattr(ai_proxy, "generate_text", busy)
+    response = client.post("/api/ai/product-description", json={"productName": "宫保鸡丁"})
+    assert response.status_code == 503
+    batch = client.post("/api/ai/product-descriptions", json={"productNames": ["宫保鸡丁", "鱼香肉丝"]})
+    assert batch.status_code == 200
+    assert [item["generated"] for item in batch.json()["items"]] == [False, False]
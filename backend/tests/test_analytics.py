@@ -0,0 +1,29 @@
+import time
+
+from backend.app import crud
+from backend.tests.conftest import DAY, place_order
+
+NOW = int(time.time()) // DAY * DAY
+
+
+def test_top_products_profit_uses_costed_revenue(db, menu):
+    costed, uncosted = menu["products"]
+    place_order(db, menu, "A", NOW - 3600, quantity=2, product=costed)
+    uncosted.costPrice = None
+    place_order(db, menu, "B", NOW - 1800, quantity=3, product=uncosted)
+    place_order(db, menu, "C", NOW - 900, quantity=5, product=costed, status="CANCELLED")
+
+    rows = {r["name"]: r for r in crud.top_products(db, 0, NOW)}
+    assert rows["宫保鸡丁"] == {
+        "productId": costed.id, "name": "宫保鸡丁", "quantity": 2, "revenue": 76.0, "cost": 30.0,
+        "profit": 46.0, "revenueWithoutCost": 0.0,
+    }
+    # 未记录成本的销售额不当作零成本毛利
+    assert rows["鱼香肉丝"]["revenue"] == 96.0
+    assert rows["鱼香肉丝"]["profit"] == 0.0
+    assert rows["鱼香肉丝"]["revenueWithoutCost"] == 96.0
+
+    margin = crud.gross_margin(db, 0, NOW)
+    assert margin["grossProfit"] == sum(r["profit"] for r in rows.values())
+    assert margin["revenueWithoutCost"] == sum(r["revenueWithoutCost"] for r in rows.values())
+    assert [r["name"] for r in crud.top_products(db, 0, NOW, sort_by="profit")] == ["宫保鸡丁", "鱼香肉丝"]
@@ -0,0 +1,115 @@
+import time
+
+from sqlalchemy import func, select
+
+from backend.app import archive, crud, models
+from backend.tests.conftest import DAY, place_order
+
+NOW = int(time.time()) // DAY * DAY
+CUTOFF = NOW - 180 * DAY
+
+
+def _keys(orders):
+    """(timestamp, id) 倒序，与分页顺序一致；归档后 ORM 对象已过期，先取出主键"""
+    return sorted(((o.timestamp, o.id) for o in orders), reverse=True)
+
+
+def _seed(db, menu):
+    """跨越三个月的旧订单（含一笔已取消）和保留期内的近期订单，返回各自的 (timestamp, id)"""
+    old = [place_order(db, menu, f"OLD{i}", CUTOFF - (i + 1) * 15 * DAY, quantity=i + 1) for i in range(6)]
+    old.append(place_order(db, menu, "OLD-CANCELLED", CUTOFF - 3 * DAY, status="CANCELLED"))
+    recent = [place_order(db, menu, f"NEW{i}", NOW - i * DAY - 3600, product=menu["products"][1]) for i in range(4)]
+    return _keys(old), _keys(recent)
+
+
+def _analytics(db):
+    return {
+        "margin": crud.gross_margin(db, 0, NOW),
+        "categories": crud.category_sales(db, 0, NOW),
+        "top": crud.top_products(db, 0, NOW),
+        "summary": crud.sales_summary(db, CUTOFF - 200 * DAY, NOW, "month"),
+    }
+
+
+def test_archive_moves_closed_orders_and_keeps_lookups(db, menu):
+    old, recent = _seed(db, menu)
+    product_id = menu["products"][0].id
+    # 下单时间倒序：OLD-CANCELLED、OLD0、OLD1 ...
+    target = old[3][1]
+
+    results = archive.archive_before(db, CUTOFF)
+
+    assert sum(r["orders"] for r in results) == len(old)
+    assert sum(r["orderItems"] for r in results) == len(old)
+    hot = db.execute(select(func.count(models.Order.id))).scalar()
+    assert hot == len(recent)
+    assert archive.archived_until(db) == CUTOFF
+
+    found = crud.get_order(db, target)
+    assert found is not None
+    assert found.orderNo == "OLD2"
+    assert [(i.productId, i.quantity) for i in found.items] == [(product_id, 3)]
+    assert crud.get_order(db, recent[0][1]).orderNo == "NEW0"
+
+
+def test_archive_keeps_analytics_totals(db, menu):
+    _seed(db, menu)
+    before = _analytics(db)
+
+    archive.archive_before(db, CUTOFF)
+
+    after = _analytics(db)
+    assert after["margin"] == before["margin"]
+    assert after["categories"] == before["categories"]
+    assert after["top"] == before["top"]
+    assert after["summary"] == before["summary"]
+    assert before["margin"]["orders"] == 10  # 已取消订单不计入
+
+
+def test_deleted_product_kept_in_archived_category_sales(db, menu):
+    place_order(db, menu, "OLD", CUTOFF - 10 * DAY, quantity=3)
+    archive.archive_before(db, CUTOFF)
+    crud.delete_product(db, menu["products"][0].id)
+
+    rows = crud.category_sales(db, 0, NOW)
+    assert [(r["name"], r["revenue"], r["orders"]) for r in rows] == [("热菜", 38.0 * 3, 1)]
+
+
+def test_archive_rerun_is_idempotent(db, menu):
+    old, _ = _seed(db, menu)
+    archive.archive_before(db, CUTOFF)
+    assert archive.archive_before(db, CUTOFF) == []
+    parts = archive.partitions(db)
+    assert sum(db.get(models.ArchivePartition, p["month"]).orders for p in parts) == len(old)
+
+
+def test_order_pages_merge_hot_and_archived_rows(db, menu):
+    old, recent = _seed(db, menu)
+    expected = [oid for _, oid in recent + old]
+    archive.archive_before(db, CUTOFF)
+
+    seen, cursor = [], None
+    while True:
+        # 每页 3 条：第二页同时包含热表最后一条和归档库的订单
+        page, cursor = crud.list_orders_page(db, limit=3, cursor=cursor, start_ts=0)
+        seen += [o.id for o in page]
+        if cursor is None:
+            break
+    assert seen == expected
+
+    merged = crud.list_orders(db, start_ts=0)
+    assert [o.id for o in merged] == expected
+    # 未指定起始时间只查热表
+    assert [o.id for o in crud.list_orders(db)] == [oid for _, oid in recent]
+
+
+def test_order_page_cursor_at_archive_boundary(db, menu):
+    old, recent = _seed(db, menu)
+    archive.archive_before(db, CUTOFF)
+
+    page, cursor = crud.list_orders_page(db, limit=len(recent), start_ts=0)
+    assert [o.orderNo for o in page] == [f"NEW{i}" for i in range(len(recent))]
+    assert cursor is not None
+    rest, cursor = crud.list_orders_page(db, limit=100, cursor=cursor, start_ts=0)
+    assert [o.id for o in rest] == [oid for _, oid in old]
+    assert cursor is None
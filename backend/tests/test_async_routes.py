@@ -0,0 +1,44 @@
+from concurrent.futures import ThreadPoolExecutor
+
+from backend.app import crud
+
+
+def _order(menu, order_no, quantity=1):
+    product = menu["products"][0]
+    return {
+        "orderNo": order_no, "tableId": menu["table"].id, "status": "COMPLETED", "timestamp": 1700000000,
+        "type": "DINE_IN", "items": [{"productId": product.id, "name": product.name, "price": product.price,
+                                      "costPrice": product.costPrice, "unit": product.unit, "quantity": quantity}],
+    }
+
+
+def test_order_round_trip_through_async_session(client, menu):
+    created = client.post("/api/orders/", json=_order(menu, "A1", quantity=2))
+    assert created.status_code == 200
+    body = created.json()
+    # 订单项随订单一起返回，异步会话中不会触发惰性加载
+    assert [(i["name"], i["quantity"]) for i in body["items"]] == [("宫保鸡丁", 2)]
+    assert body["total"] == 76.0
+
+    fetched = client.get(f"/api/orders/{body['id']}").json()
+    assert fetched == body
+    assert client.get("/api/orders/missing").status_code == 404
+
+
+def test_product_sales_mode_round_trip(client, menu):
+    payload = {"name": "水煮鱼", "price": 58.0, "categoryId": menu["category"].id, "stock": 10, "unit": "份",
+               "salesMode": ["DINE_IN", "TAKE_OUT"]}
+    created = client.post("/api/products/", json=payload).json()
+    assert created["salesMode"] == ["DINE_IN", "TAKE_OUT"]
+    assert client.get(f"/api/products/{created['id']}").json()["salesMode"] == ["DINE_IN", "TAKE_OUT"]
+
+
+def test_concurrent_requests(client, db, menu):
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        posts = list(pool.map(lambda i: client.post("/api/orders/", json=_order(menu, f"C{i}")), range(16)))
+        gets = list(pool.map(lambda _: client.get("/api/tables/"), range(16)))
+
+    assert all(r.status_code == 200 for r in posts + gets)
+    assert len({r.json()["id"] for r in posts}) == 16
+    db.expire_all()
+    assert crud.get_product(db, menu["products"][0].id).stock == 1000 - 16
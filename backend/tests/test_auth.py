@@ -0,0 +1,65 @@
+from sqlalchemy import update
+
+from backend.app import models
+from backend.app.database import SessionLocal
+from backend.app.passwords import hash_password
+from backend.app.routers import auth
+from backend.tests.conftest import count_queries
+
+
+def _user(db, username="cashier1", role="cashier", password="secret123") -> models.SystemUser:
+    user = models.SystemUser(username=username, passwordHash=hash_password(password), name="收银员", role=role)
+    db.add(user)
+    db.commit()
+    return user
+
+
+def test_cached_principal_costs_no_queries(db):
+    user_id = _user(db).id
+    assert auth.load_principal(db, user_id).role == "cashier"
+
+    with count_queries() as statements:
+        principal = auth.load_principal(db, user_id)
+    assert statements == []
+    assert "order:create" in principal.permissions
+    assert "user:manage" not in principal.permissions
+
+
+def test_committed_role_change_invalidates_cache(db):
+    user_id = _user(db).id
+    auth.load_principal(db, user_id)
+
+    other = SessionLocal()
+    try:
+        other.get(models.SystemUser, user_id).role = "manager"
+        other.commit()
+    finally:
+        other.close()
+
+    assert auth.load_principal(db, user_id).role == "manager"
+
+
+def test_change_without_orm_events_waits_for_ttl(db):
+    """模拟其他 worker 的修改：本进程收不到提交事件，缓存到期后才读到新值"""
+    user_id = _user(db).id
+    auth.load_principal(db, user_id)
+    db.execute(update(models.SystemUser).where(models.SystemUser.id == user_id).values(isActive=False))
+    db.commit()
+
+    assert auth.load_principal(db, user_id).isActive
+    # 让缓存条目到期
+    auth.principal_cache.set(user_id, auth.principal_cache.get(user_id), ttl=-1)
+    assert not auth.load_principal(db, user_id).isActive
+
+
+def test_disabled_user_rejected(client, db):
+    _user(db)
+    token = client.post("/api/auth/login", json={"username": "cashier1", "password": "secret123"}).json()["access_token"]
+    headers = {"Authorization": f"Bearer {token}"}
+    assert client.get("/api/auth/me", headers=headers).json()["role"] == "cashier"
+
+    user = db.query(models.SystemUser).filter_by(username="cashier1").one()
+    user.isActive = False
+    db.commit()
+
+    assert client.get("/api/auth/me", headers=headers).status_code == 403
@@ -0,0 +1,53 @@
+import asyncio
+
+from sqlalchemy import func, select
+
+from backend.app import models
+from backend.benchmarks import run as bench
+
+
+def test_percentile_is_nearest_rank():
+    values = [i / 1000 for i in range(1, 101)]
+    assert bench.percentile(values, 50) == 0.05
+    assert bench.percentile(values, 99) == 0.099
+    assert bench.percentile(values, 100) == 0.1
+    assert bench.percentile([], 95) == 0.0
+
+    summary = bench.summarize(values, errors=2, elapsed=2.0)
+    assert summary == {"requests": 100, "errors": 2, "rps": 50.0, "meanMs": 50.5,
+                       "p50Ms": 50.0, "p95Ms": 95.0, "p99Ms": 99.0}
+
+
+def test_compare_flags_regressions_beyond_tolerance():
+    baseline = {"results": {
+        "list_orders": {"rps": 100.0, "p99Ms": 10.0},
+        "login": {"rps": 20.0, "p99Ms": 50.0},
+    }}
+    current = {"results": {
+        "list_orders": {"rps": 85.0, "p99Ms": 11.5},  # 都在 20% 以内
+        "login": {"rps": 15.0, "p99Ms": 70.0},
+        "table_status": {"rps": 1.0, "p99Ms": 999.0},  # 基线中没有，不比较
+    }}
+    assert bench.compare(current, baseline, tolerance=0.2) == [
+        "login: rps 20.0 -> 15.0", "login: p99 50.0ms -> 70.0ms",
+    ]
+    assert len(bench.compare(current, baseline, tolerance=0.1)) == 4
+
+
+def test_scenarios_run_in_process(db, menu):
+    async def scenario():
+        async with bench.asgi_client() as client:
+            products = (await client.get("/api/products/")).json()
+            tables = (await client.get("/api/tables/")).json()
+            ctx = bench.Context(products, tables, seed_value=1)
+            return {
+                name: await bench.run_scenario(client, ctx, name, requests=6, concurrency=3, warmup=1)
+                for name in ("create_order", "list_orders", "sales_summary", "table_status")
+            }
+
+    results = asyncio.run(scenario())
+    assert {name: (r["requests"], r["errors"]) for name, r in results.items()} == {
+        name: (6, 0) for name in results
+    }
+    # 预热 1 单 + 正式 6 单
+    assert db.execute(select(func.count(models.Order.id))).scalar() == 7
@@ -0,0 +1,62 @@
+from sqlalchemy import func, select
+
+from backend.app import crud, models
+from backend.tests.conftest import place_order
+
+T0 = 1700000000
+
+
+def _order(menu, order_no, quantity=1, table_id=None, product_id=None, status="COMPLETED"):
+    product = menu["products"][0]
+    return {
+        "orderNo": order_no, "tableId": table_id or menu["table"].id, "status": status, "timestamp": T0,
+        "type": "DINE_IN", "items": [{"productId": product_id or product.id, "name": product.name,
+                                      "price": product.price, "unit": product.unit, "quantity": quantity}],
+    }
+
+
+def _count(db, model):
+    return db.execute(select(func.count()).select_from(model)).scalar()
+
+
+def test_bulk_is_idempotent_and_rejects_bad_orders_individually(client, db, menu):
+    place_order(db, menu, "EXISTING", T0)
+    batch = [
+        _order(menu, "B1", quantity=2),
+        _order(menu, "EXISTING"),
+        _order(menu, "NO-TABLE", table_id="missing-table"),
+        _order(menu, "NO-PRODUCT", product_id="missing-product"),
+        _order(menu, "B2", status="PENDING"),
+    ]
+
+    response = client.post("/api/orders/batch", json={"orders": batch})
+    assert response.status_code == 200
+    body = response.json()
+    assert (body["created"], body["duplicates"], body["rejected"]) == (2, 1, 2)
+    statuses = {r["orderNo"]: r["status"] for r in body["results"]}
+    assert statuses == {"B1": "created", "EXISTING": "duplicate", "NO-TABLE": "rejected",
+                        "NO-PRODUCT": "rejected", "B2": "created"}
+    assert "missing-table" in next(r["detail"] for r in body["results"] if r["orderNo"] == "NO-TABLE")
+
+    # 整批重传：已写入的订单按 orderNo 判重，不重复扣库存
+    again = client.post("/api/orders/batch", json={"orders": batch}).json()
+    assert (again["created"], again["duplicates"], again["rejected"]) == (0, 3, 2)
+    assert _count(db, models.Order) == 3
+    db.expire_all()
+    assert crud.get_product(db, menu["products"][0].id).stock == 1000 - 1 - 2 - 1
+    assert _count(db, models.StockLog) == 3
+    # 未结账的补传订单关联为桌台当前订单
+    b2 = next(r["id"] for r in body["results"] if r["orderNo"] == "B2")
+    assert db.get(models.Table, menu["table"].id).currentOrderId == b2
+
+
+def test_bulk_oversell_rejects_only_that_order(db, menu):
+    product = menu["products"][0]
+    batch = [_order(menu, "SMALL", quantity=400), _order(menu, "HUGE", quantity=700), _order(menu, "REST", quantity=600)]
+
+    results = crud.create_orders_bulk(db, batch, reject_oversell=True)
+
+    assert [r["status"] for r in results] == ["created", "rejected", "created"]
+    assert "库存不足" in results[1]["detail"]
+    db.expire_all()
+    assert crud.get_product(db, product.id).stock == 0
@@ -0,0 +1,38 @@
+from sqlalchemy import inspect, text
+from sqlalchemy.pool import StaticPool
+
+from backend.app import database
+from backend.app.database import async_database_url, create_indexes, engine, engine_options
+
+
+def test_file_database_connections_use_wal_profile(db):
+    with engine.connect() as conn:
+        assert conn.execute(text("PRAGMA journal_mode")).scalar() == "wal"
+        assert conn.execute(text("PRAGMA synchronous")).scalar() == 1  # NORMAL
+        assert conn.execute(text("PRAGMA busy_timeout")).scalar() == database.SQLITE_BUSY_TIMEOUT_MS
+        assert conn.execute(text("PRAGMA cache_size")).scalar() == -database.SQLITE_CACHE_SIZE_KB
+    assert engine.pool.size() == database.DB_POOL_SIZE
+
+
+def test_engine_options_per_dialect():
+    assert engine_options("sqlite://")["poolclass"] is StaticPool
+    assert "journal_mode" not in " ".join(database.sqlite_pragmas(engine.url.set(database=":memory:")))
+    pg = engine_options("postgresql://pos@db/pos")
+    assert pg["pool_pre_ping"] and pg["pool_recycle"] == database.DB_POOL_RECYCLE
+    assert "statement_timeout" in pg["connect_args"]["options"]
+    assert "statement_timeout" in engine_options("postgresql+asyncpg://pos@db/pos")["connect_args"]["server_settings"]
+
+
+def test_async_url_mapping(monkeypatch):
+    monkeypatch.delenv("ASYNC_DATABASE_URL", raising=False)
+    assert async_database_url("sqlite:///data/pos.db") == "sqlite+aiosqlite:///data/pos.db"
+    assert async_database_url("postgresql://u:p@h/db") == "postgresql+asyncpg://u:p@h/db"
+
+
+def test_create_indexes_replaces_obsolete_index(db):
+    with engine.begin() as conn:
+        conn.execute(text("CREATE INDEX idx_order_timestamp ON orders (timestamp)"))
+    create_indexes(engine)
+    names = {i["name"] for i in inspect(engine).get_indexes("orders")}
+    assert "idx_order_timestamp" not in names
+    assert "idx_order_timestamp_id" in names
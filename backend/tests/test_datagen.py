@@ -0,0 +1,85 @@
+from datetime import date, datetime
+from zoneinfo import ZoneInfo
+
+import pytest
+from sqlalchemy import func, literal_column, select
+
+from backend.app import models
+from backend.tools.datagen import DAY, DatagenConfig, create_target_engine, generate
+
+END_DATE = date(2024, 3, 10)
+
+
+def _config(**overrides) -> DatagenConfig:
+    values = dict(products=20, tables=4, members=30, staff=3, orders=300, days=7, end_date=END_DATE,
+                  tz="Asia/Shanghai", seed=7)
+    values.update(overrides)
+    return DatagenConfig(**values)
+
+
+def _generate(tmp_path, name: str, **overrides):
+    target = create_target_engine(f"sqlite:///{tmp_path}/{name}.db")
+    stats = generate(target, _config(**overrides))
+    return target, stats
+
+
+def _dump(target, model) -> list:
+    table = model.__table__
+    with target.connect() as conn:
+        return [tuple(row) for row in conn.execute(select(table).order_by(table.c.id))]
+
+
+@pytest.fixture
+def dataset(tmp_path):
+    target, stats = _generate(tmp_path, "first")
+    yield target, stats
+    target.dispose()
+
+
+def test_same_seed_same_rows(tmp_path, dataset):
+    first, stats = dataset
+    second, _ = _generate(tmp_path, "second")
+    other, _ = _generate(tmp_path, "other", seed=8)
+    try:
+        assert stats.rows["orders"] == 300
+        assert stats.rows["products"] == 20
+        for model in (models.Product, models.User, models.Order, models.OrderItem, models.StockLog):
+            assert _dump(first, model) == _dump(second, model)
+        assert _dump(first, models.Order) != _dump(other, models.Order)
+    finally:
+        second.dispose()
+        other.dispose()
+
+
+def test_orders_fall_in_business_hours(dataset):
+    target, _ = dataset
+    # 7 天窗口的第一天 2024-03-04 00:00（UTC+8），营业时间为本地 10:00-22:00
+    start = int(datetime(2024, 3, 4, tzinfo=ZoneInfo("Asia/Shanghai")).timestamp())
+    with target.connect() as conn:
+        stamps = conn.execute(select(models.Order.timestamp)).scalars().all()
+    assert min(stamps) >= start
+    assert max(stamps) < start + 7 * DAY
+    assert all(10 * 3600 <= (ts - start) % DAY < 22 * 3600 for ts in stamps)
+
+
+def test_totals_and_stock_logs_are_consistent(dataset):
+    target, _ = dataset
+    with target.connect() as conn:
+        subtotals = dict(conn.execute(select(models.OrderItem.orderId, func.sum(models.OrderItem.subtotal))
+                                      .group_by(models.OrderItem.orderId)).all())
+        for order_id, total, discount in conn.execute(
+                select(models.Order.id, models.Order.total, models.Order.discount)):
+            assert total == pytest.approx(subtotals[order_id] - discount, abs=0.01)
+
+        # 按写入顺序核对：采购入库记在销售前 60 秒，按时间排序会与同一分钟内的销售交错
+        logs = conn.execute(select(models.StockLog.productId, models.StockLog.delta, models.StockLog.beforeStock,
+                                   models.StockLog.currentStock).order_by(literal_column("rowid"))).all()
+        stock = dict(conn.execute(select(models.Product.id, models.Product.stock)).all())
+        assert conn.execute(select(func.count(models.SalesRollup.id))).scalar() > 0
+
+    running = {}
+    for product_id, delta, before, current in logs:
+        assert before == running.get(product_id, 0)
+        assert current == before + delta >= 0
+        running[product_id] = current
+    assert running == stock
@@ -0,0 +1,48 @@
+import csv
+import io
+import json
+
+from backend.app import crud
+from backend.app.routers import exports
+from backend.tests.conftest import place_order
+
+T0 = 1700000000
+
+
+def _ndjson(response):
+    return [json.loads(line) for line in response.text.splitlines()]
+
+
+def test_orders_ndjson_streams_all_rows_in_order(client, db, menu, monkeypatch):
+    monkeypatch.setattr(exports, "FLUSH_ROWS", 2)
+    for i in range(5):
+        place_order(db, menu, f"E{i}", T0 + (4 - i) * 60)
+
+    response = client.get("/api/export/orders")
+    assert response.headers["content-type"] == "application/x-ndjson"
+    assert 'filename="orders.ndjson"' in response.headers["content-disposition"]
+    assert [r["orderNo"] for r in _ndjson(response)] == [f"E{i}" for i in reversed(range(5))]
+
+    window = _ndjson(client.get("/api/export/orders", params={"start_ts": T0 + 60, "end_ts": T0 + 120}))
+    assert [r["orderNo"] for r in window] == ["E3", "E2"]
+
+
+def test_order_items_csv(client, db, menu):
+    place_order(db, menu, "C1", T0, quantity=2)
+    place_order(db, menu, "C2", T0 + 60, status="CANCELLED")
+
+    response = client.get("/api/export/order-items", params={"format": "csv", "status": "COMPLETED"})
+    assert response.headers["content-type"].startswith("text/csv")
+    rows = list(csv.DictReader(io.StringIO(response.text)))
+    assert list(rows[0]) == exports.ORDER_ITEM_COLUMNS
+    assert [(r["orderNo"], r["name"], r["quantity"]) for r in rows] == [("C1", "宫保鸡丁", "2")]
+
+
+def test_stock_logs_by_product(client, db, menu):
+    kung_pao, yu_xiang = menu["products"]
+    place_order(db, menu, "S1", T0, quantity=3)
+    place_order(db, menu, "S2", T0 + 60, product=yu_xiang)
+
+    rows = _ndjson(client.get("/api/export/stock-logs", params={"product_id": kung_pao.id}))
+    assert [(r["type"], r["delta"], r["currentStock"]) for r in rows] == [("OUT_SALE", -3, 997)]
+    assert len(list(crud.iter_stock_logs_export(db, chunk_size=1))) == 2
@@ -0,0 +1,69 @@
+import json
+import time
+
+import pytest
+
+from backend.app import crud
+from backend.app.routers import ai_proxy
+from backend.tests.conftest import DAY, place_order
+
+START = 1699056000  # 2023-11-04 00:00 UTC
+END = START + 2 * DAY - 1
+
+
+def test_digest_sections(db, menu):
+    place_order(db, menu, "A", START + 3600, quantity=2)
+    place_order(db, menu, "B", START + DAY + 7200, product=menu["products"][1])
+    place_order(db, menu, "C", START + DAY + 7300, status="CANCELLED")
+
+    digest = crud.insight_digest(db, START, END, "UTC")
+
+    assert digest["window"] == {"start": "2023-11-04 00:00", "end": "2023-11-05 23:59", "timezone": "UTC"}
+    assert digest["totals"] == {"orders": 2, "revenue": 108.0, "grossProfit": 66.0,
+                                "marginRate": round(66.0 / 108.0, 4), "averageOrderValue": 54.0}
+    assert [d["date"] for d in digest["daily"]] == ["2023-11-04", "2023-11-05"]
+    assert [(p["name"], p["quantity"], p["profit"]) for p in digest["topProducts"]] == [
+        ("宫保鸡丁", 2, 46.0), ("鱼香肉丝", 1, 20.0),
+    ]
+    assert [h["hour"] for h in digest["hourly"]] == [1, 2]
+    assert digest["byType"][0]["type"] == "DINE_IN"
+    # 摘要会原样序列化进提示词
+    json.dumps(digest, ensure_ascii=False)
+
+
+@pytest.fixture
+def prompts(monkeypatch):
+    """记录发给模型的提示词，不调用真实模型"""
+    sent = []
+
+    async def fake_generate(client, prompt):
+        sent.append(prompt)
+        return "洞察"
+
+    ai_proxy.set_genai_client(ai_proxy.StubGenAIClient())
+    monkeypatch.setattr(ai_proxy, "generate_text", fake_generate)
+    yield sent
+    ai_proxy.set_genai_client(None)
+
+
+def test_insight_builds_digest_on_the_server(client, db, menu, prompts):
+    now = int(time.time()) // 3600 * 3600
+    place_order(db, menu, "A", now - 2 * 3600, quantity=3)
+
+    response = client.post("/api/ai/insight", json={"days": 1})
+    assert response.status_code == 200
+    assert response.json() == {"insight": "洞察"}
+    assert '"topProducts"' in prompts[0] and "宫保鸡丁" in prompts[0]
+
+    # 同一小时内的窗口不变，摘要从缓存读取：新订单不影响第二次的提示词
+    place_order(db, menu, "B", now - 3600, product=menu["products"][1])
+    client.post("/api/ai/insight", json={"days": 1})
+    assert prompts[1] == prompts[0]
+
+
+def test_insight_accepts_client_data_and_rejects_bad_zone(client, db, prompts):
+    response = client.post("/api/ai/insight", json={"salesData": {"revenue": 1}, "recentOrders": []})
+    assert response.status_code == 200
+    assert '"revenue": 1' in prompts[0]
+
+    assert client.post("/api/ai/insight", json={"tz": "Mars/Olympus"}).status_code == 400
@@ -0,0 +1,106 @@
+from sqlalchemy import insert, text
+
+from backend.app import crud, member_search, models
+from backend.app.database import engine
+
+
+def _members(db, count: int = 60):
+    db.execute(insert(models.User), [
+        {"id": f"u{i:03d}", "name": f"会员{i:03d}号", "phone": f"1380000{i:04d}", "type": "MEMBER",
+         "joinDate": "2024-01-01"}
+        for i in range(count)
+    ])
+    db.execute(insert(models.User), [
+        {"id": "zs", "name": "张三丰", "phone": "13912345678", "type": "MEMBER", "joinDate": "2024-01-01"},
+        {"id": "zw", "name": "张无忌", "phone": "13987654321", "type": "NORMAL", "joinDate": "2024-01-01"},
+    ])
+    db.commit()
+
+
+def _search_all(db, q, limit):
+    ids, cursor = [], None
+    while True:
+        page, cursor = crud.search_users(db, q, limit, cursor)
+        ids += [u.id for u in page]
+        if cursor is None:
+            return ids
+
+
+def test_phone_prefix(db):
+    _members(db)
+    users, cursor = crud.search_users(db, "138-0000-001")
+    assert [u.id for u in users] == [f"u{i:03d}" for i in range(10, 20)]
+    assert cursor is None
+    assert [u.id for u in crud.search_users(db, "1391")[0]] == ["zs"]
+
+
+def test_name_fragment_uses_fts_and_pages(db):
+    _members(db)
+    assert member_search.fts_enabled(engine)
+    assert _search_all(db, "会员0", limit=7) == [f"u{i:03d}" for i in range(60)]
+    assert [u.id for u in crud.search_users(db, "会员042")[0]] == ["u042"]
+
+
+def test_short_fragment_falls_back_to_like(db):
+    _members(db)
+    assert [u.id for u in crud.search_users(db, "张")[0]] == ["zs", "zw"]
+    assert [u.id for u in crud.search_users(db, "无忌")[0]] == ["zw"]
+
+
+def test_index_follows_updates_and_deletes(db):
+    _members(db)
+    user = db.get(models.User, "u007")
+    user.name = "李逍遥"
+    db.commit()
+    crud.delete_user(db, "zs")
+
+    assert [u.id for u in crud.search_users(db, "李逍遥")[0]] == ["u007"]
+    assert crud.search_users(db, "会员007")[0] == []
+    # 软删除的会员不再出现在搜索结果中
+    assert crud.search_users(db, "张三丰")[0] == []
+
+
+def test_index_survives_vacuum(db):
+    _members(db)
+    db.execute(models.User.__table__.delete().where(models.User.id < "u030"))
+    db.commit()
+    db.close()
+    with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+        conn.execute(text("VACUUM"))
+
+    assert [u.id for u in crud.search_users(db, "会员045号")[0]] == ["u045"]
+    assert crud.search_users(db, "会员010号")[0] == []
+
+
+def test_index_writes_are_point_lookups(db):
+    _members(db)
+    with engine.connect() as conn:
+        plan = " ".join(row[-1] for row in conn.execute(text(
+            f"EXPLAIN QUERY PLAN DELETE FROM {member_search.SEARCH_TABLE} WHERE userId = 'u001'")))
+    assert "USING INDEX" in plan or "USING COVERING INDEX" in plan
+
+    db.execute(models.User.__table__.delete().where(models.User.id == "u001"))
+    db.commit()
+    with engine.begin() as conn:
+        # FTS 索引与 users_search 不一致时 integrity-check 报错
+        conn.execute(text(f"INSERT INTO {member_search.FTS_TABLE}({member_search.FTS_TABLE}, rank) "
+                          "VALUES ('integrity-check', 1)"))
+    assert crud.search_users(db, "会员001号")[0] == []
+
+
+def test_old_layout_is_rebuilt(db):
+    _members(db, count=5)
+    with engine.begin() as conn:
+        for trigger in member_search.SQLITE_TRIGGERS:
+            conn.execute(text(f"DROP TRIGGER IF EXISTS {trigger}"))
+        conn.execute(text(f"DROP TABLE {member_search.FTS_TABLE}"))
+        conn.execute(text(f"DROP TABLE {member_search.SEARCH_TABLE}"))
+        conn.execute(text(f"CREATE VIRTUAL TABLE {member_search.FTS_TABLE} "
+                          "USING fts5(name, id UNINDEXED, tokenize='trigram')"))
+
+    member_search.create_index(engine)
+
+    assert [u.id for u in crud.search_users(db, "会员003")[0]] == ["u003"]
+    db.add(models.User(id="new", name="王重阳", phone="13700000000", type="MEMBER", joinDate="2024-01-01"))
+    db.commit()
+    assert [u.id for u in crud.search_users(db, "王重阳")[0]] == ["new"]
@@ -0,0 +1,58 @@
+import gzip
+import json
+
+from backend.app import crud
+from backend.app.menu_cache import menu_cache
+
+
+def test_menu_groups_on_shelf_products(client, db, menu):
+    crud.update_product(db, menu["products"][1].id, {"isOnShelf": False})
+
+    body = client.get("/api/menu").json()
+    assert body["table"] is None
+    assert [c["name"] for c in body["categories"]] == ["热菜"]
+    assert [p["name"] for p in body["categories"][0]["products"]] == ["宫保鸡丁"]
+    assert set(body["categories"][0]["products"][0]) == {"id", "name", "price", "image", "unit", "salesMode"}
+
+
+def test_tables_share_one_snapshot(client, db, menu):
+    other = crud.create_table(db, {"name": "B2", "status": "AVAILABLE", "capacity": 2, "area": "大厅"})
+    first = client.get("/api/menu", params={"table": menu["table"].id})
+    second = client.get("/api/menu", params={"table": other.id})
+
+    assert first.json()["table"] == {"id": menu["table"].id, "name": "A1", "area": None}
+    assert second.json()["table"] == {"id": other.id, "name": "B2", "area": "大厅"}
+    assert first.json()["categories"] == second.json()["categories"]
+    assert list(menu_cache._snapshots) == ["menu"]
+    # ETag 随桌台不同，同一桌台重复请求返回 304
+    assert first.headers["etag"] != second.headers["etag"]
+    again = client.get("/api/menu", params={"table": other.id}, headers={"If-None-Match": second.headers["etag"]})
+    assert again.status_code == 304
+    assert client.get("/api/menu", params={"table": "missing"}).status_code == 404
+
+
+def test_large_menu_gzip_wraps_table(client, db, menu):
+    for i in range(40):
+        crud.create_product(db, {"name": f"商品{i:02d}", "price": 10.0, "categoryId": menu["category"].id,
+                                 "stock": 1, "unit": "份"})
+
+    with client.stream("GET", "/api/menu", params={"table": menu["table"].id},
+                       headers={"Accept-Encoding": "gzip"}) as response:
+        assert response.headers["content-encoding"] == "gzip"
+        raw = b"".join(response.iter_raw())
+    # 拼接出的 gzip 流用标准库也能完整解开（含 CRC 和长度校验）
+    body = json.loads(gzip.decompress(raw))
+    assert body["table"]["name"] == "A1"
+    assert len(body["categories"][0]["products"]) == 42
+    plain = client.get("/api/menu", params={"table": menu["table"].id}, headers={"Accept-Encoding": "identity"})
+    assert plain.json() == body
+
+
+def test_version_change_drops_old_snapshots(client, db, menu):
+    client.get("/api/menu")
+    client.get("/api/products/")
+    assert set(menu_cache._snapshots) == {"menu", "products"}
+
+    crud.create_category(db, "凉菜")
+    client.get("/api/categories/")
+    assert list(menu_cache._snapshots) == ["categories"]
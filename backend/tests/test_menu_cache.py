@@ -0,0 +1,74 @@
+from backend.app import crud
+from backend.app.database import SessionLocal
+from backend.app.menu_cache import MENU_VERSION_KEY
+
+
+def test_products_etag_and_not_modified(client, menu):
+    first = client.get("/api/products/")
+    assert first.status_code == 200
+    etag = first.headers["etag"]
+    assert {p["name"] for p in first.json()} == {"宫保鸡丁", "鱼香肉丝"}
+
+    again = client.get("/api/products/", headers={"If-None-Match": etag})
+    assert again.status_code == 304
+    assert again.headers["etag"] == etag
+
+
+def test_write_from_another_session_invalidates_snapshot(client, menu):
+    etag = client.get("/api/products/").headers["etag"]
+
+    # 模拟另一个 worker：独立会话提交改价，本进程的快照只能通过共享版本号得知
+    other = SessionLocal()
+    try:
+        crud.update_product(other, menu["products"][0].id, {"price": 42.0})
+    finally:
+        other.close()
+
+    fresh = client.get("/api/products/", headers={"If-None-Match": etag})
+    assert fresh.status_code == 200
+    assert fresh.headers["etag"] != etag
+    assert {p["name"]: p["price"] for p in fresh.json()}["宫保鸡丁"] == 42.0
+
+
+def test_order_keeps_snapshot_and_stock_is_served_live(client, menu, db):
+    first = client.get("/api/products/")
+    assert "stock" not in first.json()[0]
+    version = crud.get_config_value(db, MENU_VERSION_KEY, "")
+    product = menu["products"][1]
+    crud.create_order(db, {
+        "orderNo": "S1", "tableId": menu["table"].id, "status": "COMPLETED", "timestamp": 1700000000,
+        "type": "DINE_IN", "items": [{"productId": product.id, "name": product.name, "price": product.price,
+                                      "unit": product.unit, "quantity": 5}],
+    })
+
+    # 销售不改变菜单版本，快照仍然有效
+    assert crud.get_config_value(db, MENU_VERSION_KEY, "") == version
+    again = client.get("/api/products/", headers={"If-None-Match": first.headers["etag"]})
+    assert again.status_code == 304
+    stock = {row["id"]: row["stock"] for row in client.get("/api/products/stock").json()}
+    assert stock == {menu["products"][0].id: 1000, product.id: 995}
+
+
+def test_categories_snapshot(client, menu, db):
+    first = client.get("/api/categories/")
+    assert [c["name"] for c in first.json()] == ["热菜"]
+    assert client.get("/api/categories/", headers={"If-None-Match": first.headers["etag"]}).status_code == 304
+
+    crud.create_category(db, "凉菜")
+    fresh = client.get("/api/categories/", headers={"If-None-Match": first.headers["etag"]})
+    assert fresh.status_code == 200
+    assert sorted(c["name"] for c in fresh.json()) == ["凉菜", "热菜"]
+
+
+def test_large_snapshot_is_precompressed(client, db, menu):
+    for i in range(40):
+        crud.create_product(db, {"name": f"商品{i:02d}", "price": 10.0, "categoryId": menu["category"].id,
+                                 "stock": 1, "unit": "份"})
+
+    response = client.get("/api/products/", headers={"Accept-Encoding": "gzip"})
+    assert response.status_code == 200
+    assert response.headers["content-encoding"] == "gzip"
+    assert len(response.json()) == 42
+    plain = client.get("/api/products/", headers={"Accept-Encoding": "identity"})
+    assert "content-encoding" not in plain.headers
+    assert plain.json() == response.json()
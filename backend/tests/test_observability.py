@@ -0,0 +1,80 @@
+import json
+import logging
+import queue
+import sys
+
+import pytest
+
+from backend.app import observability
+from backend.app.observability import DroppingQueueHandler, JsonFormatter, access_logger, metrics, parse_sample_rates
+
+
+@pytest.fixture
+def access_records():
+    """直接挂在 pos.access 上收集访问日志，不经过后台队列"""
+    records = []
+
+    class Collect(logging.Handler):
+        def emit(self, record):
+            records.append(record.fields)
+
+    handler = Collect()
+    access_logger.addHandler(handler)
+    metrics.reset()
+    yield records
+    access_logger.removeHandler(handler)
+
+
+def test_parse_sample_rates():
+    rates = parse_sample_rates("GET /api/tables/=0.01, /api/orders/page=2,junk")
+    assert rates == {"GET /api/tables/": 0.01, "/api/orders/page": 1.0}
+
+
+def test_json_lines_and_full_queue_drops():
+    handler = DroppingQueueHandler(queue.Queue(maxsize=1))
+    dropped = DroppingQueueHandler.dropped
+    logger = logging.getLogger("pos.tests")
+    try:
+        raise RuntimeError("坏了")
+    except RuntimeError:
+        record = logger.makeRecord("pos.tests", logging.ERROR, __file__, 1, "订单 %s 失败", ("A1",),
+                                   exc_info=sys.exc_info(), extra={"fields": {"orderNo": "A1"}})
+    handler.handle(record)
+    handler.handle(record)
+    assert DroppingQueueHandler.dropped == dropped + 1
+
+    line = json.loads(JsonFormatter().format(handler.queue.get_nowait()))
+    assert line["msg"] == "订单 A1 失败"
+    assert line["orderNo"] == "A1"
+    assert line["level"] == "ERROR"
+    assert "RuntimeError: 坏了" in line["exc"]
+
+
+def test_requests_are_counted_by_route_template(client, menu, access_records):
+    product_id = menu["products"][0].id
+    assert client.get(f"/api/products/{product_id}").status_code == 200
+    assert client.get("/api/products/999999").status_code == 404
+    client.get("/no-such-path")
+
+    text = client.get("/metrics").text
+    assert 'http_requests_total{method="GET",route="/api/products/{product_id}",status="200"} 1' in text
+    assert 'http_requests_total{method="GET",route="/api/products/{product_id}",status="404"} 1' in text
+    assert 'route="<unmatched>",status="404"} 1' in text
+    assert 'http_request_duration_seconds_count{method="GET",route="/api/products/{product_id}"} 2' in text
+    assert "http_requests_in_flight 1" in text  # /metrics 请求本身
+
+    first = access_records[0]
+    assert first["path"] == f"/api/products/{product_id}"
+    assert first["route"] == "/api/products/{product_id}"
+    assert first["status"] == 200
+    assert first["dbQueries"] >= 1
+
+
+def test_sampled_routes_still_log_errors(client, menu, access_records, monkeypatch):
+    monkeypatch.setattr(observability, "sample_rates", {"/api/products/{product_id}": 0.0})
+    client.get(f"/api/products/{menu['products'][0].id}")
+    assert access_records == []
+    assert observability._should_log("GET", "/api/products/{product_id}", 500, 1.0)
+    assert observability._should_log("GET", "/api/products/{product_id}", 200, observability.LOG_SLOW_MS)
+    # 采样只影响日志，指标仍然计数
+    assert 'status="200"} 1' in client.get("/metrics").text
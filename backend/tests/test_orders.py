@@ -0,0 +1,57 @@
+from backend.app import crud
+from backend.tests.conftest import count_queries, place_order
+
+T0 = 1700000000
+
+
+def _seed(db, menu):
+    """五笔订单，其中三笔同一时间戳，用于检查 (timestamp, id) 排序的并列情况"""
+    other = crud.create_table(db, {"name": "B2", "status": "AVAILABLE", "capacity": 2})
+    orders = [place_order(db, menu, f"N{i}", T0 + (i // 3) * 60, quantity=i + 1) for i in range(5)]
+    orders.append(place_order(db, menu, "CANCELLED", T0 + 30, status="CANCELLED"))
+    crud.create_order(db, {
+        "orderNo": "B2-1", "tableId": other.id, "status": "COMPLETED", "timestamp": T0 + 10, "type": "TAKE_OUT",
+        "items": [{"productId": menu["products"][1].id, "name": "鱼香肉丝", "price": 32.0, "unit": "份",
+                   "quantity": 1}],
+    })
+    return sorted(((o.timestamp, o.id) for o in crud.list_orders(db)), reverse=True), other
+
+
+def test_cursor_pages_follow_timestamp_then_id(db, menu):
+    expected, _ = _seed(db, menu)
+
+    seen, cursor = [], None
+    while True:
+        with count_queries() as statements:
+            page, cursor = crud.list_orders_page(db, limit=2, cursor=cursor)
+        # 订单和订单项各一条查询，与页大小无关
+        assert len(statements) == 2
+        assert all(len(o.items) == 1 for o in page)
+        seen += [(o.timestamp, o.id) for o in page]
+        if cursor is None:
+            break
+    assert seen == expected
+
+
+def test_page_filters(db, menu):
+    _, other = _seed(db, menu)
+
+    cancelled, _ = crud.list_orders_page(db, status="CANCELLED")
+    assert [o.orderNo for o in cancelled] == ["CANCELLED"]
+    by_table, _ = crud.list_orders_page(db, table_id=other.id)
+    assert [o.orderNo for o in by_table] == ["B2-1"]
+    take_out, _ = crud.list_orders_page(db, type="TAKE_OUT")
+    assert [o.orderNo for o in take_out] == ["B2-1"]
+    window, _ = crud.list_orders_page(db, start_ts=T0 + 1, end_ts=T0 + 59)
+    assert sorted(o.orderNo for o in window) == ["B2-1", "CANCELLED"]
+
+
+def test_page_endpoint(client, db, menu):
+    expected, _ = _seed(db, menu)
+
+    first = client.get("/api/orders/page", params={"limit": 4}).json()
+    assert [o["id"] for o in first["items"]] == [oid for _, oid in expected[:4]]
+    second = client.get("/api/orders/page", params={"limit": 4, "cursor": first["nextCursor"]}).json()
+    assert [o["id"] for o in second["items"]] == [oid for _, oid in expected[4:]]
+    assert second["nextCursor"] is None
+    assert client.get("/api/orders/page", params={"cursor": "not-a-cursor"}).status_code == 400
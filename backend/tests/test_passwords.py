@@ -0,0 +1,67 @@
+import hashlib
+
+from backend.app import models, passwords
+from backend.app.passwords import hash_password, needs_rehash, verify_password
+
+
+def _user(db, password_hash: str) -> int:
+    user = models.SystemUser(username="cashier1", passwordHash=password_hash, name="收银员", role="cashier")
+    db.add(user)
+    db.commit()
+    return user.id
+
+
+def _login(client, password: str):
+    return client.post("/api/auth/login", json={"username": "cashier1", "password": password})
+
+
+def test_hash_formats_round_trip():
+    for scheme, cost in (("scrypt", 2 ** 10), ("pbkdf2_sha256", 1000)):
+        hashed = hash_password("secret123", scheme, cost)
+        assert hashed.startswith(f"{scheme}${cost}$")
+        assert verify_password("secret123", hashed)
+        assert not verify_password("secret124", hashed)
+    # 相同密码每次加盐不同
+    assert hash_password("secret123") != hash_password("secret123")
+    assert verify_password("secret123", hashlib.sha256(b"secret123").hexdigest())
+    assert not verify_password("secret123", "scrypt$bad$8$1$$")
+
+
+def test_needs_rehash_follows_current_settings(monkeypatch):
+    assert not needs_rehash(hash_password("secret123"))
+    assert needs_rehash(hashlib.sha256(b"secret123").hexdigest())
+    assert needs_rehash(hash_password("secret123", cost=passwords.SCRYPT_N // 2))
+    assert needs_rehash(hash_password("secret123", "pbkdf2_sha256", 1000))
+
+    monkeypatch.setattr(passwords, "PASSWORD_SCHEME", "pbkdf2_sha256")
+    assert needs_rehash(hash_password("secret123", "scrypt"))
+    assert not needs_rehash(hash_password("secret123", "pbkdf2_sha256"))
+
+
+def test_login_upgrades_legacy_sha256(client, db):
+    user_id = _user(db, hashlib.sha256(b"secret123").hexdigest())
+
+    # 密码错误时不改写哈希
+    assert _login(client, "wrong").status_code == 401
+    db.expire_all()
+    assert not db.get(models.SystemUser, user_id).passwordHash.startswith("scrypt$")
+
+    assert _login(client, "secret123").status_code == 200
+    db.expire_all()
+    upgraded = db.get(models.SystemUser, user_id).passwordHash
+    assert upgraded.startswith(f"scrypt${passwords.SCRYPT_N}$")
+    assert not needs_rehash(upgraded)
+
+    assert _login(client, "secret123").status_code == 200
+    db.expire_all()
+    assert db.get(models.SystemUser, user_id).passwordHash == upgraded
+
+
+def test_login_upgrades_lower_cost_hash(client, db):
+    user_id = _user(db, hash_password("secret123", "pbkdf2_sha256", 1000))
+
+    assert _login(client, "secret123").status_code == 200
+    db.expire_all()
+    upgraded = db.get(models.SystemUser, user_id).passwordHash
+    assert upgraded.startswith("scrypt$")
+    assert verify_password("secret123", upgraded)
@@ -0,0 +1,91 @@
+import dataclasses
+import logging
+
+import pytest
+
+from backend.app import models, profiling
+from backend.app.passwords import hash_password
+from backend.tests.conftest import place_order
+
+
+@pytest.fixture
+def profiling_on():
+    """开启剖析，结束后恢复进程内设置"""
+    saved = dataclasses.replace(profiling.settings)
+    profiling.update_settings(enabled=True)
+    yield profiling.settings
+    profiling.update_settings(**saved.to_dict())
+
+
+@pytest.fixture
+def sql_records():
+    records = []
+
+    class Collect(logging.Handler):
+        def emit(self, record):
+            records.append((record.getMessage(), record.fields))
+
+    handler = Collect()
+    profiling.sql_logger.addHandler(handler)
+    yield records
+    profiling.sql_logger.removeHandler(handler)
+
+
+def _admin_headers(client, db) -> dict:
+    db.add(models.SystemUser(username="root", passwordHash=hash_password("secret123"), name="管理员", role="admin"))
+    db.commit()
+    token = client.post("/api/auth/login", json={"username": "root", "password": "secret123"}).json()["access_token"]
+    return {"Authorization": f"Bearer {token}"}
+
+
+def test_headers_only_when_enabled(client, menu):
+    url = f"/api/products/{menu['products'][0].id}"
+    assert "x-query-count" not in client.get(url).headers
+
+    profiling.update_settings(enabled=True)
+    try:
+        response = client.get(url)
+    finally:
+        profiling.update_settings(enabled=False)
+    assert int(response.headers["x-query-count"]) >= 1
+    assert float(response.headers["x-query-time-ms"]) >= 0
+    assert "x-query-budget" not in response.headers
+
+
+def test_query_budget_warning(client, db, menu, profiling_on, sql_records):
+    place_order(db, menu, "A", 1700000000)
+    profiling.update_settings(query_budget=1, slow_query_ms=10_000)
+    within = client.get(f"/api/products/{menu['products'][0].id}")
+    assert within.headers["x-query-budget"] == "1"
+    assert within.headers["x-query-count"] == "1"
+    assert sql_records == []
+
+    # 订单分页：一次取订单、一次批量取明细
+    over = client.get("/api/orders/page")
+    assert over.headers["x-query-count"] == "2"
+    assert sql_records == [("query budget exceeded", {
+        "method": "GET", "path": "/api/orders/page", "dbQueries": 2, "budget": 1,
+    })]
+
+
+def test_slow_select_is_logged_with_plan(client, menu, profiling_on, sql_records):
+    profiling.update_settings(slow_query_ms=0, explain=True)
+    client.get(f"/api/products/{menu['products'][0].id}")
+
+    slow = [fields for message, fields in sql_records if message == "slow query"]
+    selects = [f for f in slow if f["statement"].lstrip().upper().startswith("SELECT")]
+    assert selects and all(f["plan"] for f in selects)
+    assert all("plan" not in f for f in slow if f not in selects)
+
+
+def test_debug_endpoint_requires_admin(client, db):
+    assert client.put("/api/debug/profiling", json={"enabled": True}).status_code in (401, 403)
+
+    headers = _admin_headers(client, db)
+    try:
+        response = client.put("/api/debug/profiling", json={"slow_query_ms": 50}, headers=headers)
+        assert response.status_code == 200
+        assert response.json()["slow_query_ms"] == 50
+        assert client.get("/api/debug/profiling", headers=headers).json()["slow_query_ms"] == 50
+    finally:
+        profiling.update_settings(slow_query_ms=float(profiling.ProfilingSettings.slow_query_ms))
@@ -0,0 +1,112 @@
+import pytest
+from sqlalchemy import delete
+
+from backend.app import crud, models, realtime
+from backend.app.routers import tables as tables_router
+
+
+def _update(db, table, **changes):
+    data = {"name": table.name, "status": table.status, "capacity": table.capacity, "area": table.area}
+    data.update(changes)
+    return crud.update_table(db, table.id, data)
+
+
+def _receive(ws, limit: int = 20) -> dict:
+    """跳过心跳，返回下一条事件"""
+    for _ in range(limit):
+        message = ws.receive_json()
+        if message["type"] != "ping":
+            return message
+    raise AssertionError("没有收到事件")
+
+
+@pytest.fixture
+def fast_heartbeat(monkeypatch):
+    monkeypatch.setattr(tables_router, "REALTIME_HEARTBEAT", 0.2)
+
+
+def test_changes_since_merges_per_table(db):
+    a = crud.create_table(db, {"name": "A1", "status": "AVAILABLE", "capacity": 4})
+    # 自增 id 在清表后不重置，版本号相对第一条变更计算
+    base = realtime.current_version(db) - 1
+    _update(db, a, status="OCCUPIED")
+    _update(db, a, status="UNPAID")
+    b = crud.create_table(db, {"name": "B1", "status": "AVAILABLE", "capacity": 2})
+
+    version, tables = realtime.snapshot(db)
+    assert version == base + 4
+    assert sorted(t["name"] for t in tables) == ["A1", "B1"]
+
+    events = realtime.changes_since(db, base + 1)
+    assert [(e["version"], e["type"], e["table"]["id"]) for e in events] == [
+        (base + 3, "table.updated", a.id), (base + 4, "table.created", b.id),
+    ]
+    assert events[0]["table"]["status"] == "UNPAID"
+    assert realtime.changes_since(db, version) == []
+    # 版本号超前（来自其他库）或早于保留的日志时无法补齐
+    assert realtime.changes_since(db, version + 1) is None
+    db.execute(delete(models.TableChange).where(models.TableChange.id <= base + 2))
+    db.commit()
+    assert realtime.changes_since(db, base) is None
+    assert [e["version"] for e in realtime.changes_since(db, base + 2)] == [base + 3, base + 4]
+
+
+def test_orders_record_table_changes(db, menu):
+    version = realtime.current_version(db)
+    product = menu["products"][0]
+    crud.create_order(db, {
+        "orderNo": "P1", "tableId": menu["table"].id, "status": "PENDING", "timestamp": 1700000000,
+        "type": "DINE_IN", "items": [{"productId": product.id, "name": product.name, "price": product.price,
+                                      "unit": product.unit, "quantity": 1}],
+    })
+    events = realtime.changes_since(db, version)
+    assert [e["table"]["id"] for e in events] == [menu["table"].id]
+    assert events[0]["table"]["currentOrderId"] is not None
+
+
+def test_changes_endpoint(client, db, menu):
+    epoch = realtime.hub.epoch
+    version = realtime.current_version(db)
+
+    unchanged = client.get("/api/tables/changes", params={"since": version, "epoch": epoch}).json()
+    assert unchanged == {"epoch": epoch, "version": version, "reset": False, "tables": []}
+
+    table = menu["table"]
+    assert client.put(f"/api/tables/{table.id}", json={
+        "name": table.name, "status": "OCCUPIED", "capacity": table.capacity,
+    }).status_code == 200
+    delta = client.get("/api/tables/changes", params={"since": version, "epoch": epoch}).json()
+    assert delta["version"] == version + 1
+    assert [(t["id"], t["status"]) for t in delta["tables"]] == [(table.id, "OCCUPIED")]
+
+    # 其他库的 epoch：返回完整列表
+    reset = client.get("/api/tables/changes", params={"since": version, "epoch": "other"}).json()
+    assert reset["reset"] is True
+    assert [t["id"] for t in reset["tables"]] == [table.id]
+
+
+def test_websocket_snapshot_then_live_events(client, menu, fast_heartbeat):
+    table = menu["table"]
+    with client.websocket_connect("/api/tables/ws") as ws:
+        snapshot = _receive(ws)
+        assert snapshot["type"] == "snapshot"
+        assert [t["id"] for t in snapshot["tables"]] == [table.id]
+
+        client.put(f"/api/tables/{table.id}", json={"name": table.name, "status": "UNPAID", "capacity": 4})
+        event = _receive(ws)
+        assert event["type"] == "table.updated"
+        assert event["version"] == snapshot["version"] + 1
+        assert event["table"]["status"] == "UNPAID"
+
+    # 带版本号重连：只补发断线期间的变更
+    client.put(f"/api/tables/{table.id}", json={"name": table.name, "status": "AVAILABLE", "capacity": 4})
+    with client.websocket_connect(f"/api/tables/ws?since={event['version']}&epoch={realtime.hub.epoch}") as ws:
+        missed = _receive(ws)
+        assert missed["type"] == "table.updated"
+        assert missed["table"]["status"] == "AVAILABLE"
+
+
+def test_parse_last_event_id():
+    assert tables_router._parse_last_event_id("abc123:42") == ("abc123", 42)
+    assert tables_router._parse_last_event_id("abc123:x") == (None, None)
+    assert tables_router._parse_last_event_id(None) == (None, None)
@@ -0,0 +1,90 @@
+from sqlalchemy import delete, func, select
+
+from backend.app import crud, models
+from backend.tests.conftest import DAY, place_order
+
+START = 1_700_000_000 // DAY * DAY
+END = START + 3 * DAY - 1
+
+
+def _seed(db, menu):
+    place_order(db, menu, "A", START + 3600, quantity=2)
+    place_order(db, menu, "B", START + 5400, product=menu["products"][1])
+    place_order(db, menu, "C", START + DAY + 7200, quantity=3)
+    place_order(db, menu, "D", START + 2 * DAY + 60, product=menu["products"][1], quantity=4)
+
+
+def _raw_summary(db):
+    """水位未设置时 sales_summary 全部回查原始订单，作为对照"""
+    return crud.sales_summary(db, START, END, "day", "UTC")
+
+
+def test_orders_are_rolled_up_on_write(db, menu):
+    _seed(db, menu)
+    rows = db.execute(select(models.SalesRollup.bucketStart, models.SalesRollup.orders, models.SalesRollup.gross)
+                      .where(models.SalesRollup.granularity == "day", models.SalesRollup.dimension == "all")
+                      .order_by(models.SalesRollup.bucketStart)).all()
+    assert [tuple(r) for r in rows] == [
+        (START, 2, 38.0 * 2 + 32.0), (START + DAY, 1, 38.0 * 3), (START + 2 * DAY, 1, 32.0 * 4),
+    ]
+    by_type = db.execute(select(func.sum(models.SalesRollup.orders)).where(
+        models.SalesRollup.granularity == "hour", models.SalesRollup.dimension == "type",
+        models.SalesRollup.dimensionValue == "DINE_IN",
+    )).scalar()
+    assert by_type == 4
+
+
+def test_reads_raw_orders_until_watermark_is_set(db, menu):
+    _seed(db, menu)
+    expected = _raw_summary(db)
+    assert crud.sales_rollup_watermark(db) is None
+
+    # 没有水位时即使预聚合表为空也返回完整结果
+    db.execute(delete(models.SalesRollup))
+    db.commit()
+    assert _raw_summary(db) == expected
+
+
+def test_catch_up_rebuilds_rollups_once(db, menu):
+    _seed(db, menu)
+    expected = _raw_summary(db)
+    # 模拟预聚合上线前写入的订单：热表有订单，预聚合表没有
+    db.execute(delete(models.SalesRollup))
+    db.commit()
+
+    assert crud.catch_up_sales_rollups(db) > 0
+    assert crud.sales_rollup_watermark(db) == 0
+    assert crud.catch_up_sales_rollups(db) is None
+    assert crud.sales_summary(db, START, END, "day", "UTC") == expected
+
+    # 水位之后整天的数据来自预聚合表：直接删除原始订单不影响结果
+    db.execute(delete(models.OrderItem))
+    db.execute(delete(models.Order))
+    db.commit()
+    assert crud.sales_summary(db, START, END, "day", "UTC") == expected
+
+
+def test_partial_buckets_fall_back_to_raw_orders(db, menu):
+    _seed(db, menu)
+    crud.catch_up_sales_rollups(db)
+    place_order(db, menu, "E", START + DAY + 7300)
+
+    # 首尾不足一天的部分回查原始订单，中间整天读预聚合表
+    rows = crud.sales_summary(db, START + 3000, START + 2 * DAY + 100, "day", "UTC")
+    assert [(r["orders"], r["gross"]) for r in rows] == [(2, 38.0 * 2 + 32.0), (2, 38.0 * 4), (1, 32.0 * 4)]
+    assert crud.sales_summary(db, START + 3000, START + 2 * DAY + 30, "day", "UTC")[-1]["orders"] == 2
+
+
+def test_rebuild_replaces_drifted_rollups(db, menu):
+    _seed(db, menu)
+    crud.catch_up_sales_rollups(db)
+    expected = crud.sales_summary(db, START, END, "day", "UTC")
+    db.execute(models.SalesRollup.__table__.update().values(gross=0.0))
+    db.commit()
+    assert crud.sales_summary(db, START, END, "day", "UTC") != expected
+
+    assert crud.rebuild_sales_rollups(db, START, END) > 0
+    assert crud.sales_summary(db, START, END, "day", "UTC") == expected
+    hourly = crud.hourly_sales_curve(db, START, END, "UTC")
+    assert sum(h["orders"] for h in hourly) == 4
+    assert hourly[1]["orders"] == 2
@@ -0,0 +1,64 @@
+import time
+
+from backend.app import models
+from backend.app.passwords import hash_password
+from backend.app.routers import auth
+from backend.app.signed_tokens import RevocationList, decode_token, revocation_list, sign_token
+
+
+def _login(client, password):
+    response = client.post("/api/auth/login", json={"username": "signed1", "password": password})
+    assert response.status_code == 200
+    return {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+
+def test_relogin_right_after_password_change(client, db, monkeypatch):
+    monkeypatch.setattr(auth, "TOKEN_MODE", "signed")
+    db.add(models.SystemUser(username="signed1", passwordHash=hash_password("old-pass"), name="店员", role="staff"))
+    db.commit()
+
+    old = _login(client, "old-pass")
+    assert client.get("/api/auth/me", headers=old).status_code == 200
+    response = client.post("/api/auth/change-password", headers=old,
+                           json={"oldPassword": "old-pass", "newPassword": "new-pass"})
+    assert response.status_code == 200
+
+    # 与撤销处于同一秒的重新登录仍然有效，撤销前签发的令牌失效
+    new = _login(client, "new-pass")
+    assert client.get("/api/auth/me", headers=new).status_code == 200
+    assert client.get("/api/auth/me", headers=old).status_code == 401
+
+
+def test_logout_revokes_single_token(client, db, monkeypatch):
+    monkeypatch.setattr(auth, "TOKEN_MODE", "signed")
+    db.add(models.SystemUser(username="signed1", passwordHash=hash_password("pass"), name="店员", role="staff"))
+    db.commit()
+
+    first, second = _login(client, "pass"), _login(client, "pass")
+    assert client.post("/api/auth/logout", headers=first).status_code == 200
+    assert client.get("/api/auth/me", headers=first).status_code == 401
+    assert client.get("/api/auth/me", headers=second).status_code == 200
+
+
+def test_other_process_sees_revocations_after_refresh(db):
+    token = sign_token("u1", "staff", "access", 3600)
+    other = RevocationList(refresh_interval=3600)
+    other.refresh()
+
+    issued_ms = time.time_ns() // 1_000_000
+    revocation_list.revoke_user("u1", 3600)
+    assert decode_token(token) is None
+    assert not other.is_revoked({"sub": "u1", "iat": 0})
+    other.refresh()
+    assert other.is_revoked({"sub": "u1", "iat": issued_ms})
+    assert not other.is_revoked({"sub": "u1", "iat": time.time_ns() // 1_000_000 + 1000})
+
+
+def test_purge_drops_expired_user_revocations(db):
+    revocation_list.revoke_user("u-expired", -10)
+    revocation_list.revoke_user("u-live", 3600)
+
+    revocation_list.purge_expired()
+
+    assert "u-expired" not in revocation_list._not_before
+    assert "u-live" in revocation_list._not_before
@@ -0,0 +1,63 @@
+import io
+import json
+import time
+from datetime import datetime, timedelta
+
+from sqlalchemy import select, update
+
+from backend.app import crud, models
+from backend.tests.conftest import DAY, place_order
+
+NOW = int(time.time()) // DAY * DAY
+
+
+def test_deleted_product_hidden_from_lists(db, menu):
+    gone, kept = (p.id for p in menu["products"])
+    assert crud.delete_product(db, gone)
+
+    assert [p.id for p in crud.list_products(db)] == [kept]
+    assert crud.get_product(db, gone) is None
+    assert [p["id"] for group in crud.menu(db) for p in group["products"]] == [kept]
+    # 历史数据仍可显式查到
+    row = db.execute(select(models.Product).where(models.Product.id == gone)
+                     .execution_options(include_deleted=True)).scalar_one()
+    assert row.isDeleted
+
+
+def test_deleted_product_kept_in_category_sales(db, menu):
+    category_id = menu["category"].id
+    place_order(db, menu, "A", NOW - 3600, quantity=2)
+    place_order(db, menu, "B", NOW - 1800, product=menu["products"][1])
+    before = crud.category_sales(db, 0, NOW)
+
+    crud.delete_product(db, menu["products"][0].id)
+
+    after = crud.category_sales(db, 0, NOW)
+    assert after == before
+    assert after[0]["categoryId"] == category_id
+    assert after[0]["revenue"] == 38.0 * 2 + 32.0
+    assert crud.top_products(db, 0, NOW)[0]["name"] == "宫保鸡丁"
+
+
+def test_purge_skips_referenced_rows_and_archives_in_chunks(db, menu):
+    referenced, unused = (p.id for p in menu["products"])
+    place_order(db, menu, "A", NOW - 3600, product=menu["products"][0])
+    for pid in (referenced, unused):
+        crud.delete_product(db, pid)
+    for i in range(5):
+        db.add(models.Supplier(id=f"s{i}", name=f"供应商{i}", contactName="张", phone=f"1390000000{i}"))
+    db.commit()
+    db.execute(update(models.Supplier).values(isDeleted=True, deletedAt="2000-01-01T00:00:00"))
+    db.execute(update(models.Product).values(deletedAt="2000-01-01T00:00:00")
+               .execution_options(include_deleted=True))
+    db.commit()
+
+    out = io.StringIO()
+    before = (datetime.utcnow() - timedelta(days=1)).isoformat()
+    counts = crud.purge_soft_deleted(db, before, out, chunk_size=2)
+
+    assert counts == {"products": 1, "suppliers": 5, "users": 0}
+    archived = [json.loads(line) for line in out.getvalue().splitlines()]
+    assert sorted(r["id"] for r in archived) == sorted([unused] + [f"s{i}" for i in range(5)])
+    remaining = db.execute(select(models.Product.id).execution_options(include_deleted=True)).scalars().all()
+    assert remaining == [referenced]
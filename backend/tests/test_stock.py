@@ -0,0 +1,69 @@
+import pytest
+from sqlalchemy import func, select
+
+from backend.app import crud, models
+from backend.tests.conftest import count_queries
+
+T0 = 1700000000
+
+
+def _order(menu, order_no, lines, status="COMPLETED"):
+    return {
+        "orderNo": order_no, "tableId": menu["table"].id, "status": status, "timestamp": T0, "type": "DINE_IN",
+        "items": [{"productId": p.id, "name": p.name, "price": p.price, "unit": p.unit, "quantity": q}
+                  for p, q in lines],
+    }
+
+
+def _stock(db, product):
+    db.expire_all()
+    return crud.get_product(db, product.id).stock
+
+
+def test_order_decrements_stock_and_logs_sales(db, menu):
+    kung_pao, yu_xiang = menu["products"]
+    with count_queries() as statements:
+        crud.create_order(db, _order(menu, "S1", [(kung_pao, 2), (yu_xiang, 1), (kung_pao, 3)]))
+
+    # 同一商品的多行合并为一条 UPDATE ... SET stock = stock - q
+    updates = [s for s in statements if s.startswith("UPDATE products")]
+    assert len(updates) == 2
+    assert (_stock(db, kung_pao), _stock(db, yu_xiang)) == (995, 999)
+    logs = db.execute(select(models.StockLog).order_by(models.StockLog.productName)).scalars().all()
+    assert [(l.productName, l.type, l.delta, l.beforeStock, l.currentStock, l.referenceNo) for l in logs] == [
+        ("宫保鸡丁", "OUT_SALE", -5, 1000, 995, "S1"),
+        ("鱼香肉丝", "OUT_SALE", -1, 1000, 999, "S1"),
+    ]
+    assert logs[0].costPrice == 15.0
+
+
+def test_cancelled_order_keeps_stock(db, menu):
+    crud.create_order(db, _order(menu, "C1", [(menu["products"][0], 4)], status="CANCELLED"))
+    assert _stock(db, menu["products"][0]) == 1000
+    assert db.execute(select(func.count()).select_from(models.StockLog)).scalar() == 0
+
+
+def test_oversell_rolls_back_whole_order(db, menu):
+    kung_pao, yu_xiang = menu["products"]
+    crud.update_product(db, yu_xiang.id, {"stock": 2})
+
+    with pytest.raises(crud.InsufficientStockError) as exc:
+        crud.create_order(db, _order(menu, "O1", [(kung_pao, 5), (yu_xiang, 3)]), reject_oversell=True)
+
+    assert exc.value.product_id == yu_xiang.id
+    assert (_stock(db, kung_pao), _stock(db, yu_xiang)) == (1000, 2)
+    assert db.execute(select(func.count()).select_from(models.Order)).scalar() == 0
+    assert db.execute(select(func.count()).select_from(models.StockLog)).scalar() == 0
+
+
+def test_oversell_allowed_by_default(db, menu):
+    crud.update_product(db, menu["products"][0].id, {"stock": 1})
+    crud.create_order(db, _order(menu, "N1", [(menu["products"][0], 3)]))
+    assert _stock(db, menu["products"][0]) == -2
+
+
+def test_oversell_endpoint_returns_409(client, db, menu, monkeypatch):
+    monkeypatch.setattr(crud, "REJECT_OVERSELL", True)
+    response = client.post("/api/orders/", json=_order(menu, "API1", [(menu["products"][0], 1001)]))
+    assert response.status_code == 409
+    assert "宫保鸡丁" in response.json()["detail"]
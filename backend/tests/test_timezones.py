@@ -0,0 +1,78 @@
+from zoneinfo import ZoneInfo
+
+import pytest
+
+from backend.app import crud
+from backend.tests.conftest import place_order
+
+NY = "America/New_York"
+# 2023-11-04 00:00 UTC ~ 2023-11-06 23:59:59 UTC，纽约在 2023-11-05 06:00 UTC 结束夏令时
+START = 1699056000
+END = 1699315200 - 1
+FALL_BACK = 1699164000
+
+
+def _seed(db, menu):
+    place_order(db, menu, "EDT-LATE", FALL_BACK - 9000)  # 本地 11-04 23:30 EDT，UTC 已是 11-05
+    place_order(db, menu, "EDT-EARLY", FALL_BACK - 5400, product=menu["products"][1])  # 本地 11-05 00:30 EDT
+    place_order(db, menu, "EST", FALL_BACK + 5400, quantity=2)  # 本地 11-05 02:30 EST
+
+
+def test_offset_segments_split_at_transition():
+    assert crud._offset_segments(ZoneInfo(NY), START, END) == [
+        (START, FALL_BACK - 1, -4 * 3600), (FALL_BACK, END, -5 * 3600),
+    ]
+    # Lord Howe 岛在 UTC 半点切换，偏移只变化半小时
+    segments = crud._offset_segments(ZoneInfo("Australia/Lord_Howe"), 1696032000, 1696204800)
+    assert [s[2] for s in segments] == [37800, 39600]
+    assert segments[1][0] == 1696087800
+    assert crud._offset_segments(ZoneInfo("UTC"), START, END) == [(START, END, 0)]
+
+
+@pytest.mark.parametrize("caught_up", [False, True])
+def test_day_buckets_use_local_dates_across_dst(db, menu, caught_up):
+    _seed(db, menu)
+    if caught_up:
+        # 水位之后的整小时部分读小时预聚合表，结果应与原始订单一致
+        crud.catch_up_sales_rollups(db)
+
+    rows = crud.sales_summary(db, START, END, "day", NY)
+    assert [(r["date"], r["orders"], r["gross"]) for r in rows] == [
+        ("2023-11-04", 1, 38.0), ("2023-11-05", 2, 32.0 + 38.0 * 2),
+    ]
+    utc = crud.sales_summary(db, START, END, "day", "UTC")
+    assert [(r["date"], r["orders"]) for r in utc] == [("2023-11-05", 3)]
+
+
+@pytest.mark.parametrize("caught_up", [False, True])
+def test_hourly_curve_uses_local_hours(db, menu, caught_up):
+    _seed(db, menu)
+    if caught_up:
+        crud.catch_up_sales_rollups(db)
+
+    curve = crud.hourly_sales_curve(db, START, END, NY)
+    assert len(curve) == 24
+    assert {h["hour"]: h["orders"] for h in curve if h["orders"]} == {23: 1, 0: 1, 2: 1}
+    assert curve[2]["gross"] == 38.0 * 2
+
+
+def test_half_hour_offset_reads_raw_orders(db, menu):
+    place_order(db, menu, "IST", 1699210800)  # 2023-11-05 19:00 UTC = 11-06 00:30 IST
+    crud.catch_up_sales_rollups(db)
+    rows = crud.sales_summary(db, START, END, "day", "Asia/Kolkata")
+    assert [(r["date"], r["orders"]) for r in rows] == [("2023-11-06", 1)]
+
+
+def test_store_timezone_config_and_invalid_zone(client, db, menu):
+    _seed(db, menu)
+    crud.set_config_value(db, crud.STORE_TIMEZONE_KEY, NY)
+    db.commit()
+    assert [r["date"] for r in crud.sales_summary(db, START, END)] == ["2023-11-04", "2023-11-05"]
+
+    with pytest.raises(ValueError):
+        crud.sales_summary(db, START, END, "day", "Mars/Olympus")
+    response = client.get("/api/analytics/sales-summary",
+                          params={"start_ts": START, "end_ts": END, "tz": "Mars/Olympus"})
+    assert response.status_code == 400
+    assert client.get("/api/analytics/hourly-sales",
+                      params={"start_ts": START, "end_ts": END, "tz": "Mars/Olympus"}).status_code == 400
@@ -0,0 +1,50 @@
+import time
+
+import pytest
+
+from backend.app import token_store as token_store_module
+from backend.app.token_store import DatabaseTokenStore, LocalRedis, RedisTokenStore, create_token_store
+
+
+@pytest.fixture(params=["db", "redis"])
+def store(request, db):
+    if request.param == "db":
+        return DatabaseTokenStore()
+    return RedisTokenStore(LocalRedis())
+
+
+def test_put_get_delete(store):
+    store.put("token-1", {"user_id": "u1", "type": "access"}, 60)
+
+    data = store.get("token-1")
+    assert (data["user_id"], data["type"]) == ("u1", "access")
+    assert abs(data["expires"] - (time.time() + 60)) <= 2
+    assert store.get("token-2") is None
+
+    store.delete("token-1")
+    assert store.get("token-1") is None
+
+
+def test_purge_expired(store, monkeypatch):
+    store.put("old", {"user_id": "u1", "type": "access"}, 1)
+    store.put("new", {"user_id": "u1", "type": "refresh"}, 3600)
+
+    later = time.time() + 10
+    monkeypatch.setattr(token_store_module.time, "time", lambda: later)
+    assert store.purge_expired() == 1
+    assert store.get("old") is None
+    assert store.get("new")["type"] == "refresh"
+
+
+def test_redis_keys_hold_token_hashes():
+    client = LocalRedis()
+    RedisTokenStore(client, prefix="t:").put("secret-token", {"user_id": "u1", "type": "access"}, 60)
+    [key] = client._data
+    assert key.startswith("t:") and "secret-token" not in key
+
+
+def test_redis_store_requires_url(monkeypatch):
+    monkeypatch.setattr(token_store_module, "TOKEN_STORE", "redis")
+    monkeypatch.setattr(token_store_module, "REDIS_URL", "")
+    with pytest.raises(ValueError):
+        create_token_store()
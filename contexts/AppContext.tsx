@@ -498,14 +498,12 @@ export const AppProvider: React.FC<AppProviderProps> = ({ children }) => {
         await updateTableStatus(tableId, TableStatus.SCANNED, order.id);
       }
 
-      // 扣减库存
+      // 库存已由后端随订单扣减并记录出库日志，这里只同步本地状态
       for (const item of items) {
-        await updateStock(
-          item.id,
-          -item.quantity,
-          StockTransactionType.OUT_SALE,
-          `订单销售: ${order.orderNo}`
-        );
+        const product = state.products.find(p => p.id === item.id);
+        if (product) {
+          dispatch({ type: 'UPDATE_PRODUCT', payload: { ...product, stock: product.stock - item.quantity } });
+        }
       }
 
       showSuccess('成功', '订单创建成功');
@@ -514,7 +512,7 @@ export const AppProvider: React.FC<AppProviderProps> = ({ children }) => {
       handleError('orders', error);
       throw error;
     }
-  }, [state.products, updateStock, showSuccess, handleError]);
+  }, [state.products, showSuccess, handleError]);
 
   // 更新订单状态
   const updateOrderStatus = useCallback(async (orderId: string, status: OrderStatus) => {
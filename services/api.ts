@@ -284,8 +284,23 @@ export interface ProductCreateRequest {
   supplierId?: string;
 }
 
+export interface ProductStock {
+  id: string;
+  stock: number;
+}
+
 export const productApi = {
-  list: () => http.get<Product[]>('/products/'),
+  // 商品列表带 ETag 缓存且不含库存，实时库存单独获取后合并
+  list: async () => {
+    const [products, levels] = await Promise.all([
+      http.get<Omit<Product, 'stock'>[]>('/products/'),
+      productApi.stock(),
+    ]);
+    const stock = new Map(levels.map(level => [level.id, level.stock]));
+    return products.map(product => ({ ...product, stock: stock.get(product.id) ?? 0 }));
+  },
+
+  stock: () => http.get<ProductStock[]>('/products/stock'),
 
   get: (id: string) => http.get<Product>(`/products/${id}`),
 
@@ -306,6 +321,26 @@ export const productApi = {
 
 // ==================== 分类API ====================
 
+export interface MenuProduct {
+  id: string;
+  name: string;
+  price: number;
+  image?: string;
+  unit: string;
+  salesMode?: string[];
+}
+
+export interface Menu {
+  table: { id: string; name: string; area?: string } | null;
+  categories: (Category & { products: MenuProduct[] })[];
+}
+
+// 顾客扫码点单：tableRef 为桌台 id 或二维码内容
+export const menuApi = {
+  get: (tableRef?: string) =>
+    http.get<Menu>(`/menu${tableRef ? `?table=${encodeURIComponent(tableRef)}` : ''}`),
+};
+
 export const categoryApi = {
   list: () => http.get<Category[]>('/categories/'),
 
@@ -350,9 +385,26 @@ export interface TableCreateRequest {
   area?: string;
 }
 
+export interface TableChanges {
+  epoch: string;
+  version: number;
+  reset: boolean;
+  tables: Table[];
+}
+
 export const tableApi = {
   list: () => http.get<Table[]>('/tables/'),
 
+  // 增量轮询：reset 为 true 时 tables 是完整列表
+  changes: (since: number, epoch?: string) => {
+    const queryParams = new URLSearchParams({ since: since.toString() });
+    if (epoch) queryParams.append('epoch', epoch);
+    return http.get<TableChanges>(`/tables/changes?${queryParams.toString()}`);
+  },
+
+  // SSE 推送；浏览器重连时会自动带上 Last-Event-ID
+  streamUrl: () => `${API_BASE_URL}/tables/stream`,
+
   get: (id: string) => http.get<Table>(`/tables/${id}`),
 
   create: (data: TableCreateRequest) =>
@@ -426,6 +478,11 @@ export interface UserCreateRequest {
   joinDate: string;
 }
 
+export interface UserPage {
+  items: User[];
+  nextCursor: string | null;
+}
+
 export const userApi = {
   list: (params?: { type?: string; search?: string }) => {
     const queryParams = new URLSearchParams();
@@ -435,6 +492,14 @@ export const userApi = {
     return http.get<User[]>(`/users/${query ? `?${query}` : ''}`);
   },
 
+  // 手机号前缀或姓名片段，nextCursor 用于加载下一页
+  search: (q: string, params?: { limit?: number; cursor?: string }) => {
+    const queryParams = new URLSearchParams({ q });
+    if (params?.limit) queryParams.append('limit', params.limit.toString());
+    if (params?.cursor) queryParams.append('cursor', params.cursor);
+    return http.get<UserPage>(`/users/search?${queryParams.toString()}`);
+  },
+
   get: (id: string) => http.get<User>(`/users/${id}`),
 
   create: (data: UserCreateRequest) =>
@@ -580,8 +645,9 @@ export const analyticsApi = {
 // ==================== AI服务代理API ====================
 
 export const aiApi = {
-  generateInsight: (salesData: unknown, recentOrders: unknown) =>
-    http.post<{ insight: string }>('/ai/insight', { salesData, recentOrders }),
+  // 经营数据由服务端按最近 days 天汇总，无需上传订单
+  generateInsight: (options: { days?: number; tz?: string } = {}) =>
+    http.post<{ insight: string }>('/ai/insight', options),
 
   generateProductDescription: (productName: string) =>
     http.post<{ description: string }>('/ai/product-description', { productName }),
@@ -595,6 +661,7 @@ export default {
   auth: authApi,
   products: productApi,
   categories: categoryApi,
+  menu: menuApi,
   suppliers: supplierApi,
   tables: tableApi,
   orders: orderApi,
@@ -129,7 +129,7 @@ describe('API Service', () => {
     });
 
     describe('list', () => {
-      it('should fetch products list', async () => {
+      it('should fetch products list and merge live stock', async () => {
         const mockProducts = [
           { id: '1', name: 'Product 1', price: 10 },
           { id: '2', name: 'Product 2', price: 20 },
@@ -140,10 +140,22 @@ describe('API Service', () => {
           status: 200,
           json: async () => mockProducts,
         } as Response);
+        mockFetch.mockResolvedValueOnce({
+          ok: true,
+          status: 200,
+          json: async () => [{ id: '1', stock: 5 }, { id: '2', stock: 0 }],
+        } as Response);
 
         const result = await productApi.list();
 
-        expect(result).toEqual(mockProducts);
+        expect(result).toEqual([
+          { id: '1', name: 'Product 1', price: 10, stock: 5 },
+          { id: '2', name: 'Product 2', price: 20, stock: 0 },
+        ]);
+        expect(mockFetch).toHaveBeenCalledWith(
+          expect.stringContaining('/products/stock'),
+          expect.objectContaining({ method: 'GET' })
+        );
         expect(mockFetch).toHaveBeenCalledWith(
           expect.stringContaining('/products/'),
           expect.objectContaining({